@@ -0,0 +1,146 @@
+from __future__ import print_function
+
+import copy
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import GridMap
+
+# Job types.
+JOB_SAVE   = "save"
+JOB_RENDER = "render"
+
+class AsyncWriter(object):
+    """
+    Writes environments and rendered images on a background thread.
+
+    A job takes a snapshot of the environment on the calling thread and is put
+    into a bounded queue. The worker thread saves the snapshot with
+    GridMapEnv.save() or rasterizes it into a PNG file with an ArrayRenderBackend.
+    matplotlib is never used by the worker thread.
+
+    When the queue is full, submitting a job blocks until the worker catches up.
+    Exceptions raised by the jobs are collected and raised by flush().
+    """
+
+    def __init__(self, maxQueueSize = 16):
+        if ( maxQueueSize < 1 ):
+            raise ValueError("maxQueueSize must be positive. Got %s." % ( str(maxQueueSize) ))
+
+        self.queue = queue.Queue( maxsize = maxQueueSize )
+
+        self.errors = [] # Exceptions raised by the jobs.
+        self.errorsLock = threading.Lock()
+        self.nJobsDone = 0
+
+        # Snapshot of the latest map. Reused as long as the map is not changed.
+        self.mapSnapshot    = None
+        self.mapSnapshotKey = None
+
+        self.renderBackend = None # Only used by the worker thread.
+
+        self.thread = threading.Thread( target = self.run, name = "GridMapAsyncWriter" )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def snapshot(self, env):
+        """
+        Return a copy of env which is not affected by any further steps. The
+        map is copied once per map version and shared by the snapshots.
+        """
+
+        if ( self.mapSnapshot is None or self.mapSnapshotKey[0] is not env.map or \
+             self.mapSnapshotKey[1] != env.map.version ):
+            self.mapSnapshot    = copy.deepcopy( env.map )
+            self.mapSnapshotKey = ( env.map, env.map.version )
+
+        snap = copy.copy( env )
+        snap.map = self.mapSnapshot
+        snap.history = env.history.copy()
+        snap.renderBackend = None
+        snap.arrayRenderBackend = None
+        snap.asyncWriter = None
+
+        return snap
+
+    def submit(self, jobType, env, *args):
+        """Take a snapshot of env and queue a job. Block if the queue is full."""
+
+        if ( not self.thread.is_alive() ):
+            raise GridMap.GridMapException("The writer thread is not running.")
+
+        if ( jobType not in ( JOB_SAVE, JOB_RENDER ) ):
+            raise ValueError("Unexpected job type %s." % (jobType))
+
+        self.queue.put( ( jobType, self.snapshot(env), args ) )
+
+    def submit_save(self, env, fn = None, binaryMap = False, obstacleEncoding = GridMap.OBSTACLE_ENCODING_LIST):
+        """Queue a GridMapEnv.save() of env. See GridMapEnv.save() for the arguments."""
+
+        self.submit( JOB_SAVE, env, fn, binaryMap, obstacleEncoding )
+
+    def submit_render(self, env, fn = None):
+        """
+        Queue a rendering of env. The image is written into the render directory
+        of env. See GridMapEnv.render() for fn.
+        """
+
+        self.submit( JOB_RENDER, env, fn )
+
+    def run_job(self, jobType, snap, args):
+        if ( JOB_SAVE == jobType ):
+            snap.save( *args )
+        elif ( JOB_RENDER == jobType ):
+            import RenderBackends
+
+            if ( self.renderBackend is None or \
+                 self.renderBackend.pixelsPerBlock != snap.visPixelsPerBlock ):
+                self.renderBackend = RenderBackends.ArrayRenderBackend( snap.visPixelsPerBlock )
+
+            self.renderBackend.render( snap, 0, True, args[0] )
+            self.renderBackend.close()
+
+    def run(self):
+        while ( True ):
+            job = self.queue.get()
+
+            try:
+                if ( job is None ):
+                    break
+
+                self.run_job( *job )
+            except Exception as e:
+                with self.errorsLock:
+                    self.errors.append(e)
+            finally:
+                self.nJobsDone += 1
+                self.queue.task_done()
+
+    def flush(self):
+        """Wait for all the queued jobs. Raise GridMapException if any job failed since the last flush."""
+
+        self.queue.join()
+
+        with self.errorsLock:
+            errors = self.errors
+            self.errors = []
+
+        if ( len(errors) > 0 ):
+            raise GridMap.GridMapException("%d asynchronous job(s) failed. The first error: %s" % \
+                ( len(errors), repr( errors[0] ) ))
+
+    def close(self):
+        """Flush and stop the worker thread."""
+
+        if ( not self.thread.is_alive() ):
+            return
+
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
@@ -0,0 +1,117 @@
+from __future__ import print_function
+
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+import GridMap
+import AsyncWriter
+
+class TestAsyncWriter(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "AsyncWriterTest_" )
+
+        gridMap = GridMap.GridMap2D( 10, 20, outOfBoundValue = -200 )
+
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_starting_block(0)
+        gridMap.set_value_ending_block(100)
+        gridMap.set_value_obstacle_block(-100)
+
+        gridMap.initialize()
+        gridMap.set_starting_block( ( 0, 0 ) )
+        gridMap.set_ending_block( ( 9, 19 ) )
+        gridMap.add_obstacle( ( 5, 10 ) )
+
+        self.gme = GridMap.GridMapEnv( gridMap = gridMap, workingDir = self.workingDir )
+        self.gme.reset()
+
+    def tearDown(self):
+        self.gme.disable_async_writer()
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_save(self):
+        print("test_save")
+
+        self.gme.enable_async_writer( maxQueueSize = 2 )
+
+        self.gme.step( GridMap.BlockCoorDelta( 1, 1 ) )
+        self.gme.save( "Episode.json" )
+
+        # Steps after save() do not change the saved state.
+        self.gme.step( GridMap.BlockCoorDelta( 1, 1 ) )
+
+        self.gme.finalize()
+
+        with open( os.path.join( self.workingDir, "Episode.json" ), "r" ) as fp:
+            d = json.load( fp )
+
+        self.assertEqual( d["nSteps"], 1 )
+        self.assertEqual( len( d["agentLocs"] ), 2 )
+        self.assertTrue( os.path.isfile( os.path.join( self.workingDir, "Episode_Map.json" ) ) )
+
+        gme = GridMap.GridMapEnv( gridMap = None )
+        gme.load( self.workingDir, "Episode.json" )
+        self.assertEqual( gme.nSteps, 1 )
+
+    def test_render(self):
+        print("test_render")
+
+        self.gme.set_render_backend("none")
+        self.gme.enable_async_writer()
+
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 1, 1 ) )
+            self.gme.render( flagSave = True, fn = "Step%d.png" % (i) )
+
+        self.gme.finalize()
+
+        for i in range(3):
+            fn = os.path.join( self.gme.renderDir, "Step%d.png" % (i) )
+
+            with open( fn, "rb" ) as fp:
+                self.assertEqual( fp.read(8), b"\x89PNG\r\n\x1a\n" )
+
+    def test_map_snapshot(self):
+        print("test_map_snapshot")
+
+        writer = AsyncWriter.AsyncWriter()
+
+        snap0 = writer.snapshot( self.gme )
+        snap1 = writer.snapshot( self.gme )
+        self.assertTrue( snap0.map is snap1.map )
+        self.assertTrue( snap0.map is not self.gme.map )
+
+        self.gme.map.add_obstacle( ( 2, 2 ) )
+        snap2 = writer.snapshot( self.gme )
+        self.assertTrue( snap2.map is not snap0.map )
+        self.assertFalse( snap0.map.is_obstacle_block( ( 2, 2 ) ) )
+
+        # Changing the values only.
+        self.gme.map.set_value_out_of_boundary( -500 )
+        self.gme.map.enable_potential_value( 10, 1 )
+        self.gme.map.update_potential_value()
+        snap3 = writer.snapshot( self.gme )
+        self.assertTrue( snap3.map is not snap2.map )
+        self.assertEqual( snap3.map.outOfBoundValue, -500 )
+        self.assertTrue( np.array_equal( snap3.map.blockValues, self.gme.map.blockValues ) )
+
+        writer.close()
+
+    def test_errors(self):
+        print("test_errors")
+
+        self.gme.enable_async_writer()
+        self.gme.save( "NotExist/Episode.json" )
+
+        self.assertRaises( GridMap.GridMapException, self.gme.flush_async_writer )
+
+        # The errors are cleared after being raised.
+        self.gme.flush_async_writer()
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestAsyncWriter )
+    unittest.TextTestRunner().run( suite )
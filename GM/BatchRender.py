@@ -0,0 +1,253 @@
+from __future__ import print_function
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+
+import EpisodeExport
+import GridMap
+import RenderBackends
+
+# Job status.
+STATUS_RENDERED = "rendered"
+STATUS_SKIPPED  = "skipped"
+STATUS_FAILED   = "failed"
+
+# Output formats.
+FORMAT_PNG    = "png"
+FORMAT_FRAMES = "frames"
+FORMAT_GIF    = "gif"
+
+FORMATS = [ FORMAT_PNG, FORMAT_FRAMES, FORMAT_GIF ]
+
+# Written into a frame directory after all the frames.
+FRAMES_COMPLETE_MARKER = "Complete"
+
+# Prefix of the temporary output written before being renamed to the final path.
+TEMP_PREFIX = ".Partial_"
+
+def find_episodes(patterns):
+    """Return the sorted list of the files matching any of the glob patterns."""
+
+    fns = set()
+
+    for p in patterns:
+        fns.update( glob.glob(p) )
+
+    return sorted( [ fn for fn in fns if os.path.isfile(fn) ] )
+
+def get_output_path(fn, outputDir = None, fmt = FORMAT_PNG):
+    """
+    Compose the output path of the saved environment fn. The output is placed
+    next to fn if outputDir is None. Otherwise the directory of fn is encoded
+    into the name to avoid collisions inside outputDir. The encoded name is the
+    relative directory followed by a short hash of the absolute directory, since
+    the relative directory alone is ambiguous, e.g., for A_B/ and A/B/.
+    For FORMAT_FRAMES, the returned path is a directory.
+    """
+
+    d, name = os.path.split(fn)
+    name = os.path.splitext(name)[0]
+
+    if ( outputDir is None ):
+        outputDir = d
+    else:
+        absDir = os.path.abspath(d)
+
+        parts = [ "up" if ( os.pardir == p ) else p \
+            for p in os.path.relpath( absDir ).split( os.sep ) if ( p != os.curdir ) ]
+        parts.append( hashlib.md5( absDir.encode("utf-8") ).hexdigest()[:8] )
+
+        name = "%s_%s" % ( "_".join(parts), name )
+
+    if ( FORMAT_FRAMES == fmt ):
+        return os.path.join( outputDir, "%s_Frames" % (name) )
+    elif ( FORMAT_GIF == fmt ):
+        return os.path.join( outputDir, "%s.gif" % (name) )
+    elif ( FORMAT_PNG == fmt ):
+        return os.path.join( outputDir, "%s.png" % (name) )
+    else:
+        raise ValueError("Unexpected format %s." % (fmt))
+
+def get_input_files(fn):
+    """Return fn and the map file referred by fn."""
+
+    with open( fn, "r" ) as fp:
+        d = json.load(fp)
+
+    return [ fn, os.path.join( os.path.dirname(fn), d["mapFn"] ) ]
+
+def get_temp_path(outputPath):
+    """Return the temporary path in the same directory of outputPath. The extension is kept."""
+
+    d, name = os.path.split(outputPath)
+
+    return os.path.join( d, TEMP_PREFIX + name )
+
+def remove_path(path):
+    """Remove the file or the directory path if it exists."""
+
+    if ( os.path.isdir(path) ):
+        shutil.rmtree(path)
+    elif ( os.path.exists(path) ):
+        os.remove(path)
+
+def is_up_to_date(fn, outputPath):
+    """
+    Return True if outputPath exists and is newer than fn and its map file.
+    A frame directory counts only if it has the completion marker.
+    """
+
+    if ( os.path.isdir(outputPath) ):
+        outputPath = os.path.join( outputPath, FRAMES_COMPLETE_MARKER )
+
+    if ( not os.path.isfile(outputPath) ):
+        return False
+
+    tOut = os.path.getmtime(outputPath)
+
+    for f in get_input_files(fn):
+        if ( os.path.getmtime(f) > tOut ):
+            return False
+
+    return True
+
+def load_env(fn):
+    """Load a saved environment without a matplotlib backend."""
+
+    d, name = os.path.split(fn)
+
+    env = GridMap.GridMapEnv( name = "BatchRender", gridMap = None, workingDir = d if ( len(d) > 0 ) else "." )
+    env.set_render_backend( RenderBackends.RENDER_BACKEND_NONE )
+    env.load( env.workingDir, name )
+
+    return env
+
+def render_episode(job):
+    """
+    Render a single saved environment. job is a tuple of
+    ( fn, outputPath, fmt, pixelsPerBlock, force ).
+    The output is written to a temporary path and renamed to outputPath when
+    complete, so an interrupted job never leaves a partial output at outputPath.
+    Return a tuple of ( fn, outputPath, status, message ).
+    """
+
+    fn, outputPath, fmt, pixelsPerBlock, force = job
+
+    tempPath = get_temp_path(outputPath)
+
+    try:
+        if ( False == force and is_up_to_date( fn, outputPath ) ):
+            return ( fn, outputPath, STATUS_SKIPPED, "" )
+
+        env = load_env(fn)
+
+        d = os.path.dirname(outputPath)
+
+        if ( len(d) > 0 and not os.path.isdir(d) ):
+            os.makedirs(d)
+
+        # Left by an interrupted job.
+        remove_path(tempPath)
+
+        if ( FORMAT_PNG == fmt ):
+            backend = RenderBackends.ArrayRenderBackend( pixelsPerBlock )
+            RenderBackends.write_png( tempPath, backend.render(env) )
+        else:
+            # One frame per agent location.
+            EpisodeExport.export_episode( env, tempPath, pixelsPerBlock )
+
+            if ( FORMAT_FRAMES == fmt ):
+                open( os.path.join( tempPath, FRAMES_COMPLETE_MARKER ), "w" ).close()
+
+        remove_path(outputPath)
+        os.rename( tempPath, outputPath )
+
+        return ( fn, outputPath, STATUS_RENDERED, "" )
+    except Exception as e:
+        try:
+            remove_path(tempPath)
+        except OSError:
+            pass
+
+        return ( fn, outputPath, STATUS_FAILED, repr(e) )
+
+def render_episodes(fns, outputDir = None, fmt = FORMAT_PNG, pixelsPerBlock = 10, force = False, \
+    nProcesses = None, verbose = True):
+    """
+    Render the saved environments in fns with a process pool of nProcesses processes.
+    nProcesses = None uses all the CPUs. nProcesses = 1 renders in the current process.
+    Return a list of the results of render_episode() in the order of fns.
+    """
+
+    jobs = [ ( fn, get_output_path( fn, outputDir, fmt ), fmt, pixelsPerBlock, force ) for fn in fns ]
+
+    if ( nProcesses is None ):
+        nProcesses = multiprocessing.cpu_count()
+
+    if ( 1 == nProcesses or len(jobs) <= 1 ):
+        pool = None
+        it = ( render_episode(job) for job in jobs )
+    else:
+        pool = multiprocessing.Pool( processes = min( nProcesses, len(jobs) ) )
+        it = pool.imap( render_episode, jobs )
+
+    results = []
+
+    try:
+        for res in it:
+            if ( True == verbose ):
+                print( "%-8s %s -> %s %s" % ( res[2], res[0], res[1], res[3] ), file = sys.stderr )
+
+            results.append(res)
+    finally:
+        if ( pool is not None ):
+            pool.close()
+            pool.join()
+
+    return results
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Render the environments saved by GridMapEnv.save() into images.")
+
+    parser.add_argument("patterns", type=str, nargs="+", \
+        help="Glob patterns of the saved environments, e.g., Runs/*/GridMapEnv.json. Quote them to avoid the expansion by the shell.")
+    parser.add_argument("--output-dir", type=str, default=None, \
+        help="The output directory. The images are placed next to the inputs if not specified.")
+    parser.add_argument("--format", type=str, default=FORMAT_PNG, choices=FORMATS, \
+        help="png for the final state, frames for a directory of one image per step, gif for an animated GIF.")
+    parser.add_argument("--pixels-per-block", type=int, default=10, \
+        help="The resolution of the images.")
+    parser.add_argument("--processes", type=int, default=None, \
+        help="Number of processes. Use all the CPUs if not specified.")
+    parser.add_argument("--force", action="store_true", default=False, \
+        help="Render the episodes even if the outputs are up to date.")
+    parser.add_argument("--quiet", action="store_true", default=False, \
+        help="Do not print the progress to stderr.")
+
+    args = parser.parse_args( argv )
+
+    if ( args.pixels_per_block < 1 ):
+        parser.error("--pixels-per-block must be positive.")
+
+    fns = find_episodes( args.patterns )
+
+    results = render_episodes( fns, args.output_dir, args.format, args.pixels_per_block, \
+        args.force, args.processes, not args.quiet )
+
+    counts = dict( [ ( s, len( [ r for r in results if s == r[2] ] ) ) \
+        for s in ( STATUS_RENDERED, STATUS_SKIPPED, STATUS_FAILED ) ] )
+
+    if ( False == args.quiet ):
+        print( "%d episodes: %d rendered, %d skipped, %d failed." % \
+            ( len(results), counts[STATUS_RENDERED], counts[STATUS_SKIPPED], counts[STATUS_FAILED] ), file = sys.stderr )
+
+    return 1 if ( counts[STATUS_FAILED] > 0 ) else 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
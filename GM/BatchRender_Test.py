@@ -0,0 +1,167 @@
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import GridMap
+import BatchRender
+import EpisodeExport
+
+class TestBatchRender(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "BatchRenderTest_" )
+
+        gridMap = GridMap.GridMap2D( 10, 20, outOfBoundValue = -200 )
+
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_starting_block(0)
+        gridMap.set_value_ending_block(100)
+        gridMap.set_value_obstacle_block(-100)
+
+        gridMap.initialize()
+        gridMap.set_starting_block( ( 0, 0 ) )
+        gridMap.set_ending_block( ( 9, 19 ) )
+        gridMap.add_obstacle( ( 5, 10 ) )
+
+        # Two episodes in two directories.
+        for i in range(2):
+            gme = GridMap.GridMapEnv( gridMap = gridMap, workingDir = os.path.join( self.workingDir, "Run%d" % (i) ) )
+            gme.reset()
+
+            for j in range( 3 + i ):
+                gme.step( GridMap.BlockCoorDelta( 1, 1 ) )
+
+            gme.save()
+
+        self.pattern = os.path.join( self.workingDir, "Run*", "GridMapEnv.json" )
+
+    def tearDown(self):
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_get_output_path(self):
+        print("test_get_output_path")
+
+        fn = os.path.join( "A", "B", "GridMapEnv.json" )
+
+        self.assertEqual( BatchRender.get_output_path( fn ), os.path.join( "A", "B", "GridMapEnv.png" ) )
+        self.assertEqual( BatchRender.get_output_path( fn, fmt = BatchRender.FORMAT_GIF ), os.path.join( "A", "B", "GridMapEnv.gif" ) )
+
+        outputPath = BatchRender.get_output_path( fn, "Out" )
+        self.assertEqual( os.path.dirname(outputPath), "Out" )
+        self.assertTrue( os.path.basename(outputPath).startswith("A_B_") )
+        self.assertTrue( outputPath.endswith("_GridMapEnv.png") )
+        self.assertTrue( BatchRender.get_output_path( fn, "Out", BatchRender.FORMAT_FRAMES ).endswith("_GridMapEnv_Frames") )
+
+        # Directories that differ only by the separators or by the parent references.
+        fns = [ fn, os.path.join( "A_B", "GridMapEnv.json" ), \
+            os.path.join( "..", "A", "GridMapEnv.json" ), os.path.join( "A", "GridMapEnv.json" ), \
+            os.path.join( "up", "A", "GridMapEnv.json" ) ]
+        outputPaths = [ BatchRender.get_output_path( f, "Out" ) for f in fns ]
+        self.assertEqual( len( set(outputPaths) ), len(fns) )
+
+    def test_render_episodes(self):
+        print("test_render_episodes")
+
+        fns = BatchRender.find_episodes( [ self.pattern ] )
+        self.assertEqual( len(fns), 2 )
+
+        results = BatchRender.render_episodes( fns, nProcesses = 2, verbose = False )
+
+        self.assertEqual( [ r[2] for r in results ], [ BatchRender.STATUS_RENDERED ] * 2 )
+
+        for r in results:
+            with open( r[1], "rb" ) as fp:
+                self.assertEqual( fp.read(8), b"\x89PNG\r\n\x1a\n" )
+
+        # Up to date.
+        results = BatchRender.render_episodes( fns, nProcesses = 1, verbose = False )
+        self.assertEqual( [ r[2] for r in results ], [ BatchRender.STATUS_SKIPPED ] * 2 )
+
+        # Update the input.
+        t = time.time() + 10
+        os.utime( fns[0], ( t, t ) )
+
+        results = BatchRender.render_episodes( fns, nProcesses = 1, verbose = False )
+        self.assertEqual( [ r[2] for r in results ], [ BatchRender.STATUS_RENDERED, BatchRender.STATUS_SKIPPED ] )
+
+        # Force.
+        results = BatchRender.render_episodes( fns, nProcesses = 1, force = True, verbose = False )
+        self.assertEqual( [ r[2] for r in results ], [ BatchRender.STATUS_RENDERED ] * 2 )
+
+    def test_partial_output(self):
+        print("test_partial_output")
+
+        fn = BatchRender.find_episodes( [ self.pattern ] )[0]
+        outputDir = os.path.join( self.workingDir, "Output" )
+
+        # A frame directory without the completion marker, e.g., of an interrupted job.
+        outputPath = BatchRender.get_output_path( fn, outputDir, BatchRender.FORMAT_FRAMES )
+        os.makedirs( outputPath )
+        open( os.path.join( outputPath, "000000.png" ), "wb" ).close()
+
+        self.assertFalse( BatchRender.is_up_to_date( fn, outputPath ) )
+
+        results = BatchRender.render_episodes( [ fn ], outputDir, BatchRender.FORMAT_FRAMES, nProcesses = 1, verbose = False )
+        self.assertEqual( results[0][2], BatchRender.STATUS_RENDERED )
+        self.assertTrue( BatchRender.is_up_to_date( fn, outputPath ) )
+
+        # A job failing after the first frame leaves neither the output nor the temporary file.
+        iterateFrames = EpisodeExport.iterate_frames
+
+        def fail_after_first_frame(env, pixelsPerBlock = None):
+            it = iterateFrames( env, pixelsPerBlock )
+            yield next(it)
+            self.assertTrue( os.path.isfile( BatchRender.get_temp_path( outputPath ) ) )
+            raise GridMap.GridMapException("Interrupted.")
+
+        outputPath = BatchRender.get_output_path( fn, outputDir, BatchRender.FORMAT_GIF )
+
+        EpisodeExport.iterate_frames = fail_after_first_frame
+        try:
+            results = BatchRender.render_episodes( [ fn ], outputDir, BatchRender.FORMAT_GIF, nProcesses = 1, verbose = False )
+        finally:
+            EpisodeExport.iterate_frames = iterateFrames
+
+        self.assertEqual( results[0][2], BatchRender.STATUS_FAILED )
+        self.assertTrue( results[0][3].startswith("GridMapException") )
+        self.assertFalse( os.path.exists( outputPath ) )
+        self.assertFalse( os.path.exists( BatchRender.get_temp_path( outputPath ) ) )
+
+        # Nothing but the outputs are left.
+        self.assertEqual( sorted( os.listdir( outputDir ) ), [ os.path.basename( BatchRender.get_output_path( fn, outputDir, BatchRender.FORMAT_FRAMES ) ) ] )
+
+    def test_main(self):
+        print("test_main")
+
+        outputDir = os.path.join( self.workingDir, "Output" )
+
+        ret = BatchRender.main( [ self.pattern, "--output-dir", outputDir, "--format", "frames", \
+            "--pixels-per-block", "4", "--processes", "1", "--quiet" ] )
+
+        self.assertEqual( ret, 0 )
+
+        dirs = sorted( os.listdir( outputDir ) )
+        self.assertEqual( len(dirs), 2 )
+
+        # One frame for every agent location and the completion marker.
+        self.assertEqual( len( os.listdir( os.path.join( outputDir, dirs[0] ) ) ), 4 + 1 )
+        self.assertEqual( len( os.listdir( os.path.join( outputDir, dirs[1] ) ) ), 5 + 1 )
+        self.assertTrue( os.path.isfile( os.path.join( outputDir, dirs[0], BatchRender.FRAMES_COMPLETE_MARKER ) ) )
+
+        ret = BatchRender.main( [ self.pattern, "--format", "gif", "--processes", "1", "--quiet" ] )
+        self.assertEqual( ret, 0 )
+        self.assertTrue( os.path.isfile( os.path.join( self.workingDir, "Run0", "GridMapEnv.gif" ) ) )
+
+        # A broken input.
+        with open( os.path.join( self.workingDir, "Run0", "GridMapEnv.json" ), "w" ) as fp:
+            fp.write("{")
+
+        ret = BatchRender.main( [ self.pattern, "--processes", "1", "--quiet" ] )
+        self.assertEqual( ret, 1 )
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestBatchRender )
+    unittest.TextTestRunner().run( suite )
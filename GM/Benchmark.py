@@ -0,0 +1,289 @@
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import math
+import numpy as np
+import platform
+import shutil
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+import GridMap
+import EnvInterfaces
+
+# Feature flags of the environment.
+FEATURE_NONE   = "none"
+FEATURE_CLIP   = "clip"
+FEATURE_RANDOM = "random"
+FEATURE_RADIUS = "radius"
+
+FEATURES = [ FEATURE_NONE, FEATURE_CLIP, FEATURE_RANDOM, FEATURE_RADIUS ]
+
+# Environment types.
+ENV_GRIDMAPENV = "GridMapEnv"
+ENV_GME_NP     = "GME_NP"
+ENV_VEC        = "VecGridMapEnv"
+
+ENVS = [ ENV_GRIDMAPENV, ENV_GME_NP, ENV_VEC ]
+
+# Number of agents of VecGridMapEnv.
+DEFAULT_VEC_ENVS = 256
+
+# The action magnitude that spans the whole map.
+MAGNITUDE_MAP = "map"
+
+def parse_map_size(s):
+    """Parse a string like 10x20 into [rows, cols]."""
+
+    parts = s.lower().split("x")
+
+    if ( 2 != len(parts) ):
+        raise ValueError("Map size should be in the form of ROWSxCOLS. Got %s." % (s))
+
+    return [ int( parts[0] ), int( parts[1] ) ]
+
+def parse_magnitude(s):
+    """Parse an action magnitude. Return a float or MAGNITUDE_MAP."""
+
+    if ( MAGNITUDE_MAP == s ):
+        return MAGNITUDE_MAP
+
+    return float(s)
+
+def create_map(rows, cols, density, seed = 0):
+    """
+    Create a GridMap2D with randomly distributed obstacles. density is the ratio of
+    the obstacles over all the blocks. The starting and ending blocks are placed at
+    the lower-left and upper-right corners.
+    """
+
+    gridMap = GridMap.GridMap2D( rows, cols, name = "Benchmark%dx%d" % ( rows, cols ), outOfBoundValue = -10 )
+
+    gridMap.set_value_normal_block(-0.1)
+    gridMap.set_value_starting_block(-0.1)
+    gridMap.set_value_obstacle_block(-10)
+    gridMap.set_value_ending_block(100)
+
+    gridMap.initialize()
+
+    gridMap.set_starting_block( ( 0, 0 ) )
+    gridMap.set_ending_block( ( rows - 1, cols - 1 ) )
+
+    if ( density > 0 ):
+        rng = np.random.RandomState( seed )
+
+        mask = rng.rand( rows, cols ) < density
+        mask[0, 0] = False
+        mask[rows - 1, cols - 1] = False
+
+        gridMap.add_obstacles_from_mask( mask )
+
+    return gridMap
+
+def create_env(envType, gridMap, workingDir, feature, magnitude, nEnvs = DEFAULT_VEC_ENVS):
+    """Create an environment of envType with feature enabled. nEnvs is only used by ENV_VEC."""
+
+    if ( ENV_GRIDMAPENV == envType ):
+        env = GridMap.GridMapEnv( name = "Benchmark", gridMap = gridMap, workingDir = workingDir )
+    elif ( ENV_GME_NP == envType ):
+        env = EnvInterfaces.GME_NP( name = "Benchmark", gridMap = gridMap, workingDir = workingDir )
+    elif ( ENV_VEC == envType ):
+        env = EnvInterfaces.VecGridMapEnv( nEnvs, name = "Benchmark", gridMap = gridMap, workingDir = workingDir )
+    else:
+        raise ValueError("Unexpected environment type %s." % (envType))
+
+    if ( FEATURE_CLIP == feature ):
+        # Clip the actions to half of their magnitude.
+        env.enable_action_clipping( -0.5 * magnitude, 0.5 * magnitude )
+    elif ( FEATURE_RANDOM == feature ):
+        env.enable_random_coordinating( 0.1 )
+    elif ( FEATURE_RADIUS == feature ):
+        env.enable_ending_point_radius( 0.5 * min( gridMap.get_step_size() ) )
+    elif ( FEATURE_NONE != feature ):
+        raise ValueError("Unexpected feature %s." % (feature))
+
+    return env
+
+def make_actions(n, magnitude, seed = 0):
+    """Create n actions of magnitude with random directions. Returns an n x 2 NumPy array."""
+
+    rng = np.random.RandomState( seed )
+
+    theta = rng.rand( n ) * 2 * math.pi
+
+    return np.stack( [ magnitude * np.cos( theta ), magnitude * np.sin( theta ) ], axis = 1 )
+
+def run_case(envType, rows, cols, density, magnitude, feature, nSteps, nWarmup = 100, maxSteps = 1000, seed = 0, \
+    nEnvs = DEFAULT_VEC_ENVS):
+    """
+    Run a single benchmark case. Return a dictionary with the configuration and the measurements.
+    Latencies are measured in microseconds for every call of step(). ENV_VEC moves nEnvs
+    agents in every call, and stepsPerSecond counts the steps of all the agents so that
+    it compares with the other environments directly.
+    """
+
+    nAgents = nEnvs if ( ENV_VEC == envType ) else 1
+
+    gridMap = create_map( rows, cols, density, seed )
+
+    if ( MAGNITUDE_MAP == magnitude ):
+        mag = math.sqrt( gridMap.get_map_size()[0]**2 + gridMap.get_map_size()[1]**2 )
+    else:
+        mag = magnitude * min( gridMap.get_step_size() )
+
+    workingDir = tempfile.mkdtemp( prefix = "GridMapBenchmark_" )
+
+    try:
+        env = create_env( envType, gridMap, workingDir, feature, mag, nEnvs )
+        env.set_max_steps( maxSteps )
+        env.reset()
+
+        actions = make_actions( ( nWarmup + nSteps ) * nAgents, mag, seed )
+
+        if ( ENV_GRIDMAPENV == envType ):
+            actions = [ GridMap.BlockCoorDelta( a[0], a[1] ) for a in actions ]
+        elif ( ENV_VEC == envType ):
+            actions = actions.reshape( ( nWarmup + nSteps, nAgents, 2 ) )
+
+        latencies = np.zeros( ( nSteps, ), dtype = np.float64 )
+        nEpisodes = 0
+
+        for i in range( nWarmup + nSteps ):
+            t0 = timer()
+            _, _, flagTerm, _ = env.step( actions[i] )
+            t1 = timer()
+
+            if ( i >= nWarmup ):
+                latencies[ i - nWarmup ] = t1 - t0
+
+            if ( ENV_VEC == envType ):
+                # Reset automatically.
+                nEpisodes += int( flagTerm.sum() )
+            elif ( True == flagTerm ):
+                env.reset()
+                nEpisodes += 1
+    finally:
+        shutil.rmtree( workingDir, ignore_errors = True )
+
+    latencies *= 1e6
+
+    return {
+        "env": envType,
+        "rows": rows,
+        "cols": cols,
+        "density": density,
+        "magnitude": magnitude,
+        "feature": feature,
+        "agents": nAgents,
+        "steps": nSteps,
+        "episodes": nEpisodes,
+        "stepsPerSecond": float( nSteps * nAgents / ( latencies.sum() * 1e-6 ) ),
+        "latencyMean": float( latencies.mean() ),
+        "latencyP50": float( np.percentile( latencies, 50 ) ),
+        "latencyP90": float( np.percentile( latencies, 90 ) ),
+        "latencyP99": float( np.percentile( latencies, 99 ) ),
+        "latencyMax": float( latencies.max() ),
+    }
+
+def run_benchmark(envTypes, mapSizes, densities, magnitudes, features, nSteps, nWarmup = 100, maxSteps = 1000, seed = 0, verbose = True, \
+    nEnvs = DEFAULT_VEC_ENVS):
+    """Run all the combinations of the arguments. Return a dictionary ready to be dumped as JSON."""
+
+    results = []
+
+    for rows, cols in mapSizes:
+        for density in densities:
+            for magnitude in magnitudes:
+                for feature in features:
+                    for envType in envTypes:
+                        res = run_case( envType, rows, cols, density, magnitude, feature, \
+                            nSteps, nWarmup, maxSteps, seed, nEnvs )
+
+                        if ( True == verbose ):
+                            print( "%-13s %4dx%-4d density %.2f magnitude %-5s %-6s: %10.1f steps/s, p50 %8.1f us, p99 %8.1f us" % \
+                                ( envType, rows, cols, density, magnitude, feature, \
+                                  res["stepsPerSecond"], res["latencyP50"], res["latencyP99"] ), file = sys.stderr )
+
+                        results.append( res )
+
+    return {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "steps": nSteps,
+            "warmup": nWarmup,
+            "maxSteps": maxSteps,
+            "seed": seed,
+            "vecEnvs": nEnvs,
+        },
+        "results": results,
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Measure the step throughput of GridMapEnv, GME_NP, and VecGridMapEnv.")
+
+    parser.add_argument("--envs", type=str, default=",".join(ENVS), \
+        help="Comma separated environment types. Choose from %s." % ( ",".join(ENVS) ))
+    parser.add_argument("--map-sizes", type=str, default="10x20,100x100,500x500", \
+        help="Comma separated map sizes in the form of ROWSxCOLS, e.g., 10x20,2000x2000.")
+    parser.add_argument("--densities", type=str, default="0,0.1,0.3", \
+        help="Comma separated obstacle densities.")
+    parser.add_argument("--magnitudes", type=str, default="0.3,1,10,map", \
+        help="Comma separated action magnitudes measured in blocks. Use map for actions spanning the whole map.")
+    parser.add_argument("--features", type=str, default=",".join(FEATURES), \
+        help="Comma separated feature flags. Choose from %s." % ( ",".join(FEATURES) ))
+    parser.add_argument("--steps", type=int, default=2000, \
+        help="Number of measured steps for every case.")
+    parser.add_argument("--warmup", type=int, default=100, \
+        help="Number of steps before measuring.")
+    parser.add_argument("--max-steps", type=int, default=1000, \
+        help="Maximum steps of an episode.")
+    parser.add_argument("--vec-envs", type=int, default=DEFAULT_VEC_ENVS, \
+        help="Number of agents of VecGridMapEnv.")
+    parser.add_argument("--seed", type=int, default=0, \
+        help="Random seed.")
+    parser.add_argument("--output", type=str, default=None, \
+        help="The output JSON file. Write to stdout if not specified.")
+    parser.add_argument("--quiet", action="store_true", default=False, \
+        help="Do not print the progress to stderr.")
+
+    args = parser.parse_args( argv )
+
+    envTypes   = args.envs.split(",")
+    mapSizes   = [ parse_map_size(s) for s in args.map_sizes.split(",") ]
+    densities  = [ float(s) for s in args.densities.split(",") ]
+    magnitudes = [ parse_magnitude(s) for s in args.magnitudes.split(",") ]
+    features   = args.features.split(",")
+
+    if ( args.vec_envs < 1 ):
+        parser.error("--vec-envs must be positive.")
+
+    for e in envTypes:
+        if ( e not in ENVS ):
+            parser.error("Unexpected environment type %s." % (e))
+
+    for f in features:
+        if ( f not in FEATURES ):
+            parser.error("Unexpected feature %s." % (f))
+
+    res = run_benchmark( envTypes, mapSizes, densities, magnitudes, features, \
+        args.steps, args.warmup, args.max_steps, args.seed, not args.quiet, args.vec_envs )
+
+    s = json.dumps( res, indent = 2 )
+
+    if ( args.output is None ):
+        print(s)
+    else:
+        with open( args.output, "w" ) as fp:
+            fp.write(s)
+            fp.write("\n")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
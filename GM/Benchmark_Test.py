@@ -0,0 +1,71 @@
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import Benchmark
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "BenchmarkTest_" )
+
+    def tearDown(self):
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_parse(self):
+        print("test_parse")
+
+        self.assertEqual( Benchmark.parse_map_size("10x20"), [ 10, 20 ] )
+        self.assertRaises( ValueError, Benchmark.parse_map_size, "10" )
+
+        self.assertEqual( Benchmark.parse_magnitude("0.5"), 0.5 )
+        self.assertEqual( Benchmark.parse_magnitude("map"), Benchmark.MAGNITUDE_MAP )
+
+    def test_create_map(self):
+        print("test_create_map")
+
+        gridMap = Benchmark.create_map( 20, 30, 0.2, seed = 1 )
+
+        nObstacles = len( gridMap.obstacleIndices )
+
+        self.assertTrue( nObstacles > 0.1 * 20 * 30 )
+        self.assertTrue( nObstacles < 0.3 * 20 * 30 )
+        self.assertTrue( gridMap.is_starting_block( ( 0, 0 ) ) )
+        self.assertTrue( gridMap.is_ending_block( ( 19, 29 ) ) )
+
+    def test_run_case(self):
+        print("test_run_case")
+
+        for envType in Benchmark.ENVS:
+            for feature in Benchmark.FEATURES:
+                res = Benchmark.run_case( envType, 10, 20, 0.1, Benchmark.MAGNITUDE_MAP, feature, 50, nWarmup = 5 )
+
+                self.assertEqual( res["env"], envType )
+                self.assertEqual( res["feature"], feature )
+                self.assertEqual( res["agents"], 256 if ( Benchmark.ENV_VEC == envType ) else 1 )
+                self.assertEqual( res["steps"], 50 )
+                self.assertTrue( res["stepsPerSecond"] > 0 )
+                self.assertTrue( res["latencyP50"] <= res["latencyP99"] )
+                self.assertTrue( res["latencyP99"] <= res["latencyMax"] )
+
+    def test_main(self):
+        print("test_main")
+
+        fn = os.path.join( self.workingDir, "Benchmark.json" )
+
+        Benchmark.main( [ "--map-sizes", "10x20", "--densities", "0,0.1", "--magnitudes", "0.5,map", \
+            "--features", "none,radius", "--steps", "20", "--warmup", "2", "--vec-envs", "8", "--output", fn, "--quiet" ] )
+
+        with open( fn, "r" ) as fp:
+            res = json.load( fp )
+
+        self.assertEqual( res["meta"]["steps"], 20 )
+        self.assertEqual( len( res["results"] ), len( Benchmark.ENVS ) * 2 * 2 * 2 )
+        self.assertEqual( [ r["agents"] for r in res["results"] if Benchmark.ENV_VEC == r["env"] ], [ 8 ] * 8 )
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestBenchmark )
+    unittest.TextTestRunner().run( suite )
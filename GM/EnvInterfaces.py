@@ -84,22 +84,79 @@ class GME_NP(GridMap.GridMapEnv):
 
         return np.array([ res.x, res.y ])
 
-    def set_trajectory(self, t):
+    def get_state(self):
         """
-        t is a numpy ndarray of shape (x, 2). t stores the position (state) history of the agent.
-        This function substitutes the self.agentLocs member variable with t. Converts numpy ndarray 
-        into BlockCoor objects.
+        Override super class. The stuck counter and the stuck state are appended
+        to the tuple of GridMapEnv.get_state().
         """
 
-        n = t.shape[0]
+        stuckState = None if ( self.stuckState is None ) else ( float( self.stuckState[0] ), float( self.stuckState[1] ) )
+
+        return super(GME_NP, self).get_state() + ( self.stuckCount, stuckState )
 
-        temp = []
+    def set_state(self, state):
+        """
+        Override super class.
+        """
 
-        for i in range(n):
-            temp.append( self.make_a_coor( t[i, 0], t[i, 1] ) )
+        super(GME_NP, self).set_state( state )
 
-        self.agentLocs = temp
-        self.nSteps    = n
+        self.stuckCount = state[9]
+        self.stuckState = None if ( state[10] is None ) else np.array( state[10], dtype=np.float32 )
+
+    def rollout(self, policy_fn, max_steps = None):
+        """
+        Override super class. Run a whole episode from the current state in one call.
+        policy_fn: A function taking the current state as a NumPy array and returning
+        an action of two elements. The loop stops at termination or after max_steps
+        steps. max_steps defaults to the steps left before reaching the maximum steps
+        of the environment. An (n, 2) array of actions is also accepted instead of a
+        function, in which case max_steps is not used.
+
+        Return values are the same with GridMapEnv.rollout().
+        """
+
+        if ( not callable( policy_fn ) ):
+            return super(GME_NP, self).rollout( policy_fn )
+
+        if ( max_steps is None ):
+            if ( self.maxSteps <= 0 ):
+                raise ValueError("max_steps must be specified for a policy function if the environment has no maximum steps.")
+
+            max_steps = max( self.maxSteps - self.nSteps, 0 )
+
+        if ( max_steps < 0 ):
+            raise ValueError("max_steps must be a non-negative number. max_steps = {}.".format( max_steps ))
+
+        s = self.get_current_state()
+
+        return self.run_rollout( lambda i, state: policy_fn( state ), max_steps, \
+            np.array( [ s.x, s.y ], dtype=np.float32 ) )
+
+    def rollout_step(self, action):
+        """
+        Override super class.
+        """
+
+        state, val, flagTerm, dummy = self.step( action )
+
+        return state, val, flagTerm
+
+    def set_trajectory(self, t):
+        """
+        t is an array of shape (n, 2). t stores the position (state) history of the agent,
+        normalized if normalized coordinate is enabled. This function replaces the recorded
+        agent locations with t in one pass. The recorded actions are set to zero.
+        """
+
+        t = np.asarray( t, dtype=np.float64 ).reshape( ( -1, 2 ) )
+
+        if ( True == self.normalizedCoordinate ):
+            t = t * [ self.halfMapSize[GridMap.GridMap2D.I_C], self.halfMapSize[GridMap.GridMap2D.I_R] ] + \
+                [ self.centerCoordinate.x, self.centerCoordinate.y ]
+
+        self.history.set( t )
+        self.nSteps = t.shape[0]
 
     def random_map(self):
         # There must be a map.
@@ -115,4 +172,281 @@ class GME_NP(GridMap.GridMapEnv):
         # Reset the ending block.
         self.map.set_ending_block( GridMap.BlockIndex( indices[1,0], indices[1,1] ) )
 
-    
\ No newline at end of file
+    
+class VecGridMapEnv(GridMap.GridMapEnv):
+    """
+    A vectorized environment. nEnvs agents are moving on a single shared map.
+
+    The settings are the same with GridMapEnv and GME_NP, e.g. action clipping,
+    non-dimensional step, normalized coordinate, ending point radius mode, and
+    stuck check. The settings are applied to all the agents.
+
+    step() takes an (nEnvs, 2) NumPy array as the actions and returns
+    (nEnvs, 2) states, (nEnvs,) values, and (nEnvs,) termination flags.
+    If autoReset is True, a terminated agent is placed back to the starting
+    block in the same call of step() and its final state is saved in the
+    returned info dictionary. Otherwise, use reset_envs() to restart the
+    terminated agents before calling step() again.
+    """
+
+    def __init__(self, nEnvs, name="VecGridMapEnv", gridMap = None, workingDir="./", autoReset = True):
+        super(VecGridMapEnv, self).__init__( name, gridMap, workingDir )
+
+        assert( isinstance( nEnvs, (int, long) ) )
+        assert( nEnvs > 0 )
+
+        self.nEnvs     = nEnvs
+        self.autoReset = autoReset
+
+        self.maxStuckCount      = 0
+        self.stuckPenaltyFactor = -10
+
+        # The states of all the agents.
+        self.agentCurrentLocs = np.zeros( ( nEnvs, 2 ), dtype=np.float64 ) # Not normalized.
+        self.envSteps         = np.zeros( ( nEnvs, ), dtype=np.int64 )
+        self.envTotalValues   = np.zeros( ( nEnvs, ), dtype=np.float64 )
+        self.envTerminated    = np.zeros( ( nEnvs, ), dtype=np.bool_ )
+        self.stuckCounts      = np.zeros( ( nEnvs, ), dtype=np.int64 )
+        self.stuckStates      = np.zeros( ( nEnvs, 2 ), dtype=np.float32 )
+        self.haveStuckStates  = np.zeros( ( nEnvs, ), dtype=np.bool_ )
+
+        # Member variables for compatibility.
+        self.observation_space = np.array([0, 0])
+
+    def enable_stuck_check(self, maxStuckCount, penaltyFactor ):
+        if ( maxStuckCount < 0 ):
+            raise GridMap.GridMapException("Max stuck count must be non-negative number.")
+
+        self.maxStuckCount      = maxStuckCount
+        self.stuckPenaltyFactor = penaltyFactor
+
+    def disable_stuck_check(self):
+        self.maxStuckCount      = 0
+        self.stuckPenaltyFactor = 1.0
+
+    def make_states(self, locs):
+        """Convert the coordinates in locs into the states returned to the user."""
+
+        states = locs.astype(np.float32)
+
+        if ( True == self.normalizedCoordinate ):
+            states[:, 0] = ( locs[:, 0] - self.centerCoordinate.x ) / self.halfMapSize[GridMap.GridMap2D.I_C]
+            states[:, 1] = ( locs[:, 1] - self.centerCoordinate.y ) / self.halfMapSize[GridMap.GridMap2D.I_R]
+
+        return states
+
+    def reset_envs(self, mask):
+        """
+        Place the agents selected by the boolean array mask back to the starting block.
+        Return the (nEnvs, 2) states of all the agents.
+        """
+
+        self.agentCurrentLocs[mask, 0] = self.agentStartingLoc.x
+        self.agentCurrentLocs[mask, 1] = self.agentStartingLoc.y
+
+        self.envSteps[mask]       = 0
+        self.envTotalValues[mask] = 0
+        self.envTerminated[mask]  = False
+
+        self.stuckCounts[mask]     = 0
+        self.haveStuckStates[mask] = False
+
+        return self.make_states( self.agentCurrentLocs )
+
+    def reset(self):
+        """Reset all the agents. Return the (nEnvs, 2) states."""
+
+        super(VecGridMapEnv, self).reset()
+
+        return self.reset_envs( np.ones( ( self.nEnvs, ), dtype=np.bool_ ) )
+
+    def get_state(self):
+        """
+        Override super class. Return copies of the per-agent arrays as a tuple for set_state().
+        The tuple is ( agentCurrentLocs, envSteps, envTotalValues, envTerminated,
+        stuckCounts, stuckStates, haveStuckStates, rngState ), where rngState is the
+        state of the NumPy random generator if random coordinating is enabled,
+        otherwise None.
+        """
+
+        if ( self.agentCurrentLoc is None ):
+            raise GridMap.GridMapException("The environment must be reset before get_state().")
+
+        return ( self.agentCurrentLocs.copy(), self.envSteps.copy(), \
+            self.envTotalValues.copy(), self.envTerminated.copy(), \
+            self.stuckCounts.copy(), self.stuckStates.copy(), self.haveStuckStates.copy(), \
+            np.random.get_state() if ( True == self.isRandomCoordinating ) else None )
+
+    def set_state(self, state):
+        """
+        Override super class. Restore the per-agent arrays from a tuple returned by get_state().
+        The agents do not record their histories, so state could be taken on any branch.
+        """
+
+        locs, steps, totalValues, terminated, stuckCounts, stuckStates, haveStuckStates, rngState = state
+
+        if ( locs.shape != self.agentCurrentLocs.shape ):
+            raise GridMap.GridMapException("The state is taken with {} agents. nEnvs = {}.".format( locs.shape[0], self.nEnvs ))
+
+        self.agentCurrentLocs[:] = locs
+        self.envSteps[:]         = steps
+        self.envTotalValues[:]   = totalValues
+        self.envTerminated[:]    = terminated
+        self.stuckCounts[:]      = stuckCounts
+        self.stuckStates[:]      = stuckStates
+        self.haveStuckStates[:]  = haveStuckStates
+
+        if ( rngState is not None ):
+            np.random.set_state( rngState )
+
+    def step(self, actions):
+        """
+        actions: An (nEnvs, 2) NumPy array.
+
+        Return values are the (nEnvs, 2) states, the (nEnvs,) values, the (nEnvs,)
+        termination flags, and an info dictionary. The "terminalStates" entry of
+        info holds the states of the agents before being automatically reset and
+        the "totalValues" entry holds the accumulated values of the episodes.
+        """
+
+        if ( True == self.envTerminated.any() ):
+            raise GridMap.GridMapException("Episode already terminated for agents {}.".format( np.nonzero( self.envTerminated )[0] ))
+
+        actions = np.asarray( actions, dtype=np.float64 ).reshape( ( self.nEnvs, 2 ) )
+
+        acts = actions.copy()
+
+        # Action clipping.
+        if ( True == self.flagActionClip ):
+            acts = np.clip( acts, self.actionClip[0], self.actionClip[1] )
+
+        # Non-dimensional step.
+        if ( True == self.nondimensionalStep ):
+            acts[:, 0] *= self.actStepSize[GridMap.GridMap2D.I_X]
+            acts[:, 1] *= self.actStepSize[GridMap.GridMap2D.I_Y]
+
+        # Random coordinating.
+        if ( True == self.isRandomCoordinating ):
+            acts += self.randomCoordinatingVariance * np.fabs( acts ) * np.random.randn( self.nEnvs, 2 )
+
+        # Move all the agents at once.
+        xs, ys, values, flags = self.try_move_array( \
+            self.agentCurrentLocs[:, 0], self.agentCurrentLocs[:, 1], acts[:, 0], acts[:, 1] )
+
+        self.agentCurrentLocs[:, 0] = xs
+        self.agentCurrentLocs[:, 1] = ys
+
+        # Additional action value.
+        if ( True == self.flagActionValue ):
+            values -= self.actionValueFactor * \
+                np.maximum( actions[:, 0]**2 + actions[:, 1]**2 - 1.0**2, 0.0 )
+
+        # Update counters.
+        self.envSteps += 1
+
+        # Check termination status.
+        if ( self.maxSteps > 0 ):
+            flags |= ( self.envSteps >= self.maxSteps )
+
+        states = self.make_states( self.agentCurrentLocs )
+
+        # Update total values. The stuck penalty below only replaces the returned values.
+        self.envTotalValues += values
+        self.envTerminated  |= flags
+
+        # Check stuck states.
+        if ( 0 != self.maxStuckCount ):
+            checking = self.haveStuckStates.copy()
+
+            # Agents without a saved stuck state.
+            self.stuckStates[~checking] = states[~checking]
+            self.haveStuckStates[~checking] = True
+
+            # Agents with a saved stuck state.
+            same = np.logical_and( \
+                states[:, 0] == self.stuckStates[:, 0], \
+                states[:, 1] == self.stuckStates[:, 1] )
+
+            moved = np.logical_and( checking, ~same )
+            self.stuckCounts[ np.logical_and( checking, same ) ] += 1
+            self.stuckCounts[moved]     = 0
+            self.haveStuckStates[moved] = False
+
+            stuck = np.logical_and( checking, self.maxStuckCount == self.stuckCounts )
+            values[stuck] = self.stuckPenaltyFactor * np.fabs( values[stuck] )
+            flags[stuck]  = True
+
+            self.envTerminated |= stuck
+
+        info = { "terminalStates": states.copy(), "totalValues": self.envTotalValues.copy() }
+
+        # Automatic reset.
+        if ( True == self.autoReset and flags.any() ):
+            states = self.reset_envs( flags )
+
+        return states, values, flags, info
+
+    def rollout(self, policy_fn, max_steps = None):
+        """
+        Override super class. Run step() for all the agents for a number of steps in one call.
+        policy_fn: A function taking the (nEnvs, 2) states and returning the (nEnvs, 2)
+        actions, or an (n, nEnvs, 2) array of actions. max_steps must be specified for
+        a function and is not used for an array.
+
+        Return four arrays of k rows, where k is the number of steps taken: the
+        (k, nEnvs, 2) states after every action, the (k, nEnvs, 2) actions, the
+        (k, nEnvs) values, and the (k, nEnvs) termination flags. The states of the
+        terminated agents are their final states, i.e., the "terminalStates" of
+        step(). If autoReset is True, the terminated agents restart from the starting
+        block and all the steps are taken. Otherwise, the loop stops at the step where
+        any of the agents terminates.
+        """
+
+        if ( not callable( policy_fn ) ):
+            actions = np.asarray( policy_fn, dtype=np.float64 ).reshape( ( -1, self.nEnvs, 2 ) )
+
+            return self.run_rollout( lambda i, states: actions[i], actions.shape[0], None )
+
+        if ( max_steps is None ):
+            raise ValueError("max_steps must be specified for a policy function.")
+
+        if ( max_steps < 0 ):
+            raise ValueError("max_steps must be a non-negative number. max_steps = {}.".format( max_steps ))
+
+        return self.run_rollout( lambda i, states: policy_fn( states ), max_steps, \
+            self.make_states( self.agentCurrentLocs ) )
+
+    def run_rollout(self, policy, maxSteps, state):
+        """
+        Override super class. The result arrays have an additional dimension of nEnvs.
+        """
+
+        states  = np.zeros( ( maxSteps, self.nEnvs, 2 ), dtype=np.float64 )
+        actions = np.zeros( ( maxSteps, self.nEnvs, 2 ), dtype=np.float64 )
+        values  = np.zeros( ( maxSteps, self.nEnvs ), dtype=np.float64 )
+        flags   = np.zeros( ( maxSteps, self.nEnvs ), dtype=np.bool_ )
+
+        k = 0
+
+        while ( k < maxSteps ):
+            actions[k] = policy( k, state )
+
+            state, values[k], flags[k], info = self.step( actions[k] )
+            states[k] = info["terminalStates"]
+
+            k += 1
+
+            if ( False == self.autoReset and flags[k-1].any() ):
+                break
+
+        return states[:k], actions[:k], values[:k], flags[:k]
+
+    def rollout_step(self, action):
+        """
+        Override super class. action is an (nEnvs, 2) array. Return the (nEnvs, 2)
+        states, the (nEnvs,) values, and the (nEnvs,) termination flags.
+        """
+
+        states, values, flags, info = self.step( action )
+
+        return states, values, flags
@@ -76,6 +76,94 @@ class TestGME_NP(unittest.TestCase):
 
         self.gmenp.render(3, flagSave=True)
 
+    def test_get_set_state(self):
+        print("test_get_set_state")
+
+        self.gmenp.enable_stuck_check( 2, -10 )
+        self.gmenp.reset()
+
+        # Stuck at the south boundary.
+        self.gmenp.step( np.array( [0, -1] ) )
+        self.gmenp.step( np.array( [0, -1] ) )
+        state = self.gmenp.get_state()
+        self.assertEqual( self.gmenp.stuckCount, 1 )
+
+        coor, val, flagTerm, _ = self.gmenp.step( np.array( [0, -1] ) )
+        self.assertTrue( flagTerm )
+
+        self.gmenp.set_state( state )
+        self.assertEqual( self.gmenp.stuckCount, 1 )
+        self.assertFalse( self.gmenp.is_terminated() )
+
+        coor, val, flagTerm, _ = self.gmenp.step( np.array( [0, -1] ) )
+        self.assertTrue( flagTerm )
+
+        self.gmenp.set_state( state )
+        coor, val, flagTerm, _ = self.gmenp.step( np.array( [0, 1] ) )
+        self.assertFalse( flagTerm )
+        self.assertEqual( self.gmenp.stuckCount, 0 )
+
+    def test_rollout(self):
+        print("test_rollout")
+
+        self.gmenp.enable_stuck_check( 3, -10 )
+
+        # Keep moving south. Stuck at the boundary after the first step.
+        seen = []
+
+        def policy(state):
+            seen.append( state.copy() )
+            return [ 0, -1 ]
+
+        states, actions, values, flags = self.gmenp.rollout( policy, 100 )
+
+        self.assertEqual( states.shape, ( 4, 2 ) )
+        self.assertTrue( flags[-1] )
+        self.assertFalse( flags[:-1].any() )
+        self.assertTrue( np.array_equal( seen[0], [ 0.5, 0.5 ] ) )
+        self.assertTrue( np.array_equal( seen[1], states[0] ) )
+
+        # Limited by max_steps.
+        self.gmenp.reset()
+        states, actions, values, flags = self.gmenp.rollout( lambda s: [ 0.1, 0.1 ], 5 )
+        self.assertEqual( values.shape, ( 5, ) )
+        self.assertFalse( flags.any() )
+        self.assertEqual( self.gmenp.nSteps, 5 )
+
+        # An action array.
+        self.gmenp.reset()
+        states, actions, values, flags = self.gmenp.rollout( np.ones( ( 3, 2 ) ) )
+        self.assertTrue( np.allclose( states[-1], [ 3.5, 3.5 ] ) )
+
+        self.assertRaises( ValueError, self.gmenp.rollout, policy )
+
+        # Limited by the maximum steps of the environment.
+        self.gmenp.set_max_steps( 4 )
+        self.gmenp.reset()
+        self.gmenp.step( np.array( [ 0.1, 0.1 ] ) )
+        states, actions, values, flags = self.gmenp.rollout( lambda s: [ 0.1, 0.1 ] )
+        self.assertEqual( flags.shape, ( 3, ) )
+        self.assertTrue( flags[-1] )
+
+    def test_set_trajectory(self):
+        print("test_set_trajectory")
+
+        t = np.array( [ [ 0.5, 0.5 ], [ 1.5, 2.5 ], [ 3.0, 2.5 ] ] )
+
+        self.gmenp.set_trajectory( t )
+        self.assertEqual( self.gmenp.nSteps, 3 )
+        self.assertTrue( np.array_equal( self.gmenp.get_trajectory_array(), t ) )
+        self.assertEqual( self.gmenp.get_action_array().shape, ( 2, 2 ) )
+
+        # Normalized coordinates.
+        self.gmenp.enable_normalized_coordinate()
+        state = self.gmenp.reset()
+
+        self.gmenp.set_trajectory( [ state, [ 0, 0 ] ] )
+        locs = self.gmenp.get_trajectory_array()
+        self.assertTrue( np.allclose( locs[0], [ 0.5, 0.5 ] ) )
+        self.assertTrue( np.allclose( locs[1], [ 10, 5 ] ) )
+
 class TestGME_NP_02(unittest.TestCase):
     def setUp(self):
         self.rows = 11
@@ -139,7 +227,288 @@ class TestGME_NP_02(unittest.TestCase):
 
         self.gmenp.render(3, flagSave=True)
 
+class TestVecGridMapEnv(unittest.TestCase):
+    def setUp(self):
+        self.rows = 11
+        self.cols = 11
+
+        gridMap = GridMap.GridMap2D(self.rows, self.cols, name="ZMap", outOfBoundValue=-200)
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_ending_block(100)
+        gridMap.initialize()
+
+        # Overwrite blocks.
+        gridMap.set_starting_block((0, 0))
+        gridMap.set_ending_block((10, 10))
+        gridMap.add_obstacle(( 2,  8))
+        gridMap.add_obstacle(( 2,  7))
+        gridMap.add_obstacle(( 2,  6))
+        gridMap.add_obstacle(( 2,  5))
+        gridMap.add_obstacle(( 3,  5))
+        gridMap.add_obstacle(( 4,  5))
+        gridMap.add_obstacle(( 5,  5))
+        gridMap.add_obstacle(( 6,  5))
+        gridMap.add_obstacle(( 7,  5))
+        gridMap.add_obstacle(( 8,  5))
+        gridMap.add_obstacle(( 8,  4))
+        gridMap.add_obstacle(( 8,  3))
+        gridMap.add_obstacle(( 8,  2))
+
+        self.gridMap    = gridMap
+        self.workingDir = "./WD_TestVecGridMapEnv"
+        self.nEnvs      = 4
+
+        self.vecEnv = EnvInterfaces.VecGridMapEnv( self.nEnvs, name="TestVecGridMapEnv", gridMap=gridMap, workingDir=self.workingDir )
+
+    def test_reset(self):
+        print("test_reset")
+
+        states = self.vecEnv.reset()
+
+        self.assertEqual( states.shape, ( self.nEnvs, 2 ) )
+        self.assertTrue( np.all( states[:, 0] == 0.5 ) )
+        self.assertTrue( np.all( states[:, 1] == 0.5 ) )
+
+    def test_step(self):
+        print("test_step")
+
+        self.vecEnv.reset()
+
+        actions = np.array( [ [10, 0], [0, 10], [1, 1], [-1, 0] ], dtype=np.float32 )
+        states, values, flags, info = self.vecEnv.step( actions )
+
+        self.assertEqual( states.shape, ( self.nEnvs, 2 ) )
+        self.assertEqual( values.shape, ( self.nEnvs, ) )
+        self.assertEqual( flags.shape, ( self.nEnvs, ) )
+
+        self.assertEqual( states[0, 0], 10.5 ); self.assertEqual( states[0, 1], 0.5 )
+        self.assertEqual( states[1, 0], 0.5 ); self.assertEqual( states[1, 1], 10.5 )
+        self.assertEqual( states[2, 0], 1.5 ); self.assertEqual( states[2, 1], 1.5 )
+        self.assertEqual( states[3, 0], 0.0 ); self.assertEqual( states[3, 1], 0.5 )
+        self.assertEqual( values[3], -200 )
+        self.assertFalse( flags.any() )
+
+        # Agent 0 reaches the ending block and is reset automatically.
+        actions = np.array( [ [0, 10], [1, 0], [1, 1], [1, 0] ], dtype=np.float32 )
+        states, values, flags, info = self.vecEnv.step( actions )
+
+        self.assertTrue( flags[0] )
+        self.assertFalse( flags[1:].any() )
+        self.assertEqual( values[0], 100 )
+        self.assertEqual( info["totalValues"][0], 99 )
+        self.assertEqual( info["terminalStates"][0, 0], 10.5 )
+        self.assertEqual( info["terminalStates"][0, 1], 10.5 )
+        self.assertEqual( states[0, 0], 0.5 ); self.assertEqual( states[0, 1], 0.5 )
+        self.assertEqual( self.vecEnv.envSteps[0], 0 )
+        self.assertEqual( self.vecEnv.envSteps[1], 2 )
+
+    def test_no_auto_reset(self):
+        print("test_no_auto_reset")
+
+        self.vecEnv.autoReset = False
+        self.vecEnv.reset()
+
+        self.vecEnv.step( np.array( [ [10, 0], [1, 0], [1, 0], [1, 0] ] ) )
+        states, values, flags, info = self.vecEnv.step( np.array( [ [0, 10], [1, 0], [1, 0], [1, 0] ] ) )
+
+        self.assertTrue( flags[0] )
+        self.assertEqual( states[0, 0], 10.5 ); self.assertEqual( states[0, 1], 10.5 )
+
+        self.assertRaises( GridMap.GridMapException, self.vecEnv.step, np.ones( ( self.nEnvs, 2 ) ) )
+
+        states = self.vecEnv.reset_envs( flags )
+        self.assertEqual( states[0, 0], 0.5 ); self.assertEqual( states[0, 1], 0.5 )
+        self.assertEqual( states[1, 0], 2.5 ); self.assertEqual( states[1, 1], 0.5 )
+
+    def test_get_set_state(self):
+        print("test_get_set_state")
+
+        self.vecEnv.enable_stuck_check( 2, -10 )
+        self.assertRaises( GridMap.GridMapException, self.vecEnv.get_state )
+
+        self.vecEnv.reset()
+
+        actions = np.array( [ [10, 0], [0, 10], [1, 1], [-1, 0] ], dtype=np.float64 )
+        self.vecEnv.step( actions )
+        state = self.vecEnv.get_state()
+
+        # Agent 0 terminates and agent 3 gets stuck.
+        actions = np.array( [ [0, 10], [1, 0], [1, 1], [-1, 0] ], dtype=np.float64 )
+        res = self.vecEnv.step( actions )
+        self.vecEnv.step( actions )
+
+        self.vecEnv.set_state( state )
+
+        self.assertTrue( np.array_equal( self.vecEnv.agentCurrentLocs, state[0] ) )
+        self.assertTrue( ( self.vecEnv.envSteps == 1 ).all() )
+        self.assertTrue( np.array_equal( self.vecEnv.envTotalValues, [ -1, -1, -1, -200 ] ) )
+        self.assertEqual( self.vecEnv.stuckCounts[3], 0 )
+        self.assertTrue( self.vecEnv.haveStuckStates.all() )
+
+        # The same step again.
+        resAgain = self.vecEnv.step( actions )
+
+        for a, b in zip( res[:3], resAgain[:3] ):
+            self.assertTrue( np.array_equal( a, b ) )
+
+        self.assertTrue( np.array_equal( res[3]["totalValues"], resAgain[3]["totalValues"] ) )
+
+        # The state is a copy.
+        self.assertTrue( ( state[1] == 1 ).all() )
+
+        vecEnv = EnvInterfaces.VecGridMapEnv( 2, gridMap=self.gridMap, workingDir=self.workingDir )
+        self.assertRaises( GridMap.GridMapException, vecEnv.set_state, state )
+
+    def test_rollout(self):
+        print("test_rollout")
+
+        self.vecEnv.reset()
+
+        # An action array. Agent 0 reaches the ending block at the second step.
+        actions = np.zeros( ( 3, self.nEnvs, 2 ) )
+        actions[0] = [ [10, 0], [0, 10], [1, 1], [-1, 0] ]
+        actions[1] = [ [0, 10], [1, 0], [1, 1], [1, 0] ]
+        actions[2] = [ [1, 0], [1, 0], [1, 1], [1, 0] ]
+
+        states, acts, values, flags = self.vecEnv.rollout( actions )
+
+        self.assertEqual( states.shape, ( 3, self.nEnvs, 2 ) )
+        self.assertEqual( values.shape, ( 3, self.nEnvs ) )
+        self.assertEqual( flags.shape, ( 3, self.nEnvs ) )
+        self.assertTrue( np.array_equal( acts, actions ) )
+
+        self.assertTrue( flags[1, 0] )
+        self.assertEqual( flags.sum(), 1 )
+        self.assertEqual( values[1, 0], 100 )
+        self.assertTrue( np.array_equal( states[1, 0], [ 10.5, 10.5 ] ) )
+        self.assertTrue( np.array_equal( states[2, 0], [ 1.5, 0.5 ] ) )
+        self.assertTrue( np.array_equal( states[2, 2], [ 3.5, 3.5 ] ) )
+        self.assertEqual( values[0, 3], -200 )
+
+        # A policy function.
+        self.vecEnv.reset()
+        seen = []
+
+        def policy(states):
+            seen.append( states.copy() )
+            return np.ones( ( self.nEnvs, 2 ) )
+
+        states, acts, values, flags = self.vecEnv.rollout( policy, 2 )
+
+        self.assertEqual( values.shape, ( 2, self.nEnvs ) )
+        self.assertTrue( ( seen[0] == 0.5 ).all() )
+        self.assertTrue( np.array_equal( seen[1], states[0] ) )
+        self.assertTrue( ( self.vecEnv.envSteps == 2 ).all() )
+
+        self.assertRaises( ValueError, self.vecEnv.rollout, policy )
+
+        # Without auto reset, the rollout stops when any agent terminates.
+        self.vecEnv.autoReset = False
+        self.vecEnv.reset()
+
+        states, acts, values, flags = self.vecEnv.rollout( actions )
+
+        self.assertEqual( flags.shape, ( 2, self.nEnvs ) )
+        self.assertTrue( flags[-1, 0] )
+
+    def test_same_as_GME_NP(self):
+        print("test_same_as_GME_NP")
+
+        def configure(env):
+            env.enable_action_clipping( -1, 1 )
+            env.enable_nondimensional_step()
+            env.enable_normalized_coordinate()
+            env.enable_ending_point_radius( 2.0 )
+            env.enable_stuck_check( 2, -10 )
+            env.set_max_steps( 30 )
+
+        configure( self.vecEnv )
+        states = self.vecEnv.reset()
+
+        envs = []
+        for i in range( self.nEnvs ):
+            env = EnvInterfaces.GME_NP( gridMap=self.gridMap, workingDir=self.workingDir )
+            configure( env )
+            env.reset()
+            envs.append( env )
+
+        np.random.seed(0)
+
+        for k in range( 30 ):
+            actions = np.random.rand( self.nEnvs, 2 ) * 3 - 1
+            states, values, flags, info = self.vecEnv.step( actions )
+
+            for i in range( self.nEnvs ):
+                state, val, flagTerm, _ = envs[i].step( actions[i, :] )
+
+                self.assertEqual( info["terminalStates"][i, 0], state[0] )
+                self.assertEqual( info["terminalStates"][i, 1], state[1] )
+                self.assertEqual( values[i], val )
+                self.assertEqual( flags[i], flagTerm )
+
+                # The stuck penalty is in neither of the total values.
+                self.assertEqual( info["totalValues"][i], envs[i].totalValue )
+
+                if ( flagTerm ):
+                    envs[i].reset()
+
+    def test_stuck_total_value(self):
+        print("test_stuck_total_value")
+
+        env = EnvInterfaces.GME_NP( gridMap=self.gridMap, workingDir=self.workingDir )
+        env.enable_stuck_check( 1, -10 )
+        env.reset()
+
+        # Walk into the west boundary and get stuck.
+        env.step( np.array( [ -1, 0 ] ) )
+        total = env.totalValue
+
+        state, val, flagTerm, _ = env.step( np.array( [ -1, 0 ] ) )
+
+        # The penalty replaces the returned value only.
+        self.assertTrue( flagTerm )
+        self.assertEqual( val, -10 * 200 )
+        self.assertEqual( env.totalValue, total - 200 )
+
+        # The same for VecGridMapEnv.
+        self.vecEnv.enable_stuck_check( 1, -10 )
+        self.vecEnv.reset()
+
+        actions = np.zeros( ( self.nEnvs, 2 ), dtype=np.float64 )
+        actions[:, 0] = -1
+
+        self.vecEnv.step( actions )
+        states, values, flags, info = self.vecEnv.step( actions )
+
+        self.assertTrue( flags.all() )
+        self.assertTrue( ( values == -10 * 200 ).all() )
+        self.assertTrue( ( info["totalValues"] == total - 200 ).all() )
+
+    def test_move_array_engines(self):
+        print("test_move_array_engines")
+
+        self.vecEnv.reset()
+
+        actions = np.array( [ [10, 0], [0, 10], [1, 1], [-1, 0] ], dtype=np.float64 )
+
+        ref = EnvInterfaces.VecGridMapEnv( self.nEnvs, gridMap=self.gridMap, workingDir=self.workingDir )
+        ref.disable_grid_traversal()
+        ref.reset()
+
+        # The line intersection engine moves the agents one by one.
+        for i in range(3):
+            res = self.vecEnv.step( actions )
+            resRef = ref.step( actions )
+
+            for a, b in zip( res[:3], resRef[:3] ):
+                self.assertTrue( np.array_equal( a, b ) )
+
+        # Zero actions are not allowed.
+        actions[2] = 0
+        self.assertRaises( ValueError, self.vecEnv.step, actions )
+
 if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromTestCase( TestGME_NP )
     suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestGME_NP_02 ) )
+    suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestVecGridMapEnv ) )
     unittest.TextTestRunner().run( suite )
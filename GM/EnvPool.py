@@ -0,0 +1,274 @@
+from __future__ import print_function
+
+import multiprocessing
+import numpy as np
+import os
+import shutil
+import tempfile
+import traceback
+
+from multiprocessing.sharedctypes import RawArray
+
+import GridMap
+import EnvInterfaces
+
+# Commands sent to the workers.
+CMD_RESET      = "reset"
+CMD_RESET_ENVS = "reset_envs"
+CMD_STEP       = "step"
+CMD_CALL       = "call"
+CMD_CLOSE      = "close"
+
+class SharedMap(object):
+    """
+    The block arrays and the passability tables of a GridMap2D copied into shared
+    memory once. attach() creates a GridMap2D on top of the shared arrays without
+    copying. A SharedMap could be passed to multiprocessing.Process as an argument.
+    The attached maps are read-only.
+    """
+
+    # Name, typecode, and dtype of the shared arrays.
+    ARRAYS = [ \
+        ( "blockTypes",        "b", np.int8 ), \
+        ( "blockValues",       "d", np.float64 ), \
+        ( "vertexBlockedDirs", "B", np.uint8 ), \
+        ( "hLineBlockedDirs",  "B", np.uint8 ), \
+        ( "vLineBlockedDirs",  "B", np.uint8 ) ]
+
+    def __init__(self, gridMap):
+        if ( gridMap.blockTypes is None ):
+            raise GridMap.GridMapException("Map must be initialized before being shared.")
+
+        if ( True == gridMap.isPassabilityOutdated ):
+            gridMap.update_passability()
+
+        self.description = gridMap.get_description()
+
+        self.shapes = {}
+        self.buffers = {}
+
+        for name, typecode, dtype in SharedMap.ARRAYS:
+            a = getattr( gridMap, name )
+
+            buf = RawArray( typecode, a.size )
+            np.frombuffer( buf, dtype = dtype )[:] = a.ravel()
+
+            self.shapes[name] = a.shape
+            self.buffers[name] = buf
+
+    def get_array(self, name):
+        """Return a read-only NumPy view of the shared array name."""
+
+        dtype = [ a[2] for a in SharedMap.ARRAYS if a[0] == name ][0]
+
+        a = np.frombuffer( self.buffers[name], dtype = dtype ).reshape( self.shapes[name] )
+        a.flags.writeable = False
+
+        return a
+
+    def attach(self):
+        """Return a GridMap2D using the shared arrays."""
+
+        gridMap = GridMap.GridMap2D( self.description["rows"], self.description["cols"] )
+        gridMap.attach_arrays( self.description, self.get_array("blockTypes"), self.get_array("blockValues") )
+
+        gridMap.vertexBlockedDirs = self.get_array("vertexBlockedDirs")
+        gridMap.hLineBlockedDirs  = self.get_array("hLineBlockedDirs")
+        gridMap.vLineBlockedDirs  = self.get_array("vLineBlockedDirs")
+        gridMap.isPassabilityOutdated = False
+
+        return gridMap
+
+def run_worker(conn, sharedMap, nEnvs, workingDir, autoReset, setupFn, seed):
+    """The loop of a worker process. Serve the commands from conn until CMD_CLOSE."""
+
+    try:
+        env = EnvInterfaces.VecGridMapEnv( nEnvs, gridMap = sharedMap.attach(), workingDir = workingDir, autoReset = autoReset )
+
+        if ( setupFn is not None ):
+            setupFn( env )
+
+        if ( seed is not None ):
+            np.random.seed( seed )
+    except Exception:
+        env = None
+        initError = traceback.format_exc()
+
+    while ( True ):
+        try:
+            cmd, args = conn.recv()
+        except EOFError:
+            break
+
+        if ( CMD_CLOSE == cmd ):
+            break
+
+        if ( env is None ):
+            conn.send( ( False, initError ) )
+            continue
+
+        try:
+            if ( CMD_STEP == cmd ):
+                res = env.step( args )
+            elif ( CMD_RESET == cmd ):
+                res = env.reset()
+            elif ( CMD_RESET_ENVS == cmd ):
+                res = env.reset_envs( args )
+            elif ( CMD_CALL == cmd ):
+                res = getattr( env, args[0] )( *args[1] )
+            else:
+                raise GridMap.GridMapException("Unexpected command {}.".format( cmd ))
+
+            conn.send( ( True, res ) )
+        except Exception:
+            conn.send( ( False, traceback.format_exc() ) )
+
+    conn.close()
+
+class EnvPool(object):
+    """
+    Run nWorkers x nEnvsPerWorker agents in worker processes. The map is placed in
+    shared memory once by SharedMap and every worker holds a VecGridMapEnv attached
+    to it. The actions of every call of step() are split by worker and sent over
+    pipes in one batch per worker.
+
+    The interface is the same with VecGridMapEnv. The states, values, and flags of
+    all the agents are concatenated in the order of the workers.
+
+    setupFn is called with the VecGridMapEnv of every worker to apply the settings,
+    e.g., action clipping. It must be picklable where the processes are spawned
+    instead of forked.
+    """
+
+    def __init__(self, gridMap, nWorkers, nEnvsPerWorker = 1, workingDir = None, autoReset = True, setupFn = None, seed = None):
+        """
+        seed: Worker i seeds NumPy with seed + i. None for not seeding.
+        workingDir: Worker i works in the sub-directory Worker<i> of workingDir.
+        A temporary directory is created and removed by close() if None.
+        """
+
+        if ( nWorkers < 1 or nEnvsPerWorker < 1 ):
+            raise ValueError("nWorkers and nEnvsPerWorker must be positive. nWorkers = {}, nEnvsPerWorker = {}.".format( nWorkers, nEnvsPerWorker ))
+
+        self.nWorkers       = nWorkers
+        self.nEnvsPerWorker = nEnvsPerWorker
+        self.nEnvs          = nWorkers * nEnvsPerWorker
+
+        if ( workingDir is None ):
+            self.workingDir = tempfile.mkdtemp( prefix = "EnvPool_" )
+            self.isTempWorkingDir = True
+        else:
+            self.workingDir = workingDir
+            self.isTempWorkingDir = False
+
+        self.sharedMap = SharedMap( gridMap )
+
+        self.conns = []
+        self.processes = []
+
+        for i in range( nWorkers ):
+            parentConn, childConn = multiprocessing.Pipe()
+
+            p = multiprocessing.Process( target = run_worker, \
+                args = ( childConn, self.sharedMap, nEnvsPerWorker, os.path.join( self.workingDir, "Worker%d" % (i) ), autoReset, setupFn, \
+                    None if ( seed is None ) else seed + i ) )
+            p.daemon = True
+            p.start()
+
+            childConn.close()
+
+            self.conns.append( parentConn )
+            self.processes.append( p )
+
+        self.isClosed = False
+
+    def send(self, cmd, args = None):
+        """Send the command to all the workers. args is a list with one entry per worker, or None."""
+
+        if ( True == self.isClosed ):
+            raise GridMap.GridMapException("EnvPool already closed.")
+
+        for i, conn in enumerate( self.conns ):
+            conn.send( ( cmd, None if ( args is None ) else args[i] ) )
+
+    def receive(self):
+        """Return the list of the results of all the workers."""
+
+        results = [ conn.recv() for conn in self.conns ]
+
+        errors = [ r[1] for r in results if ( False == r[0] ) ]
+
+        if ( len(errors) > 0 ):
+            raise GridMap.GridMapException("{} worker(s) failed.\n{}".format( len(errors), errors[0] ))
+
+        return [ r[1] for r in results ]
+
+    def split(self, a):
+        """Split the array a of nEnvs rows into one array per worker."""
+
+        return np.split( np.asarray(a), self.nWorkers )
+
+    def reset(self):
+        """Reset all the agents. Return the (nEnvs, 2) states."""
+
+        self.send( CMD_RESET )
+
+        return np.concatenate( self.receive() )
+
+    def reset_envs(self, mask):
+        """Reset the agents selected by the boolean array mask. Return the (nEnvs, 2) states."""
+
+        self.send( CMD_RESET_ENVS, self.split( np.asarray( mask, dtype=np.bool_ ) ) )
+
+        return np.concatenate( self.receive() )
+
+    def step(self, actions):
+        """
+        actions: An (nEnvs, 2) NumPy array.
+
+        Return values are the same with VecGridMapEnv.step().
+        """
+
+        actions = np.asarray( actions, dtype=np.float64 ).reshape( ( self.nEnvs, 2 ) )
+
+        self.send( CMD_STEP, self.split( actions ) )
+
+        results = self.receive()
+
+        states = np.concatenate( [ r[0] for r in results ] )
+        values = np.concatenate( [ r[1] for r in results ] )
+        flags  = np.concatenate( [ r[2] for r in results ] )
+
+        info = {}
+        for key in results[0][3].keys():
+            info[key] = np.concatenate( [ r[3][key] for r in results ] )
+
+        return states, values, flags, info
+
+    def call(self, name, *args):
+        """Call the method name of the VecGridMapEnv of every worker. Return the list of the results."""
+
+        self.send( CMD_CALL, [ ( name, args ) ] * self.nWorkers )
+
+        return self.receive()
+
+    def close(self):
+        if ( True == self.isClosed ):
+            return
+
+        for conn in self.conns:
+            try:
+                conn.send( ( CMD_CLOSE, None ) )
+            except ( IOError, OSError ):
+                pass
+
+        for p in self.processes:
+            p.join()
+
+        for conn in self.conns:
+            conn.close()
+
+        if ( True == self.isTempWorkingDir ):
+            shutil.rmtree( self.workingDir, ignore_errors = True )
+
+        self.isClosed = True
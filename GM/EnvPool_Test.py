@@ -0,0 +1,133 @@
+from __future__ import print_function
+
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+import GridMap
+import EnvInterfaces
+import EnvPool
+
+def setup_env(env):
+    env.enable_action_clipping( -1, 1 )
+
+class TestEnvPool(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "EnvPoolTest_" )
+
+        gridMap = GridMap.GridMap2D( 10, 20, outOfBoundValue = -200 )
+
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_starting_block(0)
+        gridMap.set_value_ending_block(100)
+        gridMap.set_value_obstacle_block(-100)
+
+        gridMap.initialize()
+        gridMap.set_starting_block( ( 0, 0 ) )
+        gridMap.set_ending_block( ( 3, 3 ) )
+        gridMap.add_obstacle( ( 1, 2 ) )
+        gridMap.add_obstacle( ( 5, 10 ) )
+
+        self.gridMap = gridMap
+
+    def tearDown(self):
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_shared_map(self):
+        print("test_shared_map")
+
+        sharedMap = EnvPool.SharedMap( self.gridMap )
+
+        m0 = sharedMap.attach()
+        m1 = sharedMap.attach()
+
+        # The maps use the same memory without copying.
+        self.assertTrue( np.may_share_memory( m0.blockTypes, m1.blockTypes ) )
+        self.assertTrue( np.may_share_memory( m0.vertexBlockedDirs, m1.vertexBlockedDirs ) )
+        self.assertFalse( m0.blockValues.flags.writeable )
+
+        self.assertTrue( np.array_equal( m0.blockTypes, self.gridMap.blockTypes ) )
+        self.assertTrue( np.array_equal( m0.blockValues, self.gridMap.blockValues ) )
+        self.assertTrue( np.array_equal( m0.hLineBlockedDirs, self.gridMap.hLineBlockedDirs ) )
+        idx = m0.get_index_ending_block()
+        self.assertEqual( ( idx.r, idx.c ), ( 3, 3 ) )
+        self.assertTrue( m0.haveStartingBlock )
+        self.assertTrue( m0.is_obstacle_block( ( 5, 10 ) ) )
+        self.assertFalse( m0.isPassabilityOutdated )
+
+    def test_step(self):
+        print("test_step")
+
+        nWorkers, nEnvsPerWorker = 2, 3
+
+        pool = EnvPool.EnvPool( self.gridMap, nWorkers, nEnvsPerWorker, workingDir = self.workingDir, setupFn = setup_env )
+
+        # The reference runs all the agents in the current process.
+        ref = EnvInterfaces.VecGridMapEnv( nWorkers * nEnvsPerWorker, gridMap = self.gridMap, workingDir = self.workingDir )
+        setup_env( ref )
+
+        try:
+            self.assertTrue( np.array_equal( pool.reset(), ref.reset() ) )
+
+            rng = np.random.RandomState(0)
+
+            for i in range(30):
+                actions = rng.uniform( -0.5, 1.5, ( pool.nEnvs, 2 ) )
+
+                res = pool.step( actions )
+                resRef = ref.step( actions )
+
+                for a, b in zip( res[:3], resRef[:3] ):
+                    self.assertTrue( np.array_equal( a, b ) )
+
+                for key in resRef[3].keys():
+                    self.assertTrue( np.array_equal( res[3][key], resRef[3][key] ) )
+
+            # Change the settings of the workers.
+            self.assertEqual( pool.call( "enable_action_clipping", -0.5, 0.5 ), [ None ] * nWorkers )
+            ref.enable_action_clipping( -0.5, 0.5 )
+
+            actions = rng.uniform( -1.5, 1.5, ( pool.nEnvs, 2 ) )
+            self.assertTrue( np.array_equal( pool.step( actions )[0], ref.step( actions )[0] ) )
+
+            mask = np.zeros( ( pool.nEnvs, ), dtype=np.bool_ )
+            mask[4] = True
+            self.assertTrue( np.array_equal( pool.reset_envs( mask ), ref.reset_envs( mask ) ) )
+        finally:
+            pool.close()
+
+        self.assertTrue( os.path.isdir( os.path.join( self.workingDir, "Worker1" ) ) )
+        self.assertRaises( GridMap.GridMapException, pool.reset )
+
+    def test_errors(self):
+        print("test_errors")
+
+        pool = EnvPool.EnvPool( self.gridMap, 2, autoReset = False )
+        workingDir = pool.workingDir
+
+        try:
+            pool.reset()
+
+            # Walk into the ending block.
+            for i in range(3):
+                states, values, flags, info = pool.step( np.ones( ( 2, 2 ) ) * 1.2 )
+
+            self.assertTrue( flags.all() )
+
+            # Stepping a terminated agent.
+            self.assertRaises( GridMap.GridMapException, pool.step, np.ones( ( 2, 2 ) ) )
+
+            # The workers still serve.
+            pool.reset()
+        finally:
+            pool.close()
+
+        self.assertFalse( os.path.isdir( workingDir ) )
+
+        self.assertRaises( ValueError, EnvPool.EnvPool, self.gridMap, 0 )
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestEnvPool )
+    unittest.TextTestRunner().run( suite )
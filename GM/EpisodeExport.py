@@ -0,0 +1,281 @@
+from __future__ import print_function
+
+import math
+import numpy as np
+import os
+import struct
+
+import GridMap
+import RenderBackends
+
+def lzw_encode(indices, minCodeSize):
+    """
+    Compress a sequence of color indices with the variable-length-code LZW of GIF.
+    Return the compressed bytes without the sub-block framing.
+    """
+
+    clearCode = 1 << minCodeSize
+    eoiCode   = clearCode + 1
+
+    out = bytearray()
+    acc = [ 0, 0 ] # The bit accumulator and the number of bits in it.
+
+    state = { "codeSize": minCodeSize + 1, "nextCode": eoiCode + 1 }
+
+    def emit(code):
+        acc[0] |= code << acc[1]
+        acc[1] += state["codeSize"]
+
+        while ( acc[1] >= 8 ):
+            out.append( acc[0] & 0xFF )
+            acc[0] >>= 8
+            acc[1] -= 8
+
+        # The decoder grows the code size one entry behind the encoder.
+        if ( state["nextCode"] > ( 1 << state["codeSize"] ) - 1 and state["codeSize"] < 12 ):
+            state["codeSize"] += 1
+
+    def emit_clear():
+        # The clear code is written with the current code size.
+        acc[0] |= clearCode << acc[1]
+        acc[1] += state["codeSize"]
+
+        while ( acc[1] >= 8 ):
+            out.append( acc[0] & 0xFF )
+            acc[0] >>= 8
+            acc[1] -= 8
+
+        state["codeSize"] = minCodeSize + 1
+        state["nextCode"] = eoiCode + 1
+
+    table = {}
+    emit_clear()
+
+    it = iter( indices )
+    prefix = next(it)
+
+    for k in it:
+        key = ( prefix << 8 ) | k
+        code = table.get(key)
+
+        if ( code is not None ):
+            prefix = code
+            continue
+
+        emit(prefix)
+
+        if ( state["nextCode"] < 4096 ):
+            table[key] = state["nextCode"]
+            state["nextCode"] += 1
+        else:
+            emit_clear()
+            table = {}
+
+        prefix = k
+
+    emit(prefix)
+    emit(eoiCode)
+
+    if ( acc[1] > 0 ):
+        out.append( acc[0] & 0xFF )
+
+    return bytes(out)
+
+def quantize_332(img):
+    """Reduce an RGB image to at most 256 colors, 3 bits for red and green, 2 bits for blue."""
+
+    img = img.astype(np.uint16)
+
+    r = ( img[..., 0] * 7 + 127 ) // 255 * 255 // 7
+    g = ( img[..., 1] * 7 + 127 ) // 255 * 255 // 7
+    b = ( img[..., 2] * 3 + 127 ) // 255 * 255 // 3
+
+    return np.stack( ( r, g, b ), axis = -1 ).astype(np.uint8)
+
+def make_palette(img):
+    """
+    Return ( palette, indices ) of an RGB image. palette is an N x 3 uint8 array
+    with N <= 256. The colors are exact if the image has no more than 256 colors.
+    """
+
+    packed = ( img[..., 0].astype(np.int32) << 16 ) | ( img[..., 1].astype(np.int32) << 8 ) | img[..., 2]
+    colors, indices = np.unique( packed.ravel(), return_inverse = True )
+
+    if ( colors.size > 256 ):
+        return make_palette( quantize_332(img) )
+
+    palette = np.stack( ( colors >> 16, ( colors >> 8 ) & 0xFF, colors & 0xFF ), axis = 1 ).astype(np.uint8)
+
+    return palette, indices.reshape( img.shape[:2] )
+
+class GifWriter(object):
+    """
+    Write an animated GIF frame by frame. Only the changed rectangle of every
+    frame is stored. The memory does not depend on the number of frames.
+    """
+
+    def __init__(self, fn, frameDelay = 0.1, loop = 0):
+        """
+        frameDelay: Time between the frames in seconds. Resolution is 0.01 second.
+        loop: Number of loops. 0 for looping forever.
+        """
+
+        self.fn = fn
+        self.delay = int( round( frameDelay * 100 ) )
+        self.loop = loop
+
+        self.fp = None
+        self.lastFrame = None
+        self.nFrames = 0
+
+    def write_header(self, h, w):
+        if ( h > 65535 or w > 65535 ):
+            raise ValueError("GIF could not be larger than 65535 x 65535. Got %d x %d." % ( h, w ))
+
+        self.fp = open( self.fn, "wb" )
+
+        # No global color table.
+        self.fp.write( b"GIF89a" + struct.pack( "<HHBBB", w, h, 0, 0, 0 ) )
+
+        # Looping.
+        self.fp.write( b"\x21\xFF\x0BNETSCAPE2.0\x03\x01" + struct.pack( "<H", self.loop ) + b"\x00" )
+
+    def write_frame(self, img):
+        """img: An H x W x 3 uint8 array. All the frames must have the same size."""
+
+        img = np.asarray( img, dtype = np.uint8 )
+        h, w = img.shape[:2]
+
+        if ( self.fp is None ):
+            self.write_header( h, w )
+            r0, r1, c0, c1 = 0, h, 0, w
+        else:
+            if ( img.shape != self.lastFrame.shape ):
+                raise ValueError("Frame size changed from %s to %s." % ( str(self.lastFrame.shape), str(img.shape) ))
+
+            changed = np.any( img != self.lastFrame, axis = 2 )
+            rs = np.flatnonzero( changed.any( axis = 1 ) )
+            cs = np.flatnonzero( changed.any( axis = 0 ) )
+
+            if ( 0 == rs.size ):
+                # Nothing changed. Still write a pixel to keep the timing.
+                r0, r1, c0, c1 = 0, 1, 0, 1
+            else:
+                r0, r1, c0, c1 = rs[0], rs[-1] + 1, cs[0], cs[-1] + 1
+
+        palette, indices = make_palette( img[ r0:r1, c0:c1 ] )
+
+        bits = max( 1, int( math.ceil( math.log( palette.shape[0], 2 ) ) ) ) if ( palette.shape[0] > 1 ) else 1
+        table = np.zeros( ( 1 << bits, 3 ), dtype = np.uint8 )
+        table[ :palette.shape[0] ] = palette
+
+        # Graphic control extension. Do not dispose the previous frame.
+        self.fp.write( b"\x21\xF9\x04" + struct.pack( "<BHBB", 1 << 2, self.delay, 0, 0 ) )
+
+        # Image descriptor with a local color table.
+        self.fp.write( b"\x2C" + struct.pack( "<HHHHB", c0, r0, c1 - c0, r1 - r0, 0x80 | ( bits - 1 ) ) )
+        self.fp.write( table.tobytes() )
+
+        minCodeSize = max( 2, bits )
+        data = lzw_encode( indices.ravel().tolist(), minCodeSize )
+
+        self.fp.write( struct.pack( "<B", minCodeSize ) )
+
+        for i in range( 0, len(data), 255 ):
+            block = data[ i:i+255 ]
+            self.fp.write( struct.pack( "<B", len(block) ) + block )
+
+        self.fp.write( b"\x00" )
+
+        self.lastFrame = img.copy()
+        self.nFrames += 1
+
+    def close(self):
+        if ( self.fp is not None ):
+            self.fp.write( b"\x3B" )
+            self.fp.close()
+            self.fp = None
+
+        self.lastFrame = None
+
+class ImageSequenceWriter(object):
+    """Write every frame as a PNG file in a directory."""
+
+    def __init__(self, dirName, fnPattern = "%06d.png"):
+        self.dirName = dirName
+        self.fnPattern = fnPattern
+        self.nFrames = 0
+
+        if ( not os.path.isdir( self.dirName ) ):
+            os.makedirs( self.dirName )
+
+    def write_frame(self, img):
+        RenderBackends.write_png( os.path.join( self.dirName, self.fnPattern % ( self.nFrames ) ), img )
+        self.nFrames += 1
+
+    def close(self):
+        pass
+
+def iterate_frames(env, pixelsPerBlock = None):
+    """
+    Generate the frames of the agent history of env, one frame per agent location.
+    Every frame draws one more agent location and path segment on top of the
+    previous one, starting from the cached map layer. The same array is
+    yielded every time. Copy it if it needs to be kept.
+    """
+
+    if ( pixelsPerBlock is None ):
+        pixelsPerBlock = env.visPixelsPerBlock
+
+    backend = RenderBackends.ArrayRenderBackend( pixelsPerBlock )
+
+    img = backend.get_map_layer(env).copy()
+
+    sx, sy = backend.get_pixel_scale(env)
+    rx = env.visAgentRadius * sx
+    ry = env.visAgentRadius * sy
+    halfWidth = 0.5 * env.visPathArrowWidth * min( sx, sy )
+
+    agentColor = RenderBackends.hex_to_rgba( RenderBackends.ArrayRenderBackend.AGENT_COLOR )
+    pathColor  = RenderBackends.hex_to_rgba( RenderBackends.ArrayRenderBackend.PATH_COLOR )
+
+    last = None
+
+    # Index the rows instead of converting the whole history into a list.
+    locs = env.history.get_locs()
+
+    for i in range( locs.shape[0] ):
+        px, py = backend.convert_to_pixels( env, locs[i, 0], locs[i, 1] )
+        px, py = float(px), float(py)
+
+        backend.draw_disk( img, px, py, rx, ry, agentColor )
+
+        if ( last is not None ):
+            backend.draw_path( img, [ last[0], px ], [ last[1], py ], halfWidth, pathColor )
+
+        last = ( px, py )
+
+        yield img
+
+def export_episode(env, fn, pixelsPerBlock = None, frameDelay = 0.1):
+    """
+    Export the agent history of env frame by frame. fn ending with .gif produces
+    an animated GIF. Otherwise fn is a directory to write a PNG image per frame.
+    Return the number of frames.
+    """
+
+    if ( env.map is None ):
+        raise GridMap.GridMapException("Map must be set in order to export the episode.")
+
+    if ( fn.lower().endswith(".gif") ):
+        writer = GifWriter( fn, frameDelay )
+    else:
+        writer = ImageSequenceWriter( fn )
+
+    try:
+        for img in iterate_frames( env, pixelsPerBlock ):
+            writer.write_frame(img)
+    finally:
+        writer.close()
+
+    return writer.nFrames
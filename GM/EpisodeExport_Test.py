@@ -0,0 +1,203 @@
+from __future__ import print_function
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import GridMap
+import EpisodeExport
+
+def lzw_decode(data, minCodeSize):
+    """A straightforward GIF LZW decoder for testing."""
+
+    clearCode = 1 << minCodeSize
+    eoiCode   = clearCode + 1
+
+    bits = 0
+    nBits = 0
+    pos = 0
+
+    out = []
+    table = None
+    codeSize = minCodeSize + 1
+    prev = None
+
+    data = bytearray(data)
+
+    while ( True ):
+        while ( nBits < codeSize ):
+            bits |= data[pos] << nBits
+            pos += 1
+            nBits += 8
+
+        code = bits & ( ( 1 << codeSize ) - 1 )
+        bits >>= codeSize
+        nBits -= codeSize
+
+        if ( code == clearCode ):
+            table = [ [i] for i in range( clearCode ) ] + [ None, None ]
+            codeSize = minCodeSize + 1
+            prev = None
+            continue
+
+        if ( code == eoiCode ):
+            return out
+
+        if ( code < len(table) ):
+            entry = table[code]
+            if ( prev is not None ):
+                table.append( prev + [ entry[0] ] )
+        else:
+            entry = prev + [ prev[0] ]
+            table.append( entry )
+
+        out.extend( entry )
+        prev = entry
+
+        if ( len(table) == ( 1 << codeSize ) and codeSize < 12 ):
+            codeSize += 1
+
+def read_gif_frames(fn):
+    """Return the list of ( left, top, width, height, palette, indices ) in fn."""
+
+    with open( fn, "rb" ) as fp:
+        data = bytearray( fp.read() )
+
+    assert( data[:6] == bytearray(b"GIF89a") )
+    assert( 0 == data[10] & 0x80 ) # No global color table.
+
+    pos = 13
+    frames = []
+
+    def read_sub_blocks(pos):
+        res = bytearray()
+        while ( data[pos] != 0 ):
+            n = data[pos]
+            res += data[ pos+1:pos+1+n ]
+            pos += 1 + n
+        return res, pos + 1
+
+    while ( data[pos] != 0x3B ):
+        if ( 0x21 == data[pos] ):
+            _, pos = read_sub_blocks( pos + 2 )
+        elif ( 0x2C == data[pos] ):
+            left, top, w, h, flags = struct.unpack( "<HHHHB", bytes( data[ pos+1:pos+10 ] ) )
+            n = 1 << ( ( flags & 0x07 ) + 1 )
+            palette = np.frombuffer( bytes( data[ pos+10:pos+10+3*n ] ), dtype = np.uint8 ).reshape( ( n, 3 ) )
+            pos += 10 + 3 * n
+            minCodeSize = data[pos]
+            lzw, pos = read_sub_blocks( pos + 1 )
+            indices = np.array( lzw_decode( lzw, minCodeSize ) ).reshape( ( h, w ) )
+            frames.append( ( left, top, w, h, palette, indices ) )
+        else:
+            raise Exception("Unexpected block 0x%02X." % ( data[pos] ))
+
+    return frames
+
+class TestEpisodeExport(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "EpisodeExportTest_" )
+
+        gridMap = GridMap.GridMap2D( 10, 20, outOfBoundValue = -200 )
+
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_starting_block(0)
+        gridMap.set_value_ending_block(100)
+        gridMap.set_value_obstacle_block(-100)
+
+        gridMap.initialize()
+        gridMap.set_starting_block( ( 0, 0 ) )
+        gridMap.set_ending_block( ( 9, 19 ) )
+        gridMap.add_obstacle( ( 5, 10 ) )
+
+        self.gme = GridMap.GridMapEnv( gridMap = gridMap, workingDir = self.workingDir )
+        self.gme.reset()
+
+        for i in range(5):
+            self.gme.step( GridMap.BlockCoorDelta( 1.5, 1 ) )
+
+    def tearDown(self):
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_lzw_encode(self):
+        print("test_lzw_encode")
+
+        rng = np.random.RandomState(0)
+
+        # Long enough to fill the code table and emit clear codes.
+        for minCodeSize, n in [ ( 2, 100 ), ( 2, 20000 ), ( 8, 50000 ) ]:
+            indices = rng.randint( 0, 1 << minCodeSize, n ).tolist()
+            self.assertEqual( lzw_decode( EpisodeExport.lzw_encode( indices, minCodeSize ), minCodeSize ), indices )
+
+        indices = [ 1 ] * 10000
+        self.assertEqual( lzw_decode( EpisodeExport.lzw_encode( indices, 2 ), 2 ), indices )
+
+    def test_make_palette(self):
+        print("test_make_palette")
+
+        img = np.zeros( ( 4, 4, 3 ), dtype = np.uint8 )
+        img[1, 1] = [ 255, 0, 0 ]
+
+        palette, indices = EpisodeExport.make_palette( img )
+        self.assertEqual( palette.shape, ( 2, 3 ) )
+        self.assertTrue( np.array_equal( palette[indices], img ) )
+
+        # More than 256 colors.
+        img = np.random.RandomState(0).randint( 0, 256, ( 32, 32, 3 ) ).astype(np.uint8)
+        palette, indices = EpisodeExport.make_palette( img )
+        self.assertTrue( palette.shape[0] <= 256 )
+
+    def test_iterate_frames(self):
+        print("test_iterate_frames")
+
+        frames = [ img.copy() for img in EpisodeExport.iterate_frames( self.gme, 4 ) ]
+
+        self.assertEqual( len(frames), 6 )
+        self.assertEqual( frames[0].shape, ( 40, 80, 3 ) )
+
+        # Every frame adds to the previous one.
+        for i in range( 1, len(frames) ):
+            self.assertTrue( np.any( frames[i] != frames[i-1] ) )
+
+    def test_export_gif(self):
+        print("test_export_gif")
+
+        fn = os.path.join( self.workingDir, "Episode.gif" )
+
+        self.assertEqual( self.gme.export_episode( fn, pixelsPerBlock = 4 ), 6 )
+
+        gifFrames = read_gif_frames( fn )
+        self.assertEqual( len(gifFrames), 6 )
+
+        # Compose the frames and compare with the generated ones.
+        canvas = None
+
+        frames = [ img.copy() for img in EpisodeExport.iterate_frames( self.gme, 4 ) ]
+
+        for img, ( left, top, w, h, palette, indices ) in zip( frames, gifFrames ):
+            if ( canvas is None ):
+                canvas = np.zeros_like( img )
+
+            canvas[ top:top+h, left:left+w ] = palette[indices]
+
+            self.assertTrue( np.array_equal( canvas, img ) )
+
+        # Only the first frame covers the whole image.
+        self.assertEqual( gifFrames[0][2:4], ( 80, 40 ) )
+        self.assertTrue( gifFrames[1][2] * gifFrames[1][3] < 80 * 40 )
+
+    def test_export_image_sequence(self):
+        print("test_export_image_sequence")
+
+        d = os.path.join( self.workingDir, "Frames" )
+
+        self.assertEqual( self.gme.export_episode( d ), 6 )
+        self.assertEqual( sorted( os.listdir(d) ), [ "%06d.png" % (i) for i in range(6) ] )
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestEpisodeExport )
+    unittest.TextTestRunner().run( suite )
@@ -1,13 +1,14 @@
 
 from __future__ import print_function
 
+import base64
 import copy
 import json
 import math
-import matplotlib.pyplot as plt
 import numpy as np
 from numpy.random import randn, rand
 import os
+import struct
 
 import LineIntersection2D
 
@@ -36,6 +37,14 @@ def round_if_needed(x, eps = 1e-4):
 
     return float(x)
 
+def round_if_needed_array(x, eps = 1e-4):
+    """Vectorized version of round_if_needed(). x is a NumPy array of floats."""
+
+    c = np.ceil(x)
+    f = np.floor(x)
+
+    return np.where( c - x < eps, c, np.where( x - f < eps, f, x ) )
+
 class GridMapException(Exception):
     def __init__(self, msg):
         self.msg = msg
@@ -44,28 +53,50 @@ class GridMapException(Exception):
         return repr( self.msg )
 
 class BlockIndex(object):
+    __slots__ = ( "r", "c" )
+
+    size = 2
+
     def __init__(self, r, c):
         assert( isinstance(r, (int, long)) )
         assert( isinstance(c, (int, long)) )
         
         self.r = r
         self.c = c
-
-        self.size = 2
     
     def __str__(self):
         return "index({}, {})".format( self.r, self.c )
 
+    def copy(self):
+        return BlockIndex( self.r, self.c )
+
+    def __getstate__(self):
+        return ( self.r, self.c )
+
+    def __setstate__(self, state):
+        self.r, self.c = state
+
 class BlockCoor(object):
+    __slots__ = ( "x", "y" )
+
+    size = 2
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
-        self.size = 2
-
     def __str__(self):
         return "coor({}, {})".format( self.x, self.y )
 
+    def copy(self):
+        return BlockCoor( self.x, self.y )
+
+    def __getstate__(self):
+        return ( self.x, self.y )
+
+    def __setstate__(self, state):
+        self.x, self.y = state
+
 def two_coor_distance(c0, c1):
     dx = c1.x - c0.x
     dy = c1.y - c0.y
@@ -73,15 +104,26 @@ def two_coor_distance(c0, c1):
     return math.sqrt( dx**2 + dy**2 )
 
 class BlockCoorDelta(object):
+    __slots__ = ( "dx", "dy" )
+
+    size = 2
+
     def __init__(self, dx, dy):
         self.dx = dx
         self.dy = dy
 
-        self.size = 2
-
     def __str__(self):
         return "CoorDelta({}, {})".format( self.dx, self.dy )
 
+    def copy(self):
+        return BlockCoorDelta( self.dx, self.dy )
+
+    def __getstate__(self):
+        return ( self.dx, self.dy )
+
+    def __setstate__(self, state):
+        self.dx, self.dy = state
+
     def convert_to_direction_delta(self):
         dx = 0
         dy = 0
@@ -99,6 +141,8 @@ class BlockCoorDelta(object):
         return BlockCoorDelta( dx, dy )
 
 class Block(object):
+    __slots__ = ( "coor", "size", "corners", "name", "id", "color", "value" )
+
     def __init__(self, x = 0, y = 0, h = 1, w = 1):
         if ( ( not isinstance(x, (int, long)) ) or \
              ( not isinstance(y, (int, long)) ) or \
@@ -122,6 +166,29 @@ class Block(object):
         self.color = "#FFFFFFFF" # RGBA order.
         self.value = 0
 
+    def copy(self):
+        """Return a copy of this block. The type of the block is preserved."""
+
+        b = self.__class__.__new__( self.__class__ )
+
+        b.coor    = list( self.coor )
+        b.size    = list( self.size )
+        b.corners = [ list( c ) for c in self.corners ]
+        b.name    = self.name
+        b.id      = self.id
+        b.color   = self.color
+        b.value   = self.value
+
+        return b
+
+    def __getstate__(self):
+        return dict( ( n, getattr( self, n ) ) \
+            for cls in type(self).__mro__ for n in getattr( cls, "__slots__", () ) )
+
+    def __setstate__(self, state):
+        for n, v in state.items():
+            setattr( self, n, v )
+
     def update_corners(self):
         x = self.coor[0]
         y = self.coor[1]
@@ -181,6 +248,8 @@ class Block(object):
         return False
 
 class NormalBlock(Block):
+    __slots__ = ()
+
     def __init__(self, x = 0, y = 0, h = 1, w = 1, value = -0.1):
         super(NormalBlock, self).__init__(x, y, h, w)
 
@@ -190,6 +259,8 @@ class NormalBlock(Block):
         self.value = value
     
 class ObstacleBlock(Block):
+    __slots__ = ()
+
     def __init__(self, x = 0, y = 0, h = 1, w = 1, value = -10):
         super(ObstacleBlock, self).__init__(x, y, h, w)
 
@@ -199,6 +270,8 @@ class ObstacleBlock(Block):
         self.value = value
 
 class StartingBlock(Block):
+    __slots__ = ( "startingPoint", )
+
     def __init__(self, x = 0, y = 0, h = 1, w = 1, value = -0.1, startingPoint=None):
         super(StartingBlock, self).__init__(x, y, h, w)
 
@@ -212,6 +285,12 @@ class StartingBlock(Block):
         if ( startingPoint is not None ):
             self.set_starting_point( startingPoint[0], startingPoint[1] )
 
+    def copy(self):
+        b = super(StartingBlock, self).copy()
+        b.startingPoint = list( self.startingPoint )
+
+        return b
+
     def set_starting_point(self, x, y):
         if ( self.is_inside(x, y) ):
             self.startingPoint = [ x, y ]
@@ -227,6 +306,8 @@ class StartingBlock(Block):
         return self.startingPoint
 
 class EndingBlock(Block):
+    __slots__ = ( "endPoint", )
+
     def __init__(self, x = 0, y = 0, h = 1, w = 1, value = 100, endPoint=None):
         super(EndingBlock, self).__init__(x, y, h, w)
     
@@ -240,6 +321,12 @@ class EndingBlock(Block):
         if ( endPoint is not None ):
             self.set_end_point( endPoint[0], endPoint[1] )
     
+    def copy(self):
+        b = super(EndingBlock, self).copy()
+        b.endPoint = list( self.endPoint )
+
+        return b
+
     def set_end_point(self, x, y):
         if ( self.is_inside( x, y ) ):
             self.endPoint = [x, y]
@@ -266,7 +353,49 @@ class EndingBlock(Block):
         return coor
     
     def get_ending_point_list(self):
-        return copy.deepcopy( self.endPoint )
+        return list( self.endPoint )
+
+# Block types used by the array storage of GridMap2D.
+BLOCK_TYPE_NORMAL   = 0
+BLOCK_TYPE_OBSTACLE = 1
+BLOCK_TYPE_STARTING = 2
+BLOCK_TYPE_ENDING   = 3
+
+# Movement directions. Used as bit masks by the passability tables of GridMap2D.
+DIRECTION_EAST      = 0x01
+DIRECTION_NORTHEAST = 0x02
+DIRECTION_NORTH     = 0x04
+DIRECTION_NORTHWEST = 0x08
+DIRECTION_WEST      = 0x10
+DIRECTION_SOUTHWEST = 0x20
+DIRECTION_SOUTH     = 0x40
+DIRECTION_SOUTHEAST = 0x80
+
+# Direction masks indexed by [sign(dy) + 1][sign(dx) + 1].
+DIRECTION_MASKS = [ \
+    [ DIRECTION_SOUTHWEST, DIRECTION_SOUTH, DIRECTION_SOUTHEAST ], \
+    [ DIRECTION_WEST,      0,               DIRECTION_EAST      ], \
+    [ DIRECTION_NORTHWEST, DIRECTION_NORTH, DIRECTION_NORTHEAST ] ]
+
+# Directions blocked by being on the east, north, west, and south boundaries.
+BLOCKED_BY_EAST_BOUNDARY  = DIRECTION_EAST  | DIRECTION_NORTHEAST | DIRECTION_NORTH | DIRECTION_SOUTH     | DIRECTION_SOUTHEAST
+BLOCKED_BY_NORTH_BOUNDARY = DIRECTION_EAST  | DIRECTION_NORTHEAST | DIRECTION_NORTH | DIRECTION_NORTHWEST | DIRECTION_WEST
+BLOCKED_BY_WEST_BOUNDARY  = DIRECTION_NORTH | DIRECTION_NORTHWEST | DIRECTION_WEST  | DIRECTION_SOUTHWEST | DIRECTION_SOUTH
+BLOCKED_BY_SOUTH_BOUNDARY = DIRECTION_EAST  | DIRECTION_WEST      | DIRECTION_SOUTHWEST | DIRECTION_SOUTH | DIRECTION_SOUTHEAST
+
+def get_block_type(b):
+    """Return the block type code of the Block object b."""
+
+    if ( isinstance( b, ObstacleBlock ) ):
+        return BLOCK_TYPE_OBSTACLE
+    elif ( isinstance( b, StartingBlock ) ):
+        return BLOCK_TYPE_STARTING
+    elif ( isinstance( b, EndingBlock ) ):
+        return BLOCK_TYPE_ENDING
+    elif ( isinstance( b, NormalBlock ) ):
+        return BLOCK_TYPE_NORMAL
+    else:
+        raise TypeError("b should be an object of NormalBlock, ObstacleBlock, StartingBlock, or EndingBlock.")
 
 def add_element_to_2D_list(ele, li):
     """
@@ -307,6 +436,85 @@ def add_element_to_2D_list(ele, li):
     
     li.append( ele )
 
+# Encodings of the obstacles in the JSON map file.
+OBSTACLE_ENCODING_LIST   = "list"   # A list of [r, c] pairs.
+OBSTACLE_ENCODING_RLE    = "rle"    # A list of row-wise runs, [r, c, length].
+OBSTACLE_ENCODING_BITMAP = "bitmap" # Base64 of the row-major obstacle mask packed into bits.
+
+OBSTACLE_ENCODINGS = [ OBSTACLE_ENCODING_LIST, OBSTACLE_ENCODING_RLE, OBSTACLE_ENCODING_BITMAP ]
+
+def encode_obstacle_mask(mask, encoding):
+    """
+    Encode the boolean obstacle mask of shape (rows, cols).
+    Return a dictionary to be merged into the JSON description of a map.
+    """
+
+    if ( OBSTACLE_ENCODING_LIST == encoding ):
+        return { "obstacleIndices": np.argwhere( mask ).tolist() }
+    elif ( OBSTACLE_ENCODING_RLE == encoding ):
+        # Pad every row with zeros and find the rising and falling edges.
+        rows, cols = mask.shape
+        padded = np.zeros( ( rows, cols + 2 ), dtype=np.int8 )
+        padded[:, 1:-1] = mask
+        diff = np.diff( padded, axis=1 )
+
+        starts = np.argwhere(  1 == diff )
+        ends   = np.argwhere( -1 == diff )
+
+        runs = np.stack( [ starts[:, 0], starts[:, 1], ends[:, 1] - starts[:, 1] ], axis=1 )
+
+        return { "obstacleEncoding": OBSTACLE_ENCODING_RLE, \
+                 "obstacleRuns": runs.tolist() }
+    elif ( OBSTACLE_ENCODING_BITMAP == encoding ):
+        packed = np.packbits( mask.reshape( ( -1, ) ).astype( np.uint8 ) )
+
+        return { "obstacleEncoding": OBSTACLE_ENCODING_BITMAP, \
+                 "obstacleBitmap": base64.b64encode( packed.tobytes() ).decode("ascii") }
+    else:
+        raise GridMapException("Unexpected obstacle encoding {}. Expecting one of {}.".format( encoding, OBSTACLE_ENCODINGS ))
+
+def decode_obstacle_mask(d, rows, cols):
+    """
+    Decode the obstacles in the JSON description d of a map.
+    Return a boolean mask of shape (rows, cols).
+    """
+
+    encoding = d.get( "obstacleEncoding", OBSTACLE_ENCODING_LIST )
+
+    if ( OBSTACLE_ENCODING_LIST == encoding ):
+        mask = np.zeros( ( rows, cols ), dtype=np.bool_ )
+
+        indices = np.asarray( d["obstacleIndices"], dtype=np.int64 ).reshape( ( -1, 2 ) )
+        mask[ indices[:, 0], indices[:, 1] ] = True
+
+        return mask
+    elif ( OBSTACLE_ENCODING_RLE == encoding ):
+        runs = np.asarray( d["obstacleRuns"], dtype=np.int64 ).reshape( ( -1, 3 ) )
+
+        # +1 at the start and -1 at the end of every run, then accumulate.
+        starts = runs[:, 0] * cols + runs[:, 1]
+        edges  = np.zeros( ( rows * cols + 1, ), dtype=np.int64 )
+        np.add.at( edges, starts, 1 )
+        np.add.at( edges, starts + runs[:, 2], -1 )
+
+        return ( np.cumsum( edges[:-1] ) > 0 ).reshape( ( rows, cols ) )
+    elif ( OBSTACLE_ENCODING_BITMAP == encoding ):
+        packed = np.frombuffer( base64.b64decode( d["obstacleBitmap"] ), dtype=np.uint8 )
+
+        return np.unpackbits( packed )[ :rows * cols ].reshape( ( rows, cols ) ).astype( np.bool_ )
+    else:
+        raise GridMapException("Unexpected obstacle encoding {}.".format( encoding ))
+
+# The binary map format.
+BINARY_MAGIC     = b"GRIDMAP\0"
+BINARY_VERSION   = 1
+BINARY_ALIGNMENT = 64
+
+def align_up(n, a):
+    """Return the smallest multiple of a that is not less than n."""
+
+    return ( ( n + a - 1 ) // a ) * a
+
 class GridMap2D(object):
     I_R = 0
     I_C = 1
@@ -337,7 +545,23 @@ class GridMap2D(object):
         self.valueObstacleBlock = -10
 
         self.corners   = [] # A 4x2 2D list. Coordinates.
-        self.blockRows = [] # A list contains rows of blocks.
+
+        # Block storage. Both are NumPy arrays of shape (rows, cols) after initialize().
+        self.blockTypes  = None # BLOCK_TYPE_XXX codes.
+        self.blockValues = None # The value of each block.
+
+        # Passability tables. Bit masks of the blocked directions for the points on
+        # the grid vertices, the horizontal lines, and the vertical lines. Shapes are
+        # (rows+1, cols+1), (rows+1, cols), and (rows, cols+1).
+        self.vertexBlockedDirs = None
+        self.hLineBlockedDirs  = None
+        self.vLineBlockedDirs  = None
+        self.isPassabilityOutdated = True
+
+        # Increased every time the blocks or the map settings are changed. Used for
+        # caching the derived data, e.g., the rendered map layer and the map snapshot
+        # of AsyncWriter.
+        self.version = 0
 
         self.centerCoor = BlockCoor(0, 0)
         self.mapSize = [0, 0] # H, W, or, I_R, I_C
@@ -350,8 +574,6 @@ class GridMap2D(object):
         self.endingBlockIdx  = BlockIndex(0, 0)
         self.endingPoint     = BlockCoor(0, 0)
 
-        self.obstacleIndices = []
-
         # Potential value.
         self.havePotentialValue    = False
         self.potentialValuePerStep = 0.1
@@ -359,48 +581,66 @@ class GridMap2D(object):
 
     def set_value_normal_block(self, val):
         self.valueNormalBlock = val
+        self.version += 1
     
     def set_value_starting_block(self, val):
         self.valueStartingBlock = val
+        self.version += 1
 
     def set_value_ending_block(self, val):
         self.valueEndingBlock = val
+        self.version += 1
     
     def set_value_obstacle_block(self, val):
         self.valueObstacleBlock = val
+        self.version += 1
     
     def set_value_out_of_boundary(self, val):
         self.outOfBoundValue = val
+        self.version += 1
 
     def get_center_coor(self):
-        return copy.deepcopy( self.centerCoor )
+        return self.centerCoor.copy()
     
     def get_map_size(self):
-        return copy.deepcopy( self.mapSize )
+        return list( self.mapSize )
+
+    def initialize(self, blockTypes = None, blockValues = None):
+        """
+        Initialize the map. All blocks are normal blocks if blockTypes and blockValues
+        are None. Otherwise, blockTypes and blockValues are NumPy arrays with the shape of
+        (rows, cols) and are used as the block storage without copying.
+        """
 
-    def initialize(self):
         if ( True == self.isInitialized ):
             raise GridMapException("Map already initialized.")
 
-        # Drop current blockRows.
-        self.blockRows = []
-
         # Generate indices for the blocks.
         rs = np.linspace(self.origin[GridMap2D.I_Y], self.origin[GridMap2D.I_Y] + self.rows - 1, self.rows, dtype = np.int)
         cs = np.linspace(self.origin[GridMap2D.I_X], self.origin[GridMap2D.I_X] + self.cols - 1, self.cols, dtype = np.int)
-    
+
         h = self.stepSize[GridMap2D.I_Y]
         w = self.stepSize[GridMap2D.I_X]
 
-        for r in rs:
-            temp = []
-            for c in cs:
-                b = NormalBlock( c*w, r*h, h, w, self.valueNormalBlock )
-                temp.append(b)
-            
-            self.blockRows.append(temp)
-        
+        if ( blockTypes is None and blockValues is None ):
+            # All blocks are normal blocks at the beginning.
+            self.blockTypes  = np.full( ( self.rows, self.cols ), BLOCK_TYPE_NORMAL, dtype = np.int8 )
+            self.blockValues = np.full( ( self.rows, self.cols ), self.valueNormalBlock, dtype = np.float64 )
+        elif ( blockTypes is not None and blockValues is not None ):
+            if ( blockTypes.shape != ( self.rows, self.cols ) or blockValues.shape != ( self.rows, self.cols ) ):
+                raise GridMapException("blockTypes and blockValues must have the shape of ({}, {}). blockTypes.shape = {}, blockValues.shape = {}.".format( \
+                    self.rows, self.cols, blockTypes.shape, blockValues.shape ))
+
+            self.blockTypes  = blockTypes
+            self.blockValues = blockValues
+        else:
+            raise GridMapException("blockTypes and blockValues must be both None or both supplied.")
+
+        self.isPassabilityOutdated = True
+        self.version += 1
+
         # Calcluate the corners.
+        self.corners = []
         self.corners.append( [        cs[0]*w,      rs[0]*h ] )
         self.corners.append( [ (cs[-1] + 1)*w,      rs[0]*h ] )
         self.corners.append( [ (cs[-1] + 1)*w, (rs[-1]+1)*h ] )
@@ -416,13 +656,12 @@ class GridMap2D(object):
             self.corners[3][GridMap2D.I_Y] - self.corners[0][GridMap2D.I_Y], \
             self.corners[1][GridMap2D.I_X] - self.corners[0][GridMap2D.I_X] ]
     
-    def dump_JSON(self, fn):
+    def get_description(self):
         """
-        Save the grid map as a JSON file.
-        fn: String of filename.
+        Return a dictionary describing the map, except for the obstacles.
+        Used by dump_JSON() and dump_binary().
         """
 
-        # Compose a dictionary.
         d = { \
             "name": self.name, \
             "rows": self.rows, \
@@ -439,9 +678,42 @@ class GridMap2D(object):
             "startingPoint": [ self.startingPoint.x, self.startingPoint.y ], \
             "haveEndingBlock": self.haveEndingBlock, \
             "endingBlockIdx": [ self.endingBlockIdx.r, self.endingBlockIdx.c ], \
-            "endingPoint": [ self.endingPoint.x, self.endingPoint.y ], \
-            "obstacleIndices": self.obstacleIndices
+            "endingPoint": [ self.endingPoint.x, self.endingPoint.y ]
             }
+
+        return d
+
+    def set_description(self, d):
+        """
+        Populate the member variables by the dictionary d created by get_description().
+        The blocks are not touched.
+        """
+
+        self.name = d["name"]
+        self.rows = d["rows"]
+        self.cols = d["cols"]
+        self.origin             = d["origin"]
+        self.stepSize           = d["stepSize"]
+        self.outOfBoundValue    = d["outOfBoundValue"]
+        self.valueNormalBlock   = d["valueNormalBlock"]
+        self.valueStartingBlock = d["valueStartingBlock"]
+        self.valueEndingBlock   = d["valueEndingBlock"]
+        self.valueObstacleBlock = d["valueObstacleBlock"]
+
+        self.version += 1
+
+    def dump_JSON(self, fn, obstacleEncoding = OBSTACLE_ENCODING_LIST):
+        """
+        Save the grid map as a JSON file.
+        fn: String of filename.
+        obstacleEncoding: One of OBSTACLE_ENCODINGS. OBSTACLE_ENCODING_LIST writes the
+        obstacles as a list of [r, c] pairs. OBSTACLE_ENCODING_RLE and OBSTACLE_ENCODING_BITMAP
+        are compact encodings. read_JSON() detects the encoding.
+        """
+
+        # Compose a dictionary.
+        d = self.get_description()
+        d.update( encode_obstacle_mask( BLOCK_TYPE_OBSTACLE == self.blockTypes, obstacleEncoding ) )
         
         # Open file.
         fp = open( fn, "w" )
@@ -467,16 +739,7 @@ class GridMap2D(object):
         fp.close()
 
         # Populate member variables by d.
-        self.name = d["name"]
-        self.rows = d["rows"]
-        self.cols = d["cols"]
-        self.origin             = d["origin"]
-        self.stepSize           = d["stepSize"]
-        self.outOfBoundValue    = d["outOfBoundValue"]
-        self.valueNormalBlock   = d["valueNormalBlock"]
-        self.valueStartingBlock = d["valueStartingBlock"]
-        self.valueEndingBlock   = d["valueEndingBlock"]
-        self.valueObstacleBlock = d["valueObstacleBlock"]
+        self.set_description( d )
 
         self.initialized = False
         self.initialize()
@@ -495,43 +758,210 @@ class GridMap2D(object):
                 endPoint=BlockCoor(
                     d["endingPoint"][0], d["endingPoint"][1] ) )
 
-        for obs in d["obstacleIndices"]:
-            self.add_obstacle( \
-                BlockIndex( \
-                    obs[0], obs[1] ) )
+        self.add_obstacles_from_mask( decode_obstacle_mask( d, self.rows, self.cols ) )
+
+    def dump_binary(self, fn):
+        """
+        Save the grid map as a binary file.
+        fn: String of filename.
+
+        The file starts with BINARY_MAGIC and the length of a JSON header as a little-endian
+        uint64. The header is the dictionary of get_description() with the offsets of the 
+        block types (int8) and the block values (little-endian float64). Both arrays are
+        stored in C order and aligned to BINARY_ALIGNMENT bytes, so they could be opened 
+        by np.memmap. The block values are stored as they are, including the potential values.
+        """
+
+        d = self.get_description()
+        d["version"] = BINARY_VERSION
+
+        # The arrays go after the header. Calculate the offsets with the header length
+        # fixed to a multiple of BINARY_ALIGNMENT.
+        d["blockTypesOffset"]  = 0
+        d["blockValuesOffset"] = 0
+
+        nTypes = self.rows * self.cols
+        header = json.dumps( d, sort_keys=True ).encode("utf-8")
+
+        # Leave enough room for the offsets.
+        headerSize = align_up( len( BINARY_MAGIC ) + 8 + len( header ) + 64, BINARY_ALIGNMENT )
+
+        d["blockTypesOffset"]  = headerSize
+        d["blockValuesOffset"] = align_up( headerSize + nTypes, BINARY_ALIGNMENT )
+
+        header = json.dumps( d, sort_keys=True ).encode("utf-8")
+
+        assert( len( BINARY_MAGIC ) + 8 + len( header ) <= headerSize )
+
+        fp = open( fn, "wb" )
+
+        fp.write( BINARY_MAGIC )
+        fp.write( struct.pack( "<Q", len( header ) ) )
+        fp.write( header )
+        fp.write( b"\0" * ( d["blockTypesOffset"] - fp.tell() ) )
+        fp.write( np.ascontiguousarray( self.blockTypes, dtype=np.int8 ).tobytes() )
+        fp.write( b"\0" * ( d["blockValuesOffset"] - fp.tell() ) )
+        fp.write( np.ascontiguousarray( self.blockValues, dtype="<f8" ).tobytes() )
+
+        fp.close()
+
+    def read_binary(self, fn, memoryMap = True):
+        """
+        Read a map from a binary file written by dump_binary().
+        fn: String of filename.
+        memoryMap: Set True to open the block arrays by np.memmap in copy-on-write mode. 
+        Processes opening the same file share the pages until they modify the map.
+        Set False to read the arrays into memory.
+        """
+
+        if ( not os.path.isfile(fn) ):
+            raise GridMapException("{} does not exist.".format(fn))
+
+        fp = open( fn, "rb" )
+
+        magic = fp.read( len( BINARY_MAGIC ) )
+
+        if ( magic != BINARY_MAGIC ):
+            fp.close()
+            raise GridMapException("{} is not a binary map file.".format(fn))
+
+        n = struct.unpack( "<Q", fp.read(8) )[0]
+        d = json.loads( fp.read(n).decode("utf-8") )
+
+        if ( d["version"] > BINARY_VERSION ):
+            fp.close()
+            raise GridMapException("Unsupported binary map version {}.".format( d["version"] ))
+
+        shape = ( d["rows"], d["cols"] )
+
+        if ( True == memoryMap ):
+            fp.close()
+
+            blockTypes  = np.memmap( fn, dtype=np.int8, mode="c", offset=d["blockTypesOffset"], shape=shape )
+            blockValues = np.memmap( fn, dtype="<f8", mode="c", offset=d["blockValuesOffset"], shape=shape )
+        else:
+            fp.seek( d["blockTypesOffset"] )
+            blockTypes = np.fromfile( fp, dtype=np.int8, count=shape[0] * shape[1] ).reshape( shape )
+            fp.seek( d["blockValuesOffset"] )
+            blockValues = np.fromfile( fp, dtype="<f8", count=shape[0] * shape[1] ).reshape( shape ).astype( np.float64 )
+
+            fp.close()
+
+        self.attach_arrays( d, blockTypes, blockValues )
+
+    def attach_arrays(self, d, blockTypes, blockValues):
+        """
+        Set up the map by the dictionary d created by get_description() and the
+        block arrays of shape (rows, cols). The arrays are used without copying,
+        e.g., memory mapped files or shared memory. The starting and ending blocks
+        are expected to be in the arrays already.
+        """
+
+        self.set_description( d )
+
+        self.isInitialized = False
+        self.initialize( blockTypes, blockValues )
+
+        self.haveStartingBlock = d["haveStartingBlock"]
+        self.startingBlockIdx  = BlockIndex( d["startingBlockIdx"][0], d["startingBlockIdx"][1] )
+        self.startingPoint     = BlockCoor( d["startingPoint"][0], d["startingPoint"][1] )
+
+        self.haveEndingBlock = d["haveEndingBlock"]
+        self.endingBlockIdx  = BlockIndex( d["endingBlockIdx"][0], d["endingBlockIdx"][1] )
+        self.endingPoint     = BlockCoor( d["endingPoint"][0], d["endingPoint"][1] )
+
+    def get_block_type_s(self, r, c):
+        if ( r >= self.rows or c >= self.cols ):
+            raise IndexError( "Index out of range. indx = [%d, %d]" % (r, c) )
+
+        return int( self.blockTypes[r, c] )
+
+    def get_block_type(self, index):
+        """Return the BLOCK_TYPE_XXX code of the block at index."""
+
+        if ( isinstance( index, BlockIndex ) ):
+            return self.get_block_type_s( index.r, index.c )
+        elif ( isinstance( index, (list, tuple) ) ):
+            return self.get_block_type_s( index[GridMap2D.I_R], index[GridMap2D.I_C] )
+        else:
+            raise TypeError("index should be an object of BlockIndex or a list or a tuple.")
+
+    def make_block_s(self, r, c):
+        """
+        Create a Block object representing the block at [r, c]. The Block object
+        is created from self.blockTypes and self.blockValues. Changing the
+        returned object does not change the map.
+        """
+
+        t = self.get_block_type_s( r, c )
+        v = float( self.blockValues[r, c] )
+
+        h = self.stepSize[GridMap2D.I_Y]
+        w = self.stepSize[GridMap2D.I_X]
+
+        # Negative indices are allowed as they are for the NumPy arrays.
+        r = int(r) % self.rows
+        c = int(c) % self.cols
+
+        if ( BLOCK_TYPE_NORMAL == t ):
+            return NormalBlock( c*w, r*h, h, w, value=v )
+        elif ( BLOCK_TYPE_OBSTACLE == t ):
+            return ObstacleBlock( c*w, r*h, h, w, value=v )
+        elif ( BLOCK_TYPE_STARTING == t ):
+            return StartingBlock( c*w, r*h, h, w, value=v, \
+                startingPoint=[ self.startingPoint.x, self.startingPoint.y ] )
+        elif ( BLOCK_TYPE_ENDING == t ):
+            return EndingBlock( c*w, r*h, h, w, value=v, \
+                endPoint=[ self.endingPoint.x, self.endingPoint.y ] )
+        else:
+            raise GridMapException("Unexpected block type %d at [%d, %d]." % ( t, r, c ))
 
     def get_block(self, index):
+        """
+        Return a Block object as a view of the block at index. The blocks are
+        stored in self.blockTypes and self.blockValues. Changing the returned
+        object does not change the map.
+        """
+
         if ( isinstance( index, BlockIndex ) ):
-            if ( index.r >= self.rows or index.c >= self.cols ):
-                raise IndexError( "Index out of range. indx = [%d, %d]" % (index.r, index.c) )
-            
-            return self.blockRows[index.r][index.c]
+            return self.make_block_s( index.r, index.c )
         elif ( isinstance( index, (list, tuple) ) ):
-            if ( index[GridMap2D.I_R] >= self.rows or \
-                 index[GridMap2D.I_C] >= self.cols ):
-                raise IndexError( "Index out of range. indx = [%d, %d]" % (index.r, index.c) )
-            
-            return self.blockRows[ index[GridMap2D.I_R] ][ index[GridMap2D.I_C] ]
+            return self.make_block_s( index[GridMap2D.I_R], index[GridMap2D.I_C] )
 
-    def is_normal_block(self, index):
-        b = self.get_block(index)
+    @property
+    def blockRows(self):
+        """
+        A list contains rows of blocks. Created on demand from self.blockTypes
+        and self.blockValues for compatibility. Use the arrays directly for
+        performance.
+        """
 
-        return isinstance( b, NormalBlock )
+        return [ [ self.make_block_s( r, c ) for c in range( self.cols ) ] \
+            for r in range( self.rows ) ]
 
-    def is_obstacle_block(self, index):
-        b = self.get_block(index)
+    @property
+    def obstacleIndices(self):
+        """
+        A list of the [r, c] indices of all the obstacles in row-major order. 
+        Created on demand from self.blockTypes.
+        """
 
-        return isinstance( b, ObstacleBlock )
+        if ( self.blockTypes is None ):
+            return []
 
-    def is_starting_block(self, index):
-        b = self.get_block(index)
+        return np.argwhere( BLOCK_TYPE_OBSTACLE == self.blockTypes ).tolist()
 
-        return isinstance( b, StartingBlock )
+    def is_normal_block(self, index):
+        return BLOCK_TYPE_NORMAL == self.get_block_type(index)
 
-    def is_ending_block(self, index):
-        b = self.get_block(index)
+    def is_obstacle_block(self, index):
+        return BLOCK_TYPE_OBSTACLE == self.get_block_type(index)
 
-        return isinstance( b, EndingBlock )
+    def is_starting_block(self, index):
+        return BLOCK_TYPE_STARTING == self.get_block_type(index)
+
+    def is_ending_block(self, index):
+        return BLOCK_TYPE_ENDING == self.get_block_type(index)
 
     def get_step_size(self):
         """[x, y]"""
@@ -542,41 +972,77 @@ class GridMap2D(object):
         if ( False == self.haveStartingBlock ):
             raise GridMapException("No staring point set yet.")
         
-        return copy.deepcopy( self.startingBlockIdx )
+        return self.startingBlockIdx.copy()
     
     def get_index_ending_block(self):
         """Return a copy of the index of the ending block."""
         if ( False == self.haveEndingBlock ):
             raise GridMapException("No ending block set yet.")
         
-        return copy.deepcopy( self.endingBlockIdx )
+        return self.endingBlockIdx.copy()
 
-    def is_in_ending_block(self, coor):
-        """Return ture if coor is in the ending block."""
+    def is_in_ending_block_s(self, x, y):
+        """Return ture if (x, y) is in the ending block."""
 
-        if ( True == self.is_out_of_or_on_boundary(coor) ):
+        if ( True == self.is_out_of_or_on_boundary_s(x, y) ):
             return False
         
-        loc = self.is_corner_or_principle_line(coor)
-        if ( True == loc[0] or True == loc[1] or True == loc[2] ):
+        flagCorner, flagH, flagV, r, c = self.is_corner_or_principle_line_s(x, y)
+        if ( True == flagCorner or True == flagH or True == flagV ):
             return False
 
-        idx = loc[3]
-        if ( True == isinstance( self.blockRows[ idx.r ][ idx.c ], EndingBlock ) ):
+        if ( BLOCK_TYPE_ENDING == self.blockTypes[ r, c ] ):
             return True
         
         return False
 
+    def is_in_ending_block(self, coor):
+        """Return ture if coor is in the ending block."""
+
+        return self.is_in_ending_block_s( coor.x, coor.y )
+
+    def is_in_ending_block_array(self, xs, ys):
+        """Vectorized version of is_in_ending_block_s(). Return a boolean NumPy array."""
+
+        res = ~self.is_out_of_or_on_boundary_array( xs, ys )
+
+        cs = ( ( xs[res] - self.origin[GridMap2D.I_X] ) / self.stepSize[GridMap2D.I_X] ).astype(np.int64)
+        rs = ( ( ys[res] - self.origin[GridMap2D.I_Y] ) / self.stepSize[GridMap2D.I_Y] ).astype(np.int64)
+
+        res[res] = ( xs[res] != cs * self.stepSize[GridMap2D.I_X] ) & \
+                   ( ys[res] != rs * self.stepSize[GridMap2D.I_Y] ) & \
+                   ( BLOCK_TYPE_ENDING == self.blockTypes[ rs, cs ] )
+
+        return res
+
+    def is_around_ending_block_s(self, x, y, radius):
+        """Return ture if (x, y) is in a circle defined by the center of the ending block."""
+
+        if ( True == self.is_out_of_or_on_boundary_s(x, y) ):
+            return False
+
+        if ( radius < 0 ):
+            raise GridMapException( "radius should not be negative. radius = %f." % (radius) )
+
+        d = two_point_distance( self.endingPoint.x, self.endingPoint.y, x, y )
+
+        return ( d <= radius )
+
     def is_around_ending_block(self, coor, radius):
         """Return ture if coor is in a circle defined by the center of the ending block."""
 
-        if ( True == self.is_out_of_or_on_boundary(coor) ):
-            return False
+        return self.is_around_ending_block_s( coor.x, coor.y, radius )
 
-        # Get the ending block.
-        eb = self.get_block(self.endingBlockIdx)
+    def is_around_ending_block_array(self, xs, ys, radius):
+        """Vectorized version of is_around_ending_block_s(). Return a boolean NumPy array."""
 
-        return eb.is_in_range( coor.x, coor.y, radius )
+        if ( radius < 0 ):
+            raise GridMapException( "radius should not be negative. radius = %f." % (radius) )
+
+        # np.power() calls pow() like the ** operator of two_point_distance().
+        d = np.sqrt( np.power( xs - self.endingPoint.x, 2.0 ) + np.power( ys - self.endingPoint.y, 2.0 ) )
+
+        return ~self.is_out_of_or_on_boundary_array( xs, ys ) & ( d <= radius )
 
     def enable_potential_value(self, valMax = None, valPerStep = None):
         if ( valMax is not None ):
@@ -584,9 +1050,11 @@ class GridMap2D(object):
             self.potentialValuePerStep = valPerStep
         
         self.havePotentialValue = True
+        self.version += 1
     
     def disable_potential_value(self):
         self.havePotentialValue = False
+        self.version += 1
 
     def get_potential_value(self, idxGoal, idx):
         """Return the potential value based on the distance between the indices of idxGaol and idx."""
@@ -603,20 +1071,15 @@ class GridMap2D(object):
         if ( False == self.havePotentialValue ):
             raise GridMapException("Potential value not enabled.")
 
-        # Loop over all the blocks.
-        idx = BlockIndex(0, 0)
-        for br in self.blockRows:
-            idx.c = 0
-            for b in br:
-                if ( self.is_normal_block( idx ) ):
-                    v = self.potentialValueMax - \
-                        self.get_potential_value( self.endingBlockIdx, idx )
-                    
-                    self.get_block( idx ).value += v
+        # Index distances of all the blocks to the ending block.
+        rs, cs = np.indices( ( self.rows, self.cols ) )
+        d = np.sqrt( ( self.endingBlockIdx.r - rs )**2.0 + ( self.endingBlockIdx.c - cs )**2.0 )
 
-                idx.c += 1
-            
-            idx.r += 1
+        # Only the normal blocks get the potential value.
+        mask = BLOCK_TYPE_NORMAL == self.blockTypes
+        self.blockValues[mask] += self.potentialValueMax - d[mask] * self.potentialValuePerStep
+
+        self.version += 1
 
     def set_starting_block_s(self, r, c, value = None, startingPoint=None):
         assert( isinstance(r, (int, long)) )
@@ -771,7 +1234,7 @@ class GridMap2D(object):
             raise IndexError( "Cannot turn a ending block (%d, %d) into obstacle." % (r, c) )
 
         # Check if the destination is already an obstacle.
-        if ( isinstance( self.get_block((r, c)), ObstacleBlock ) ):
+        if ( self.is_obstacle_block( (r, c) ) ):
             return
 
         if ( value is not None ):
@@ -783,9 +1246,6 @@ class GridMap2D(object):
         self.overwrite_block( r, c, \
             ObstacleBlock(coor.x, coor.y, self.stepSize[GridMap2D.I_Y], self.stepSize[GridMap2D.I_X], value=self.valueObstacleBlock ) )
 
-        # Add the indices into self.obstacleIndices 2D list.
-        add_element_to_2D_list( [r, c], self.obstacleIndices )
-
     def add_obstacle(self, index, value=None):
         if ( isinstance( index, BlockIndex ) ):
             self.add_obstacle_s( index.r, index.c, value )
@@ -794,13 +1254,70 @@ class GridMap2D(object):
         else:
             raise TypeError("index should be an object of BlockIndex or a list or a tuple.")
 
+    def add_obstacles_from_mask(self, mask, value=None):
+        """
+        Turn all the blocks marked by mask into obstacles in one pass.
+        mask: A boolean NumPy array with the shape of (rows, cols).
+
+        The rules are the same with add_obstacle_s(). Existing obstacles are not changed.
+        An IndexError will be raised if mask covers the starting or the ending block.
+        """
+
+        mask = np.asarray( mask, dtype=np.bool_ )
+
+        if ( mask.shape != ( self.rows, self.cols ) ):
+            raise GridMapException("The shape of mask must be ({}, {}). mask.shape = {}.".format( self.rows, self.cols, mask.shape ))
+
+        # Check if the starting or ending blocks are covered.
+        covered = mask & ( ( BLOCK_TYPE_STARTING == self.blockTypes ) | ( BLOCK_TYPE_ENDING == self.blockTypes ) )
+
+        if ( True == covered.any() ):
+            r, c = np.argwhere( covered )[0]
+            raise IndexError( "Cannot turn a starting or ending block (%d, %d) into obstacle." % (r, c) )
+
+        # The blocks which are not obstacles yet.
+        mask = mask & ( BLOCK_TYPE_OBSTACLE != self.blockTypes )
+
+        if ( False == mask.any() ):
+            return
+
+        if ( value is not None ):
+            self.valueObstacleBlock = value
+
+        self.blockTypes[mask]  = BLOCK_TYPE_OBSTACLE
+        self.blockValues[mask] = self.valueObstacleBlock
+
+        self.isPassabilityOutdated = True
+        self.version += 1
+
+    def add_obstacles(self, indices, value=None):
+        """
+        Add multiple obstacles in one pass.
+        indices: An N x 2 array or a list of [r, c] pairs.
+
+        See add_obstacles_from_mask().
+        """
+
+        indices = np.asarray( indices, dtype=np.int64 ).reshape( ( -1, 2 ) )
+
+        rs = indices[:, GridMap2D.I_R]
+        cs = indices[:, GridMap2D.I_C]
+
+        if ( True == ( ( rs < 0 ) | ( rs >= self.rows ) | ( cs < 0 ) | ( cs >= self.cols ) ).any() ):
+            raise IndexError( "Obstacle indices out of range. rows = %d, cols = %d." % ( self.rows, self.cols ) )
+
+        mask = np.zeros( ( self.rows, self.cols ), dtype=np.bool_ )
+        mask[ rs, cs ] = True
+
+        self.add_obstacles_from_mask( mask, value )
+
     def overwrite_block(self, r, c, b):
         """
         r: Row index.
         c: Col index.
         b: The new block.
 
-        b will be assigned to the specified location by a deepcopy.
+        Only the type and the value of b are stored into the map.
         The overwritten block does not share the same coordinates with b.
         The coordinates are assigned by the values of r and c.
         """
@@ -808,10 +1325,145 @@ class GridMap2D(object):
         assert( r < self.rows )
         assert( c < self.cols )
 
-        temp = copy.deepcopy(b)
-        temp.set_coor_size( c, r, self.stepSize[GridMap2D.I_Y], self.stepSize[GridMap2D.I_X] )
+        t = get_block_type(b)
+
+        if ( t != self.blockTypes[r, c] and \
+             ( BLOCK_TYPE_OBSTACLE == t or BLOCK_TYPE_OBSTACLE == self.blockTypes[r, c] ) ):
+            self.isPassabilityOutdated = True
+
+        self.blockTypes[r, c]  = t
+        self.blockValues[r, c] = b.value
+
+        self.version += 1
+
+    def update_passability(self):
+        """
+        Build the passability tables from the obstacles. The rules are the same
+        with GridMapEnv.can_move_east() ... GridMapEnv.can_move_southeast() without
+        the boundary checks.
+        """
+
+        rows, cols = self.rows, self.cols
+
+        # Obstacle flags padded by one row and one column on both sides. Index -1 takes
+        # the last row or column, the same as indexing a list with -1.
+        p = np.zeros( ( rows + 2, cols + 2 ), dtype=np.bool_ )
+        p[1:-1, 1:-1] = BLOCK_TYPE_OBSTACLE == self.blockTypes
+        p[0, 1:-1]    = p[rows, 1:-1]
+        p[:, 0]       = p[:, cols]
+
+        # Obstacle flags of the four blocks around every grid vertex [r, c].
+        o     = p[ 1:rows+2, 1:cols+2 ] # [r,   c  ]
+        oL    = p[ 1:rows+2, 0:cols+1 ] # [r,   c-1]
+        oB    = p[ 0:rows+1, 1:cols+2 ] # [r-1, c  ]
+        oBL   = p[ 0:rows+1, 0:cols+1 ] # [r-1, c-1]
+
+        def compose(masks):
+            res = np.zeros( ( rows + 1, cols + 1 ), dtype=np.uint8 )
+            for d, m in masks:
+                res[m] |= d
+            return res
+
+        self.vertexBlockedDirs = compose( [ \
+            ( DIRECTION_EAST,      o | oB ), \
+            ( DIRECTION_NORTHEAST, o ), \
+            ( DIRECTION_NORTH,     o | oL ), \
+            ( DIRECTION_NORTHWEST, oL ), \
+            ( DIRECTION_WEST,      oL | oBL ), \
+            ( DIRECTION_SOUTHWEST, oBL ), \
+            ( DIRECTION_SOUTH,     oB | oBL ), \
+            ( DIRECTION_SOUTHEAST, oB ) ] )
+
+        self.hLineBlockedDirs = compose( [ \
+            ( DIRECTION_EAST,      o | oB ), \
+            ( DIRECTION_NORTHEAST, o ), \
+            ( DIRECTION_NORTH,     o ), \
+            ( DIRECTION_NORTHWEST, o ), \
+            ( DIRECTION_WEST,      o | oB ), \
+            ( DIRECTION_SOUTHWEST, oB ), \
+            ( DIRECTION_SOUTH,     oB ), \
+            ( DIRECTION_SOUTHEAST, oB ) ] )[:, :cols]
+
+        self.vLineBlockedDirs = compose( [ \
+            ( DIRECTION_EAST,      o ), \
+            ( DIRECTION_NORTHEAST, o ), \
+            ( DIRECTION_NORTH,     o | oL ), \
+            ( DIRECTION_NORTHWEST, oL ), \
+            ( DIRECTION_WEST,      oL ), \
+            ( DIRECTION_SOUTHWEST, oL ), \
+            ( DIRECTION_SOUTH,     o | oL ), \
+            ( DIRECTION_SOUTHEAST, o ) ] )[:rows, :]
+
+        self.isPassabilityOutdated = False
+
+    def get_blocked_directions_s(self, x, y, eps = 1e-6):
+        """
+        Return the bit mask of the directions (DIRECTION_XXX) that an agent at (x, y)
+        could not move to. Being within eps from a boundary blocks the directions
+        towards and along that boundary.
+        """
+
+        if ( True == self.isPassabilityOutdated ):
+            self.update_passability()
+
+        blocked = 0
+
+        # Boundaries.
+        if ( math.fabs( x - self.corners[1][GridMap2D.I_X] ) < eps ):
+            blocked |= BLOCKED_BY_EAST_BOUNDARY
+        if ( math.fabs( y - self.corners[2][GridMap2D.I_Y] ) < eps ):
+            blocked |= BLOCKED_BY_NORTH_BOUNDARY
+        if ( math.fabs( x - self.corners[0][GridMap2D.I_X] ) < eps ):
+            blocked |= BLOCKED_BY_WEST_BOUNDARY
+        if ( math.fabs( y - self.corners[0][GridMap2D.I_Y] ) < eps ):
+            blocked |= BLOCKED_BY_SOUTH_BOUNDARY
+
+        # Grid vertices and lines.
+        c = int( ( 1.0*x - self.origin[GridMap2D.I_X] ) / self.stepSize[GridMap2D.I_X] )
+        r = int( ( 1.0*y - self.origin[GridMap2D.I_Y] ) / self.stepSize[GridMap2D.I_Y] )
+
+        onV = ( x == c * self.stepSize[GridMap2D.I_X] )
+        onH = ( y == r * self.stepSize[GridMap2D.I_Y] )
+
+        if ( True == onH and True == onV ):
+            blocked |= self.vertexBlockedDirs[r, c]
+        elif ( True == onH ):
+            blocked |= self.hLineBlockedDirs[r, c]
+        elif ( True == onV ):
+            blocked |= self.vLineBlockedDirs[r, c]
+
+        return int( blocked )
+
+    def get_blocked_directions(self, xs, ys, eps = 1e-6):
+        """
+        Vectorized version of get_blocked_directions_s(). xs and ys are NumPy arrays
+        of the same shape. Return an int64 NumPy array of the bit masks.
+        """
+
+        if ( True == self.isPassabilityOutdated ):
+            self.update_passability()
 
-        self.blockRows[r][c] = temp
+        blocked = np.zeros( xs.shape, dtype=np.int64 )
+
+        # Boundaries.
+        blocked[ np.fabs( xs - self.corners[1][GridMap2D.I_X] ) < eps ] |= BLOCKED_BY_EAST_BOUNDARY
+        blocked[ np.fabs( ys - self.corners[2][GridMap2D.I_Y] ) < eps ] |= BLOCKED_BY_NORTH_BOUNDARY
+        blocked[ np.fabs( xs - self.corners[0][GridMap2D.I_X] ) < eps ] |= BLOCKED_BY_WEST_BOUNDARY
+        blocked[ np.fabs( ys - self.corners[0][GridMap2D.I_Y] ) < eps ] |= BLOCKED_BY_SOUTH_BOUNDARY
+
+        # Grid vertices and lines.
+        cs = ( ( xs - self.origin[GridMap2D.I_X] ) / self.stepSize[GridMap2D.I_X] ).astype(np.int64)
+        rs = ( ( ys - self.origin[GridMap2D.I_Y] ) / self.stepSize[GridMap2D.I_Y] ).astype(np.int64)
+
+        onV = ( xs == cs * self.stepSize[GridMap2D.I_X] )
+        onH = ( ys == rs * self.stepSize[GridMap2D.I_Y] )
+
+        for mask, table in ( ( onH & onV, self.vertexBlockedDirs ), \
+                             ( onH & ~onV, self.hLineBlockedDirs ), \
+                             ( onV & ~onH, self.vLineBlockedDirs ) ):
+            blocked[mask] |= table[ rs[mask], cs[mask] ]
+
+        return blocked
 
     def get_string_starting_block(self):
         if ( True == self.haveStartingBlock ):
@@ -892,6 +1544,18 @@ origin = [%d, %d], size = [%d, %d].""" \
         
         return False
 
+    def is_out_of_or_on_boundary_array(self, xs, ys):
+        """Vectorized version of is_out_of_or_on_boundary_s(). Return a boolean NumPy array."""
+
+        return ( xs <= self.corners[0][GridMap2D.I_X] ) | ( xs >= self.corners[1][GridMap2D.I_X] ) | \
+               ( ys <= self.corners[0][GridMap2D.I_Y] ) | ( ys >= self.corners[3][GridMap2D.I_Y] )
+
+    def is_out_of_boundary_array(self, xs, ys):
+        """Vectorized version of is_out_of_boundary_s(). Return a boolean NumPy array."""
+
+        return ( xs < self.corners[0][GridMap2D.I_X] ) | ( xs > self.corners[1][GridMap2D.I_X] ) | \
+               ( ys < self.corners[0][GridMap2D.I_Y] ) | ( ys > self.corners[3][GridMap2D.I_Y] )
+
     def is_out_of_or_on_boundary(self, coor):
         """Overloaded function. Vary only in the argument list."""
 
@@ -947,6 +1611,14 @@ origin = [%d, %d], size = [%d, %d].""" \
     def sum_block_values(self, idxList):
         """
         Sum the values according to the index list in idxList.
+        idxList is a list of BlockIndex objects. See sum_block_values_s().
+        """
+
+        return self.sum_block_values_s( [ ( idx.r, idx.c ) for idx in idxList ] )
+
+    def sum_block_values_s(self, rcList):
+        """
+        Sum the values according to rcList, a sequence of (r, c) pairs.
 
         It is processed as follows:
         * If neighboring block is out of boundary, an outOfBoundaryValue will be added.
@@ -955,14 +1627,14 @@ origin = [%d, %d], size = [%d, %d].""" \
         """
 
         # Number of indices.
-        n = len( idxList )
+        n = len( rcList )
 
         if ( 0 == n ):
-            raise GridMapException("The length of idxList must not be zero.")
+            raise GridMapException("The length of rcList must not be zero.")
 
         if ( 1 == n ):
-            idx = idxList[0]
-            return self.blockRows[ idx.r ][ idx.c ].value
+            r, c = rcList[0]
+            return float( self.blockValues[ r, c ] )
 
         flagHaveNormalBlock    = False
         flagHaveNonNormalBlock = False
@@ -971,28 +1643,28 @@ origin = [%d, %d], size = [%d, %d].""" \
         valNB = 0 # The value of the normal block.
         valOB = 0 # The value for out of boundary.
 
-        for idx in idxList:
-            # Check if idx is out of boundary.
-            if ( idx.r >= self.rows or \
-                 idx.c >= self.cols or \
-                 idx.r < 0 or \
-                 idx.c < 0 ):
+        for r, c in rcList:
+            # Check if [r, c] is out of boundary.
+            if ( r >= self.rows or \
+                 c >= self.cols or \
+                 r < 0 or \
+                 c < 0 ):
                 valOB = self.outOfBoundValue
                 flagHaveNonNormalBlock = True
                 continue
 
-            # Get the actual block.
-            b = self.blockRows[ idx.r ][ idx.c ]
+            # Get the type of the actual block.
+            t = self.blockTypes[ r, c ]
 
-            # Check if idx is a normal block.
-            if ( isinstance( b, NormalBlock ) ):
+            # Check if [r, c] is a normal block.
+            if ( BLOCK_TYPE_NORMAL == t ):
                 flagHaveNormalBlock = True
-                valNB = b.value
+                valNB = float( self.blockValues[ r, c ] )
                 continue
 
-            # Check if idx is an obstacle.
-            if ( isinstance( b, ObstacleBlock ) ):
-                val += b.value
+            # Check if [r, c] is an obstacle.
+            if ( BLOCK_TYPE_OBSTACLE == t ):
+                val += float( self.blockValues[ r, c ] )
                 flagHaveNonNormalBlock = True
                 continue
 
@@ -1032,33 +1704,24 @@ origin = [%d, %d], size = [%d, %d].""" \
         # In or on the boundary.
         
         # Check if the coordinate is a corner, horizontal, or vertical line of the map.
-        loc = self.is_corner_or_principle_line( BlockCoor( x, y ) )
+        flagCorner, flagH, flagV, r, c = self.is_corner_or_principle_line_s( x, y )
 
-        idxList = [] # The index list of neighoring blocks.
-        idx = copy.deepcopy( loc[3] )
-
-        if ( True == loc[0] ):
+        # The index list of neighoring blocks.
+        if ( True == flagCorner ):
             # A corner.
-            idxList.append( copy.deepcopy(idx) ); idx.c -= 1
-            idxList.append( copy.deepcopy(idx) ); idx.r -= 1
-            idxList.append( copy.deepcopy(idx) ); idx.c += 1
-            idxList.append( copy.deepcopy(idx) )
-        elif ( True == loc[1] ):
+            rcList = ( ( r, c ), ( r, c - 1 ), ( r - 1, c - 1 ), ( r - 1, c ) )
+        elif ( True == flagH ):
             # A horizontal line.
-            idxList.append( copy.deepcopy(idx) ); idx.r -= 1
-            idxList.append( copy.deepcopy(idx) )
-        elif ( True == loc[2] ):
+            rcList = ( ( r, c ), ( r - 1, c ) )
+        elif ( True == flagV ):
             # A vertical line.
-            idxList.append( copy.deepcopy(idx) ); idx.c -= 1
-            idxList.append( copy.deepcopy(idx) )
+            rcList = ( ( r, c ), ( r, c - 1 ) )
         else:
             # A normal block.
-            idxList.append( idx )
+            rcList = ( ( r, c ), )
 
         # Summation routine.
-        val = self.sum_block_values( idxList )
-
-        return val
+        return self.sum_block_values_s( rcList )
 
     def evaluate_coordinate(self, coor):
         """Overloaded function. Only varys in argument list."""
@@ -1070,6 +1733,102 @@ origin = [%d, %d], size = [%d, %d].""" \
         else:
             raise TypeError("coor should be either an object of BlockCoor or a list.")
     
+    def evaluate_coordinates(self, xs, ys):
+        """
+        Vectorized version of evaluate_coordinate(). xs and ys are NumPy arrays of the same
+        shape. Return a NumPy array of the values with the same shape. The rules are the
+        same with evaluate_coordinate_s(). An exception will be raised if any of the
+        coordinates is out of boundary.
+        """
+
+        xs = np.asarray( xs, dtype=np.float64 )
+        ys = np.asarray( ys, dtype=np.float64 )
+
+        if ( xs.shape != ys.shape ):
+            raise GridMapException("xs and ys must have the same shape. xs.shape = {}, ys.shape = {}.".format( xs.shape, ys.shape ))
+
+        shape = xs.shape
+        xs = xs.reshape((-1,))
+        ys = ys.reshape((-1,))
+
+        # Check if any coordinate is out of boundary.
+        flagOut = ( xs < self.corners[0][GridMap2D.I_X] ) | ( xs > self.corners[1][GridMap2D.I_X] ) | \
+                  ( ys < self.corners[0][GridMap2D.I_Y] ) | ( ys > self.corners[3][GridMap2D.I_Y] )
+
+        if ( True == flagOut.any() ):
+            i = np.argmax( flagOut )
+            raise GridMapException("Coordinate (%f, %f) out of boundary. Could not evaluate its value." % ( xs[i], ys[i] ))
+
+        # Indices and the locations on the grid.
+        w = self.stepSize[GridMap2D.I_X]
+        h = self.stepSize[GridMap2D.I_Y]
+
+        cs = ( ( xs - self.origin[GridMap2D.I_X] ) / w ).astype(np.int64)
+        rs = ( ( ys - self.origin[GridMap2D.I_Y] ) / h ).astype(np.int64)
+
+        onH = ( ys == rs * h )
+        onV = ( xs == cs * w )
+
+        # The neighboring blocks. Same order with evaluate_coordinate_s().
+        # Corner: [r, c], [r, c-1], [r-1, c-1], [r-1, c].
+        # Horizontal line: [r, c], [r-1, c].
+        # Vertical line: [r, c], [r, c-1].
+        n = xs.size
+        dr = np.zeros( ( n, 4 ), dtype=np.int64 )
+        dc = np.zeros( ( n, 4 ), dtype=np.int64 )
+        used = np.zeros( ( n, 4 ), dtype=np.bool_ )
+        used[:, 0] = True
+
+        corner = onH & onV
+        hLine  = onH & ~onV
+        vLine  = onV & ~onH
+
+        dc[corner, 1] = -1; dr[corner, 2] = -1; dc[corner, 2] = -1; dr[corner, 3] = -1
+        used[corner, 1:] = True
+
+        dr[hLine, 1] = -1
+        used[hLine, 1] = True
+
+        dc[vLine, 1] = -1
+        used[vLine, 1] = True
+
+        nr = rs[:, np.newaxis] + dr
+        nc = cs[:, np.newaxis] + dc
+
+        flagIn  = used & ( nr >= 0 ) & ( nr < self.rows ) & ( nc >= 0 ) & ( nc < self.cols )
+        flagOOB = used & ~flagIn
+
+        nr = np.clip( nr, 0, self.rows - 1 )
+        nc = np.clip( nc, 0, self.cols - 1 )
+
+        types  = self.blockTypes[ nr, nc ]
+        values = self.blockValues[ nr, nc ]
+
+        flagNormal   = flagIn & ( BLOCK_TYPE_NORMAL == types )
+        flagObstacle = flagIn & ( BLOCK_TYPE_OBSTACLE == types )
+
+        haveOOB       = flagOOB.any( axis=1 )
+        haveNonNormal = haveOOB | flagObstacle.any( axis=1 )
+        haveNormal    = flagNormal.any( axis=1 )
+
+        # Obstacles are summed. Out-of-boundary is counted once.
+        res = ( values * flagObstacle ).sum( axis=1 ) + np.where( haveOOB, self.outOfBoundValue, 0 )
+
+        # The last normal block is counted if there are no obstacles or out-of-boundary blocks.
+        lastNormal = 3 - np.argmax( flagNormal[:, ::-1], axis=1 )
+        valNB = values[ np.arange(n), lastNormal ]
+        res += np.where( ~haveNonNormal & haveNormal, valNB, 0 )
+
+        # Inside a block.
+        inside = ~onH & ~onV
+        res[inside] = values[inside, 0]
+
+        flagNone = ~inside & ~haveNonNormal & ~haveNormal
+        if ( True == flagNone.any() ):
+            raise GridMapException("No blocks are recognized!")
+
+        return res.reshape( shape )
+
     def convert_to_coordinates_s(self, r, c):
         """Convert the index into the real valued coordinates."""
 
@@ -1133,6 +1892,29 @@ origin = [%d, %d], size = [%d, %d].""" \
         else:
             return ( math.fabs( coor.y - self.corners[0][1] ) < eps )
 
+    def is_corner_or_principle_line_s(self, x, y):
+        """
+        Scalar version of is_corner_or_principle_line(). No objects are created.
+
+        The return value contains 5 parts:
+        (1) Ture if (x, y) is precisely a corner.
+        (2) Ture if (x, y) lies on a horizontal principle line or is a corner.
+        (3) Ture if (x, y) lies on a vertical principle line or is a corner.
+        (4) The row index associated with (x, y).
+        (5) The column index associated with (x, y).
+        """
+
+        w = self.stepSize[GridMap2D.I_X]
+        h = self.stepSize[GridMap2D.I_Y]
+
+        c = int( ( 1.0*x - self.origin[GridMap2D.I_X] ) / w )
+        r = int( ( 1.0*y - self.origin[GridMap2D.I_Y] ) / h )
+
+        flagH = ( y == r * h )
+        flagV = ( x == c * w )
+
+        return ( flagH and flagV ), flagH, flagV, r, c
+
     def is_corner_or_principle_line(self, coor):
         """
         It is NOT rerquired that coor is inside the map.
@@ -1159,10 +1941,397 @@ origin = [%d, %d], size = [%d, %d].""" \
 
         return res
 
+HISTORY_MODE_OFF  = "off"  # No history.
+HISTORY_MODE_RING = "ring" # The latest locations in a ring buffer of fixed size.
+HISTORY_MODE_FULL = "full" # All the locations in arrays growing on demand.
+
+HISTORY_MODES = [ HISTORY_MODE_OFF, HISTORY_MODE_RING, HISTORY_MODE_FULL ]
+
+class AgentHistory(object):
+    """
+    The locations of an agent and the actions leading to them, stored in float64
+    arrays of shape (N, 2). acts[i] is the action taken to reach locs[i]. The
+    action of the first location is not used.
+
+    HISTORY_MODE_RING keeps the latest capacity locations. Every row is written
+    twice, at i and i + capacity, so the kept rows are always contiguous.
+
+    Every written row gets a unique stamp. A row with the same index and the same
+    stamp has not been rewritten since, and neither have the rows before it.
+    """
+
+    INITIAL_ROWS = 64
+
+    def __init__(self, mode = HISTORY_MODE_FULL, capacity = 1000):
+        self.mode     = None
+        self.capacity = 0 # Only used by HISTORY_MODE_RING.
+
+        self.nTotal = 0 # Number of locations appended since clear().
+        self.n      = 0 # Number of locations kept.
+
+        self.locs = None
+        self.acts = None
+
+        self.stamps    = None
+        self.nextStamp = 0
+
+        self.set_mode( mode, capacity )
+
+    def set_mode(self, mode, capacity = 1000):
+        """Change the mode. The kept locations are moved to the new storage as much as possible."""
+
+        if ( mode not in HISTORY_MODES ):
+            raise ValueError("Unexpected history mode {}. Expecting one of {}.".format( mode, HISTORY_MODES ))
+
+        if ( HISTORY_MODE_RING == mode and capacity < 1 ):
+            raise ValueError("The capacity of the ring buffer must be positive. capacity = {}.".format( capacity ))
+
+        if ( self.mode is None ):
+            locs, acts = np.zeros( ( 0, 2 ) ), None
+        else:
+            locs, acts = self.get_locs().copy(), self.get_acts().copy()
+
+        nTotal = self.nTotal
+
+        self.mode     = mode
+        self.capacity = capacity
+
+        if ( HISTORY_MODE_RING == mode ):
+            nRows = 2 * capacity
+        elif ( HISTORY_MODE_FULL == mode ):
+            nRows = AgentHistory.INITIAL_ROWS
+        else:
+            nRows = 0
+
+        self.locs = np.zeros( ( nRows, 2 ), dtype=np.float64 )
+        self.acts = np.zeros( ( nRows, 2 ), dtype=np.float64 )
+        self.stamps = np.zeros( ( nRows, ), dtype=np.int64 )
+
+        self.fill( locs, acts, nTotal )
+
+    def clear(self):
+        self.n      = 0
+        self.nTotal = 0
+
+    def get_start(self):
+        """Return the row index of the first kept location."""
+
+        if ( HISTORY_MODE_RING == self.mode ):
+            return ( self.nTotal - self.n ) % self.capacity
+        else:
+            return 0
+
+    def grow(self, nRows):
+        locs = np.zeros( ( nRows, 2 ), dtype=np.float64 )
+        acts = np.zeros( ( nRows, 2 ), dtype=np.float64 )
+
+        stamps = np.zeros( ( nRows, ), dtype=np.int64 )
+
+        locs[:self.n] = self.locs[:self.n]
+        acts[:self.n] = self.acts[:self.n]
+        stamps[:self.n] = self.stamps[:self.n]
+
+        self.locs = locs
+        self.acts = acts
+        self.stamps = stamps
+
+    def append(self, x, y, dx = 0.0, dy = 0.0):
+        """Append the location ( x, y ) reached by the action ( dx, dy )."""
+
+        if ( HISTORY_MODE_FULL == self.mode ):
+            i = self.n
+
+            if ( i == self.locs.shape[0] ):
+                self.grow( 2 * i )
+
+            # Element-wise assignments are faster than assigning tuples to rows.
+            locs, acts = self.locs, self.acts
+            locs[i, 0] = x
+            locs[i, 1] = y
+            acts[i, 0] = dx
+            acts[i, 1] = dy
+            self.stamps[i] = self.nextStamp
+
+            self.n += 1
+        elif ( HISTORY_MODE_RING == self.mode ):
+            i = self.nTotal % self.capacity
+            j = i + self.capacity
+
+            locs, acts = self.locs, self.acts
+            locs[i, 0] = locs[j, 0] = x
+            locs[i, 1] = locs[j, 1] = y
+            acts[i, 0] = acts[j, 0] = dx
+            acts[i, 1] = acts[j, 1] = dy
+            self.stamps[i] = self.stamps[j] = self.nextStamp
+
+            if ( self.n < self.capacity ):
+                self.n += 1
+
+        self.nTotal += 1
+        self.nextStamp += 1
+
+    def get_locs(self):
+        """Return the (n, 2) array of the kept locations. The array is a view of the storage."""
+
+        s = self.get_start()
+        return self.locs[ s:s + self.n ]
+
+    def get_acts(self):
+        """Return the (n - 1, 2) array of the actions between the kept locations. The array is a view of the storage."""
+
+        s = self.get_start()
+        return self.acts[ s + 1:s + self.n ]
+
+    def fill(self, locs, acts, nTotal):
+        """
+        Replace the history by the (n, 2) locations and the (n - 1, 2) actions. The
+        actions are zeros if acts is None. nTotal is the number of locations ever
+        appended, including the ones not in locs.
+        """
+
+        locs = np.asarray( locs, dtype=np.float64 ).reshape( ( -1, 2 ) )
+        n = locs.shape[0]
+
+        a = np.zeros( ( n, 2 ), dtype=np.float64 )
+
+        if ( acts is not None and n > 0 ):
+            acts = np.asarray( acts, dtype=np.float64 ).reshape( ( -1, 2 ) )
+
+            if ( acts.shape[0] != n - 1 ):
+                raise ValueError("Expecting {} actions for {} locations. Got {}.".format( n - 1, n, acts.shape[0] ))
+
+            a[1:] = acts
+
+        if ( nTotal < n ):
+            raise ValueError("nTotal ({}) must not be smaller than the number of locations ({}).".format( nTotal, n ))
+
+        self.nTotal = nTotal
+
+        if ( HISTORY_MODE_FULL == self.mode ):
+            if ( n > self.locs.shape[0] ):
+                self.grow( n )
+
+            self.locs[:n] = locs
+            self.acts[:n] = a
+            self.stamps[:n] = np.arange( self.nextStamp, self.nextStamp + n )
+            self.n = n
+        elif ( HISTORY_MODE_RING == self.mode ):
+            self.n = min( n, self.capacity )
+
+            idx = np.arange( nTotal - self.n, nTotal ) % self.capacity
+
+            self.locs[idx] = self.locs[ idx + self.capacity ] = locs[ n - self.n: ]
+            self.acts[idx] = self.acts[ idx + self.capacity ] = a[ n - self.n: ]
+            self.stamps[idx] = self.stamps[ idx + self.capacity ] = np.arange( self.nextStamp, self.nextStamp + self.n )
+        else:
+            self.n = 0
+
+        self.nextStamp += n
+
+    def set(self, locs, acts = None):
+        """Replace the history by the (n, 2) locations and the (n - 1, 2) actions."""
+
+        locs = np.asarray( locs, dtype=np.float64 ).reshape( ( -1, 2 ) )
+        self.fill( locs, acts, locs.shape[0] )
+
+    def get_rows(self, k):
+        """
+        Return the storage rows of the k-th location appended since clear(). Raise
+        GridMapException if the location is not kept.
+        """
+
+        if ( k < self.nTotal - self.n or k >= self.nTotal ):
+            raise GridMapException("Location {} is not in the history. Kept locations are {} to {}.".format( k, self.nTotal - self.n, self.nTotal - 1 ))
+
+        if ( HISTORY_MODE_RING == self.mode ):
+            i = k % self.capacity
+            return ( i, i + self.capacity )
+        else:
+            return ( k, )
+
+    def set_entry(self, a, k, j, v):
+        """Write v into column j of the k-th location of a, which is self.locs or self.acts."""
+
+        for i in self.get_rows(k):
+            a[i, j] = v
+
+    def truncate(self, nTotal):
+        """Drop the locations appended after the first nTotal ones."""
+
+        d = self.nTotal - nTotal
+
+        if ( d > 0 ):
+            self.n = max( self.n - d, 0 )
+            self.nTotal = nTotal
+
+    def get_stamp(self, k):
+        """Return the stamp of the k-th location appended since clear(), or None if it is not kept."""
+
+        if ( k < self.nTotal - self.n or k >= self.nTotal ):
+            return None
+
+        return int( self.stamps[ self.get_rows(k)[0] ] )
+
+    def get_mark(self):
+        """Return ( nTotal, stamp of the last location ) for restore()."""
+
+        return ( self.nTotal, self.get_stamp( self.nTotal - 1 ) )
+
+    def restore(self, mark, x, y, dx, dy):
+        """
+        Go back to the time of get_mark(). ( x, y ) is the last location at that time
+        and ( dx, dy ) is the action leading to it. The history is truncated if it
+        continues the one of mark and still keeps ( x, y ). Otherwise, e.g., mark is
+        taken on another branch of a search tree or before clear(), the kept
+        locations are not the ones leading to ( x, y ). They are replaced by ( x, y )
+        alone, keeping nTotal of mark. Return True if the history is truncated,
+        False if it is replaced.
+        """
+
+        nTotal, stamp = mark
+
+        self.truncate( nTotal )
+
+        if ( self.nTotal == nTotal and self.get_stamp( nTotal - 1 ) == stamp ):
+            return True
+
+        self.fill( [ [ x, y ] ] if ( nTotal > 0 ) else np.zeros( ( 0, 2 ) ), None, nTotal )
+
+        if ( self.n > 0 ):
+            self.set_entry( self.acts, nTotal - 1, 0, dx )
+            self.set_entry( self.acts, nTotal - 1, 1, dy )
+
+        return False
+
+    def copy(self):
+        res = copy.copy(self)
+        res.locs = self.locs.copy()
+        res.acts = self.acts.copy()
+        res.stamps = self.stamps.copy()
+
+        return res
+
+    def __len__(self):
+        return self.n
+
+class HistoryCoor(BlockCoor):
+    """A BlockCoor reading and writing the k-th location of an AgentHistory."""
+
+    __slots__ = ( "history", "k" )
+
+    FIELDS = ( "x", "y" )
+
+    def __init__(self, history, k):
+        self.history = history
+        self.k = k
+
+    def get_entry(self, j):
+        return float( self.history.locs[ self.history.get_rows(self.k)[0], j ] )
+
+    @property
+    def x(self):
+        return self.get_entry(0)
+
+    @x.setter
+    def x(self, v):
+        self.history.set_entry( self.history.locs, self.k, 0, v )
+
+    @property
+    def y(self):
+        return self.get_entry(1)
+
+    @y.setter
+    def y(self, v):
+        self.history.set_entry( self.history.locs, self.k, 1, v )
+
+    def __reduce__(self):
+        return ( BlockCoor, ( self.x, self.y ) )
+
+class HistoryCoorDelta(BlockCoorDelta):
+    """A BlockCoorDelta reading and writing the action leading to the k-th location of an AgentHistory."""
+
+    __slots__ = ( "history", "k" )
+
+    FIELDS = ( "dx", "dy" )
+
+    def __init__(self, history, k):
+        self.history = history
+        self.k = k
+
+    def get_entry(self, j):
+        return float( self.history.acts[ self.history.get_rows(self.k)[0], j ] )
+
+    @property
+    def dx(self):
+        return self.get_entry(0)
+
+    @dx.setter
+    def dx(self, v):
+        self.history.set_entry( self.history.acts, self.k, 0, v )
+
+    @property
+    def dy(self):
+        return self.get_entry(1)
+
+    @dy.setter
+    def dy(self, v):
+        self.history.set_entry( self.history.acts, self.k, 1, v )
+
+    def __reduce__(self):
+        return ( BlockCoorDelta, ( self.dx, self.dy ) )
+
+class AgentHistoryView(object):
+    """
+    A list-like view of the locations or the actions of an AgentHistory. Items are
+    HistoryCoor or HistoryCoorDelta objects writing through to the history, and
+    assigning an item overwrites the history. The length is fixed. Change the
+    history by GridMapEnv instead of appending or removing items.
+    """
+
+    def __init__(self, history, itemType, offset):
+        """offset: 0 for the locations, 1 for the actions, which start from the second location."""
+
+        self.history  = history
+        self.itemType = itemType
+        self.offset   = offset
+
+    def __len__(self):
+        return max( self.history.n - self.offset, 0 )
+
+    def __getitem__(self, i):
+        n = len(self)
+
+        if ( isinstance( i, slice ) ):
+            return [ self[j] for j in range( *i.indices(n) ) ]
+
+        if ( i < 0 ):
+            i += n
+
+        if ( i < 0 or i >= n ):
+            raise IndexError("History index out of range.")
+
+        return self.itemType( self.history, self.history.nTotal - self.history.n + self.offset + i )
+
+    def __setitem__(self, i, v):
+        item = self[i]
+
+        for name in self.itemType.FIELDS:
+            setattr( item, name, getattr( v, name ) )
+
+    def __iter__(self):
+        for i in range( len(self) ):
+            yield self[i]
+
+    def __str__(self):
+        return "[{}]".format( ", ".join( [ str(item) for item in self ] ) )
+
 class GridMapEnv(object):
     END_POINT_MODE_BLOCK  = 1
     END_POINT_MODE_RADIUS = 2
 
+    RENDER_MODE_HUMAN     = "human"
+    RENDER_MODE_RGB_ARRAY = "rgb_array"
+
     def __init__(self, name = "DefaultGridMapEnv", gridMap = None, workingDir = "./"):
         self.name = name
         self.map  = gridMap
@@ -1179,21 +2348,24 @@ class GridMapEnv(object):
         self.nSteps = 0
         self.maxSteps = 0 # Set 0 for no maximum steps.
 
-        self.agentCurrentLoc = copy.deepcopy( self.agentStartingLoc )
+        self.agentCurrentLoc = None # Should be an object of BlockCoor.
         self.agentCurrentAct = None # Should be an object of BlockCoorDelta.
 
-        self.agentLocs = [ copy.deepcopy(self.agentCurrentLoc) ]
-        self.agentActs = [ ] # Should be a list of objects of BlockCoorDelta.
+        # The history of the agent locations and actions.
+        self.history = AgentHistory()
 
         self.totalValue = 0
 
         self.visAgentRadius    = 1.0
         self.visPathArrowWidth = 1.0
+        self.visPixelsPerBlock = 10 # The resolution of render(mode="rgb_array").
 
         self.visIsForcePause   = False
         self.visForcePauseTime = 1
 
         self.tryMoveMaxCount   = 0 # 0 for disabled.
+        self.gridTraversal     = True # Use the grid traversal engine in try_move().
+        self.tryMoveDebug      = False # Record every crossing in try_move() for debugging.
 
         self.nondimensionalStep = False
         self.nondimensionalStepRatio = 0.25 # For non-dimensional step, the maximum size of individual step compared to the length of the map.
@@ -1212,9 +2384,10 @@ class GridMapEnv(object):
         self.flagActionValue = False
         self.actionValueFactor = 1.0
 
-        self.fig = None # The matplotlib figure.
-        self.drawnAgentLocations = 0 # The number of agent locations that have been drawn on the canvas.
-        self.drawnAgentPaths     = 0 # The number of agent path that have been drawn on the canvas.
+        self.renderBackend = None # Created on demand. See set_render_backend().
+        self.arrayRenderBackend = None # Used by render(mode="rgb_array").
+
+        self.asyncWriter = None # See enable_async_writer().
 
     def set_working_dir(self, workingDir):
         self.workingDir = workingDir
@@ -1229,6 +2402,20 @@ class GridMapEnv(object):
     def disable_ending_point_radius(self):
         self.endPointMode = GridMapEnv.END_POINT_MODE_BLOCK
 
+    def enable_grid_traversal(self):
+        self.gridTraversal = True
+
+    def disable_grid_traversal(self):
+        """Use the line intersection engine in try_move()."""
+        self.gridTraversal = False
+
+    def enable_try_move_debug(self):
+        """Record every crossing in try_move() and print them if tryMoveMaxCount is reached."""
+        self.tryMoveDebug = True
+
+    def disable_try_move_debug(self):
+        self.tryMoveDebug = False
+
     def get_ending_point_radius(self):
         return self.endPointRadius
 
@@ -1275,10 +2462,73 @@ class GridMapEnv(object):
         assert( isinstance( m, (int, long) ) )
         assert( m >= 0 )
 
-        self.maxSteps = m
+        self.maxSteps = m
+
+    def get_max_steps(self):
+        return self.maxSteps
+
+    def set_history_mode(self, mode, capacity = 1000):
+        """
+        Set how the agent history is recorded.
+        mode: One of HISTORY_MODES. HISTORY_MODE_FULL records all the locations and
+        actions. HISTORY_MODE_RING keeps the latest capacity locations.
+        HISTORY_MODE_OFF does not record anything. render() and save() only see the
+        recorded history.
+        """
+
+        self.history.set_mode( mode, capacity )
+
+    def get_history_mode(self):
+        return self.history.mode
+
+    def get_trajectory_array(self):
+        """
+        Return the recorded agent locations as a read-only (n, 2) float64 array.
+        The coordinates are not normalized. The array is a view of the history
+        without copying. Copy it to keep it across step() and reset().
+        """
+
+        a = self.history.get_locs()
+        a.flags.writeable = False
+
+        return a
+
+    def get_action_array(self):
+        """
+        Return the recorded actions as a read-only (n - 1, 2) float64 array, where
+        n is the number of the recorded locations. The actions are the ones actually
+        applied, i.e., after clipping, scaling, and randomizing. The array is a view
+        of the history without copying.
+        """
+
+        a = self.history.get_acts()
+        a.flags.writeable = False
+
+        return a
+
+    @property
+    def agentLocs(self):
+        """The recorded agent locations as a list-like view of BlockCoor objects writing through to the history."""
+
+        return AgentHistoryView( self.history, HistoryCoor, 0 )
+
+    @agentLocs.setter
+    def agentLocs(self, locs):
+        """Replace the history by a list of BlockCoor objects. The actions are set to zero."""
+
+        self.history.set( [ [ loc.x, loc.y ] for loc in locs ] )
+
+    @property
+    def agentActs(self):
+        """The recorded agent actions as a list-like view of BlockCoorDelta objects writing through to the history."""
+
+        return AgentHistoryView( self.history, HistoryCoorDelta, 1 )
+
+    @agentActs.setter
+    def agentActs(self, acts):
+        """Replace the recorded actions by a list of BlockCoorDelta objects, one fewer than the locations."""
 
-    def get_max_steps(self):
-        return self.maxSteps
+        self.history.fill( self.history.get_locs().copy(), [ [ act.dx, act.dy ] for act in acts ], self.history.nTotal )
 
     def get_state_size(self):
         return self.agentCurrentLoc.size
@@ -1333,7 +2583,7 @@ class GridMapEnv(object):
         if ( False == self.flagActionClip ):
             raise GridMapException("Action clipping is disabled.")
         
-        clipped = copy.deepcopy(action)
+        clipped = BlockCoorDelta( action.dx, action.dy )
 
         if ( action.dx < self.actionClip[0] ):
             clipped.dx = self.actionClip[0]
@@ -1415,8 +2665,6 @@ class GridMapEnv(object):
 
         # Close render, if there are any.
         self.close_render()
-        self.drawnAgentLocations = 0
-        self.drawnAgentPaths     = 0
 
         # Get the index of the starting block.
         index = self.map.get_index_starting_block()
@@ -1432,14 +2680,14 @@ class GridMapEnv(object):
         )
         
         # Reset the location of the agent.
-        self.agentCurrentLoc = copy.deepcopy( self.agentStartingLoc )
+        self.agentCurrentLoc = self.agentStartingLoc.copy()
 
         # Clear the cuurent action of the agent.
         self.agentCurrentAct = BlockCoorDelta( 0, 0 )
 
         # Clear the history.
-        self.agentLocs = [ copy.deepcopy( self.agentStartingLoc ) ]
-        self.agentActs = [ ]
+        self.history.clear()
+        self.history.append( self.agentStartingLoc.x, self.agentStartingLoc.y )
 
         # Non-dimensional step size.
         if ( True == self.nondimensionalStep ):
@@ -1474,7 +2722,12 @@ class GridMapEnv(object):
         # Monitor.
         self.tryMoveMaxCount = max( self.map.rows, self.map.cols ) * 2
 
-        agentCurrentLocation = copy.deepcopy( self.agentCurrentLoc )
+        return self.get_current_state()
+
+    def get_current_state(self):
+        """Return the current location of the agent as a new BlockCoor, normalized if enabled."""
+
+        agentCurrentLocation = self.agentCurrentLoc.copy()
 
         if ( True == self.normalizedCoordinate ):
             agentCurrentLocation.x = ( agentCurrentLocation.x - self.centerCoordinate.x ) / self.halfMapSize[GridMap2D.I_C]
@@ -1487,13 +2740,13 @@ class GridMapEnv(object):
         Return values are next state, reward value, termination flag, and None.
         action: An object of BlockCoorDelta.
 
-        action will be deepcopied.
+        action will be copied. The returned state is a new object.
         """
 
         if ( True == self.isTerminated ):
             raise GridMapException("Episode already terminated.")
         
-        self.agentCurrentAct = copy.deepcopy( action )
+        self.agentCurrentAct = BlockCoorDelta( action.dx, action.dy )
         # import ipdb; ipdb.set_trace()
         # Action clipping.
         if ( True == self.flagActionClip ):
@@ -1515,12 +2768,12 @@ class GridMapEnv(object):
         if ( True == self.flagActionValue ):
             value -= self.actionValueFactor * ( max( action.dx**2 + action.dy**2 - 1.0**2 , 0.0 ))
 
-        # Update current location of the agent.
-        self.agentCurrentLoc = copy.deepcopy( newLoc )
+        # Update current location of the agent. newLoc and self.agentCurrentAct are
+        # created in this step and are never modified afterwards.
+        self.agentCurrentLoc = newLoc
 
         # Save the history.
-        self.agentLocs.append( copy.deepcopy( self.agentCurrentLoc ) )
-        self.agentActs.append( copy.deepcopy( self.agentCurrentAct ) )
+        self.history.append( newLoc.x, newLoc.y, self.agentCurrentAct.dx, self.agentCurrentAct.dy )
 
         # Update counter.
         self.nSteps += 1
@@ -1538,13 +2791,146 @@ class GridMapEnv(object):
             self.isTerminated = True
 
         if ( True == self.normalizedCoordinate ):
-            newLoc.x = ( newLoc.x - self.centerCoordinate.x ) / self.halfMapSize[GridMap2D.I_C]
-            newLoc.y = ( newLoc.y - self.centerCoordinate.y ) / self.halfMapSize[GridMap2D.I_R]
+            state = BlockCoor( \
+                ( newLoc.x - self.centerCoordinate.x ) / self.halfMapSize[GridMap2D.I_C], \
+                ( newLoc.y - self.centerCoordinate.y ) / self.halfMapSize[GridMap2D.I_R] )
+        else:
+            state = BlockCoor( newLoc.x, newLoc.y )
+
+        return state, value, termFlag, None
+
+    def get_state(self):
+        """
+        Return the dynamic part of the environment as a tuple for set_state(). The
+        map and the settings are not included. The tuple is
+        ( x, y, dx, dy, nSteps, totalValue, isTerminated, historyMark, rngState ),
+        where ( x, y ) is the agent location, ( dx, dy ) is the last action, and
+        historyMark is AgentHistory.get_mark(), i.e., the number of the agent locations
+        appended to the history and the stamp of the last one. rngState is the
+        state of the NumPy random generator if random coordinating is enabled,
+        otherwise None.
+        """
+
+        if ( self.agentCurrentLoc is None ):
+            raise GridMapException("The environment must be reset before get_state().")
+
+        return ( self.agentCurrentLoc.x, self.agentCurrentLoc.y, \
+            self.agentCurrentAct.dx, self.agentCurrentAct.dy, \
+            self.nSteps, self.totalValue, self.isTerminated, self.history.get_mark(), \
+            np.random.get_state() if ( True == self.isRandomCoordinating ) else None )
+
+    def set_state(self, state):
+        """
+        Restore the dynamic part of the environment from a tuple returned by get_state().
+        The agent history is truncated to its length at the time of get_state() if
+        state is taken on the way to the current state, e.g., the root of a search
+        tree. Otherwise, e.g., state is taken on another branch, the history is
+        replaced by the restored location alone since the locations leading to it
+        are no longer recorded. See AgentHistory.restore(). Extra entries of state
+        are ignored.
+        """
+
+        x, y, dx, dy, nSteps, totalValue, isTerminated, historyMark, rngState = state[:9]
+
+        self.agentCurrentLoc = BlockCoor( x, y )
+        self.agentCurrentAct = BlockCoorDelta( dx, dy )
+
+        self.nSteps       = nSteps
+        self.totalValue   = totalValue
+        self.isTerminated = isTerminated
+
+        self.history.restore( historyMark, x, y, dx, dy )
+
+        if ( rngState is not None ):
+            np.random.set_state( rngState )
+
+    def rollout(self, actions):
+        """
+        Run step() with the rows of the (n, 2) array actions until the episode
+        terminates or the actions run out. Return four arrays of k rows, where k
+        is the number of steps taken: the (k, 2) states after every action, the
+        (k, 2) actions, the (k,) values, and the (k,) termination flags.
+        """
+
+        actions = np.asarray( actions, dtype=np.float64 ).reshape( ( -1, 2 ) )
+
+        return self.run_rollout( lambda i, state: actions[i], actions.shape[0], None )
+
+    def run_rollout(self, policy, maxSteps, state):
+        """
+        The loop of rollout(). policy( i, state ) returns the i-th action as two
+        numbers, where state is the latest state returned by rollout_step(), or the
+        state argument for i = 0. The result arrays are allocated for maxSteps
+        steps and truncated to the steps taken.
+        """
+
+        states  = np.zeros( ( maxSteps, 2 ), dtype=np.float64 )
+        actions = np.zeros( ( maxSteps, 2 ), dtype=np.float64 )
+        values  = np.zeros( ( maxSteps, ), dtype=np.float64 )
+        flags   = np.zeros( ( maxSteps, ), dtype=np.bool_ )
+
+        k = 0
+
+        while ( k < maxSteps ):
+            actions[k] = policy( k, state )
+
+            state, values[k], flags[k] = self.rollout_step( actions[k] )
+            states[k] = state
 
-        return newLoc, value, termFlag, None
+            k += 1
 
-    def render(self, pause = 0, flagSave = False, fn = None):
-        """Render with matplotlib.
+            if ( True == flags[k-1] ):
+                break
+
+        return states[:k], actions[:k], values[:k], flags[:k]
+
+    def rollout_step(self, action):
+        """
+        Take a single step for run_rollout(). action has two elements. Return the
+        state, the value, and the termination flag. Subclasses with a different
+        step() override this function.
+        """
+
+        state, value, flag, dummy = self.step( BlockCoorDelta( action[0], action[1] ) )
+
+        return ( state.x, state.y ), value, flag
+
+    def set_render_backend(self, backend):
+        """
+        Set the backend used by render().
+        backend: A RenderBackends.RenderBackend object or one of the names in
+        RenderBackends.RENDER_BACKENDS, i.e., "none", "matplotlib" or "array".
+
+        The backends are imported on demand. matplotlib is not imported until
+        the matplotlib backend renders for the first time.
+        """
+
+        import RenderBackends
+
+        if ( not isinstance( backend, RenderBackends.RenderBackend ) ):
+            backend = RenderBackends.make_render_backend( backend )
+
+        self.close_render()
+        self.renderBackend = backend
+
+    def get_render_backend(self):
+        """Return the backend used by render(). The matplotlib backend is created if none is set."""
+
+        if ( self.renderBackend is None ):
+            self.set_render_backend("matplotlib")
+
+        return self.renderBackend
+
+    def set_render_resolution(self, pixelsPerBlock):
+        """Set the number of pixels per block of render(mode="rgb_array")."""
+
+        if ( pixelsPerBlock < 1 ):
+            raise ValueError("pixelsPerBlock must be positive. Got %s." % ( str(pixelsPerBlock) ))
+
+        self.visPixelsPerBlock = int( pixelsPerBlock )
+
+    def render(self, pause = 0, flagSave = False, fn = None, mode = RENDER_MODE_HUMAN):
+        """Render with the render backend. The matplotlib backend is used by default.
         pause: Time measured in seconds to pause before close the rendered image.
         If pause <= 0 then the rendered image will not be closed and the process
         will be blocked.
@@ -1553,127 +2939,100 @@ class GridMapEnv(object):
 
         NOTE: fn should not contain absolute path since the rendered file will be saved
         under the render directory as a part of the working directory.
+
+        If the asynchronous writer is enabled, the image of flagSave is rasterized
+        and written by the writer thread. See enable_async_writer().
+
+        mode: "human" renders with the backend set by set_render_backend(). "rgb_array"
+        rasterizes the map, the agent locations and the agent path into an
+        H x W x 3 uint8 NumPy array with visPixelsPerBlock pixels per block
+        and returns it. pause is ignored for "rgb_array".
+
+        Returns whatever the backend returns, e.g., a NumPy image for the array backend.
         """
 
         if ( self.map is None ):
             raise GridMapException("self.map is None")
 
-        from matplotlib.patches import Rectangle, Circle
-
-        if ( self.fig is None ):
-            self.fig, ax = plt.subplots(1)
-
-            for br in self.map.blockRows:
-                for b in br:
-                    if ( GridMapEnv.END_POINT_MODE_BLOCK == self.endPointMode ):
-                        rect = Rectangle( (b.coor[0], b.coor[1]), b.size[1], b.size[0], fill = True)
-                        rect.set_facecolor(b.color)
-                        rect.set_edgecolor("k")
-                        ax.add_patch(rect)
-                    elif ( GridMapEnv.END_POINT_MODE_RADIUS == self.endPointMode ):
-                        if ( not isinstance( b, EndingBlock ) ):
-                            rect = Rectangle( (b.coor[0], b.coor[1]), b.size[1], b.size[0], fill = True)
-                            rect.set_facecolor(b.color)
-                            rect.set_edgecolor("k")
-                            ax.add_patch(rect)
-                        else:
-                            cir = Circle( (b.endPoint[0], b.endPoint[1]), self.endPointRadius, fill=True )
-                            cir.set_facecolor(b.color)
-                            cir.set_edgecolor("k")
-                    else:
-                        raise GridMapException("Unexpected ending point mode %d." % (self.endPointMode))
-
-            if ( GridMapEnv.END_POINT_MODE_RADIUS == self.endPointMode ):
-                ax.add_patch(cir)
+        if ( True == flagSave and self.asyncWriter is not None ):
+            # The image is written by the writer thread.
+            self.asyncWriter.submit_render( self, fn )
+            flagSave = False
 
-            # Annotations.
-            plt.xlabel("x")
-            plt.ylabel("y")
-            titleStr = "%s:%s" % (self.name, self.map.name)
-            plt.title(titleStr)
+        if ( GridMapEnv.RENDER_MODE_HUMAN == mode ):
+            return self.get_render_backend().render( self, pause, flagSave, fn )
+        elif ( GridMapEnv.RENDER_MODE_RGB_ARRAY == mode ):
+            if ( self.arrayRenderBackend is None or \
+                 self.arrayRenderBackend.pixelsPerBlock != self.visPixelsPerBlock ):
+                import RenderBackends
+                self.arrayRenderBackend = RenderBackends.ArrayRenderBackend( self.visPixelsPerBlock )
 
-            # ax.autoscale()
+            return self.arrayRenderBackend.render( self, pause, flagSave, fn )
         else:
-            ax = plt.gca()
-        
-        # Agent locations.
-        nLocs = len( self.agentLocs )
-        if ( nLocs > 0 and self.drawnAgentLocations < nLocs ):
-            for i in range( self.drawnAgentLocations, nLocs ):
-                circle = Circle( (self.agentLocs[i].x, self.agentLocs[i].y), self.visAgentRadius, fill = True )
-                circle.set_facecolor( "#FFFF0080" )
-                circle.set_edgecolor( "k" )
-                ax.add_patch(circle)
-            
-            self.drawnAgentLocations = nLocs
-        
-        # for loc in self.agentLocs:
-        #     circle = Circle( (loc.x, loc.y), self.visAgentRadius, fill = True )
-        #     circle.set_facecolor( "#FFFF0080" )
-        #     circle.set_edgecolor( "k" )
-        #     ax.add_patch(circle)
+            raise ValueError("Unexpected render mode %s." % (mode))
 
-        # Agent path.
-        if ( nLocs > 1 and self.drawnAgentPaths < nLocs - 1):
-            for i in range(self.drawnAgentPaths, nLocs-1):
-                loc0 = self.agentLocs[i]
-                loc1 = self.agentLocs[i+1]
+    def close_render(self):
+        if ( self.renderBackend is not None ):
+            self.renderBackend.close()
 
-                if ( loc0.x == loc1.x and loc0.y == loc1.y ):
-                    continue
+        if ( self.arrayRenderBackend is not None ):
+            self.arrayRenderBackend.close()
 
-                plt.arrow( loc0.x, loc0.y, loc1.x - loc0.x, loc1.y - loc0.y, \
-                    width=self.visPathArrowWidth, \
-                    alpha=0.5, color='k', length_includes_head=True )
-                
-            self.drawnAgentPaths = nLocs - 1
+    def save_render(self, fn):
+        if ( self.renderBackend is None ):
+            raise GridMapException("Nothing has been rendered. Could not save figure.")
 
-        plt.xlim( ( self.map.corners[0][GridMap2D.I_X], self.map.corners[1][GridMap2D.I_X] ) )
-        plt.ylim( ( self.map.corners[0][GridMap2D.I_Y], self.map.corners[3][GridMap2D.I_Y] ) )
+        self.renderBackend.save(fn)
 
-        if ( True == flagSave ):
-            if ( fn is None ):
-                saveFn = "%s/%s_%d-%ds_%dv.png" % (self.renderDir, self.name, self.nSteps, self.maxSteps, self.totalValue)
-            else:
-                saveFn = "%s/%s" % (self.renderDir, fn)
+    def export_episode(self, fn, pixelsPerBlock = None, frameDelay = 0.1):
+        """
+        Export the agent history frame by frame. fn ending with .gif produces an
+        animated GIF. Otherwise fn is a directory to write a PNG image per frame.
+        pixelsPerBlock is visPixelsPerBlock if None. frameDelay is measured in seconds.
+        Return the number of frames.
 
-            plt.savefig( saveFn, dpi = 300, format = "png" )
+        The frames are drawn incrementally on the rasterized map and streamed
+        into the file. matplotlib is not used.
+        """
 
-        if ( True == self.visIsForcePause ):
-            # plt.show( block=False )
-            # plt.pause( self.visForcePauseTime )
-            # plt.close()
-            self.fig.canvas.draw()
-            self.fig.canvas.flush_events()
-            plt.pause(self.visForcePauseTime)
-        else:
-            if ( pause <= 0 ):
-                plt.show()
-            elif ( pause > 0 ):
-                print("Render %s for %f seconds." % (self.name, pause))
-                # plt.show( block = False )
-                # plt.pause( pause )
-                # plt.close()
-                self.fig.canvas.draw()
-                self.fig.canvas.flush_events()
-                plt.pause(pause)
+        import EpisodeExport
 
-    def close_render(self):
-        if ( self.fig is not None ):
-            plt.close()
-            self.fig = None
+        return EpisodeExport.export_episode( self, fn, pixelsPerBlock, frameDelay )
 
-    def save_render(self, fn):
-        if ( self.fig is None ):
-            raise GridMapException("No matplotlib figure is present. Could not save figure.")
+    def enable_async_writer(self, maxQueueSize = 16):
+        """
+        Write the files of save() and render(flagSave=True) on a background thread.
+        The state is copied when save() or render() is called. The calls block
+        if maxQueueSize jobs are waiting. finalize() waits for all the jobs.
+        """
+
+        import AsyncWriter
+
+        self.disable_async_writer()
+        self.asyncWriter = AsyncWriter.AsyncWriter( maxQueueSize )
+
+    def disable_async_writer(self):
+        """Wait for all the queued jobs and stop the writer thread."""
 
-        plt.savefig( fn, dpi = 300, format = "png" )
+        if ( self.asyncWriter is not None ):
+            writer = self.asyncWriter
+            self.asyncWriter = None
+            writer.close()
+
+    def flush_async_writer(self):
+        """Wait for all the queued jobs. Raise GridMapException if any of them failed."""
+
+        if ( self.asyncWriter is not None ):
+            self.asyncWriter.flush()
 
     def finalize(self):
         # Close the render.
         self.close_render()
 
-    def save(self, fn = None):
+        # Wait for the files being written.
+        self.flush_async_writer()
+
+    def save(self, fn = None, binaryMap = False, obstacleEncoding = OBSTACLE_ENCODING_LIST):
         """
         Save the environment into the working directory.
 
@@ -1681,15 +3040,29 @@ class GridMapEnv(object):
         saved into the workding directory.
 
         fn will be used to create file in the working directory.
+
+        If binaryMap is True, the map is saved by GridMap2D.dump_binary() with 
+        the extension of .gmb. Otherwise, it is saved as a JSON file with the obstacles
+        encoded by obstacleEncoding. See GridMap2D.dump_JSON().
+
+        If the asynchronous writer is enabled, the files are written by the
+        writer thread. See enable_async_writer().
         """
 
+        if ( self.asyncWriter is not None ):
+            if ( self.map is None ):
+                raise GridMapException("Map must be set in order to save the environment.")
+
+            self.asyncWriter.submit_save( self, fn, binaryMap, obstacleEncoding )
+            return
+
         if ( fn is None ):
             fn = "GridMapEnv.json"
                 
         fnPart = os.path.splitext(os.path.split(fn)[1])[0]
 
         strFn  = "%s/%s" % ( self.workingDir, fn )
-        mapRef = fnPart + "_Map.json"
+        mapRef = fnPart + ( "_Map.gmb" if ( True == binaryMap ) else "_Map.json" )
         mapFn  = "%s/%s" % ( self.workingDir, mapRef )
 
         # Check if the map is present.
@@ -1697,17 +3070,10 @@ class GridMapEnv(object):
             raise GridMapException("Map must be set in order to save the environment.")
 
         # Save the map.
-        self.map.dump_JSON( mapFn )
-
-        # Create list for agent location history.
-        agentLocsList = []
-        for loc in self.agentLocs:
-            agentLocsList.append( [loc.x, loc.y] )
-
-        # Create list for agent action history.
-        agentActsList = []
-        for act in self.agentActs:
-            agentActsList.append( [act.dx, act.dy] )
+        if ( True == binaryMap ):
+            self.map.dump_binary( mapFn )
+        else:
+            self.map.dump_JSON( mapFn, obstacleEncoding )
 
         # Compose a dictionary.
         d = { \
@@ -1725,15 +3091,19 @@ class GridMapEnv(object):
             "normalizedCoordinate": self.normalizedCoordinate, \
             "isRandomCoordinating": self.isRandomCoordinating, \
             "randomCoordinatingVariance": self.randomCoordinatingVariance, \
+            "gridTraversal": self.gridTraversal, \
             "actStepSize": self.actStepSize, \
             "visAgentRadius": self.visAgentRadius, \
             "visPathArrowWidth": self.visPathArrowWidth, \
+            "visPixelsPerBlock": self.visPixelsPerBlock, \
             "visIsForcePause": self.visIsForcePause, \
             "visForcePauseTime": self.visForcePauseTime, \
             "agentCurrentLoc": [ self.agentCurrentLoc.x, self.agentCurrentLoc.y ], \
             "agentCurrentAct": [ self.agentCurrentAct.dx, self.agentCurrentAct.dy ], \
-            "agentLocs": agentLocsList, \
-            "agentActs": agentActsList, \
+            "historyMode": self.history.mode, \
+            "historyCapacity": self.history.capacity, \
+            "agentLocs": self.history.get_locs().tolist(), \
+            "agentActs": self.history.get_acts().tolist(), \
             "isTerminated": self.isTerminated, \
             "nSteps": self.nSteps, \
             "totalValue": self.totalValue
@@ -1791,9 +3161,16 @@ class GridMapEnv(object):
         self.isRandomCoordinating = d["isRandomCoordinating"]
         self.randomCoordinatingVariance = d["randomCoordinatingVariance"]
 
+        if ( "gridTraversal" in d ):
+            self.gridTraversal = d["gridTraversal"]
+
         # Create a new map.
         m = GridMap2D( rows = 1, cols = 1 ) # A temporay map.
-        m.read_JSON( self.workingDir + "/" + d["mapFn"] )
+
+        if ( d["mapFn"].endswith(".gmb") ):
+            m.read_binary( self.workingDir + "/" + d["mapFn"] )
+        else:
+            m.read_JSON( self.workingDir + "/" + d["mapFn"] )
 
         # Set map.
         self.map = m
@@ -1807,17 +3184,11 @@ class GridMapEnv(object):
         self.agentCurrentAct = BlockCoorDelta( \
             d["agentCurrentAct"][0], d["agentCurrentAct"][1] )
         
-        # Agent location history.
-        self.agentLocs = []
-        for loc in d["agentLocs"]:
-            self.agentLocs.append( \
-                BlockCoor( loc[0], loc[1] ) )
-        
-        # Agent action history.
-        self.agentActs = []
-        for act in d["agentActs"]:
-            self.agentActs.append( \
-                BlockCoorDelta( act[0], act[1] ) )
+        # Agent location and action history.
+        if ( "historyMode" in d ):
+            self.history.set_mode( d["historyMode"], d["historyCapacity"] )
+
+        self.history.set( d["agentLocs"], d["agentActs"] )
         
         # Other member variables.
         self.isTerminated = d["isTerminated"]
@@ -1826,6 +3197,9 @@ class GridMapEnv(object):
         self.visIsForcePause = d["visIsForcePause"]
         self.visForcePauseTime = d["visForcePauseTime"]
 
+        if ( "visPixelsPerBlock" in d ):
+            self.visPixelsPerBlock = d["visPixelsPerBlock"]
+
     def can_move_east(self, coor):
         """
         coor is an object of BlockCoor.
@@ -1841,19 +3215,19 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( (True == loc[0]) or (True == loc[1]) ):
-            if ( isinstance( self.map.get_block( loc[3] ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.r -= 1
 
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             return True
         
         if ( True == loc[2] ):
-            if ( isinstance( self.map.get_block( loc[3] ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
 
         return True
@@ -1870,19 +3244,19 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            if ( isinstance( self.map.get_block(loc[3]), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             else:
                 return True    
         
         if ( True == loc[1] ):
-            if ( isinstance( self.map.get_block(loc[3]), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             else:
                 return True
 
         if ( True == loc[2] ):
-            if ( isinstance( self.map.get_block(loc[3]), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             else:
                 return True
@@ -1904,19 +3278,19 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( (True == loc[0]) or (True == loc[2]) ):
-            if ( isinstance( self.map.get_block( loc[3] ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1
 
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             return True
         
         if ( True == loc[1] ):
-            if ( isinstance( self.map.get_block( loc[3] ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
 
         return True
@@ -1933,24 +3307,24 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1 # Left block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True    
         
         if ( True == loc[1] ):
-            index = copy.deepcopy(loc[3])
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            index = loc[3].copy()
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True
 
         if ( True == loc[2] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1 # Left block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True
@@ -1972,34 +3346,34 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1 # Left block.
             
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             index.r -= 1 # Now bottom left block.
 
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             return True
         
         if ( True == loc[1] ):
-            index = copy.deepcopy(loc[3])
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            index = loc[3].copy()
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
             index.r -= 1 # Bottom block.
             
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
         if ( True == loc[2] ):
-            index = copy.deepcopy( loc[3] )
+            index = loc[3].copy()
             index.c -= 1 # Left block.
 
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
         return True
@@ -2016,26 +3390,26 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1 # Left block.
             index.r -= 1 # Bottom left block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True    
         
         if ( True == loc[1] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.r -= 1 # Bottom block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True
 
         if ( True == loc[2] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.c -= 1 # Left block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True
@@ -2057,34 +3431,34 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.r -= 1 # Bottom block.
             
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             index.c -= 1 # Now bottom left block.
 
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             
             return True
         
         if ( True == loc[2] ):
-            index = copy.deepcopy(loc[3])
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            index = loc[3].copy()
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
             index.c -= 1 # Left block.
             
-            if ( isinstance( self.map.get_block( index ), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
         if ( True == loc[1] ):
-            index = copy.deepcopy( loc[3] )
+            index = loc[3].copy()
             index.r -= 1 # Bottom block.
 
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
 
         return True
@@ -2101,23 +3475,23 @@ class GridMapEnv(object):
         loc = self.map.is_corner_or_principle_line(coor)
 
         if ( True == loc[0] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.r -= 1 # Bottom block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True    
         
         if ( True == loc[1] ):
-            index = copy.deepcopy(loc[3])
+            index = loc[3].copy()
             index.r -= 1 # Bottom block.
-            if ( isinstance( self.map.get_block(index), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( index ) ):
                 return False
             else:
                 return True
 
         if ( True == loc[2] ):
-            if ( isinstance( self.map.get_block(loc[3]), ObstacleBlock ) ):
+            if ( self.map.is_obstacle_block( loc[3] ) ):
                 return False
             else:
                 return True
@@ -2129,50 +3503,541 @@ class GridMapEnv(object):
         starts from (x, y) and goes to (x + dx, y + dy). Return False if 
         the agent could not go that direction."""
 
-        coor = BlockCoor(x, y)
-
-        # 8-way switch!
-        if ( dx > 0 and dy == 0 ):
-            # East direction.
-            return self.can_move_east(coor)
-        elif ( dx >0 and dy > 0 ):
-            # Northeast direction.
-            return self.can_move_northeast(coor)
-        elif ( dx == 0 and dy > 0 ):
-            # North direction.
-            return self.can_move_north(coor)
-        elif ( dx < 0 and dy > 0 ):
-            # Northwest direction.
-            return self.can_move_northwest(coor)
-        elif ( dx < 0 and dy == 0 ):
-            # West direction.
-            return self.can_move_west(coor)
-        elif ( dx < 0 and dy < 0 ):
-            # Southwest direction.
-            return self.can_move_southwest(coor)
-        elif ( dx == 0 and dy < 0 ):
-            # South direction.
-            return self.can_move_south(coor)
-        elif ( dx > 0 and dy < 0 ):
-            # Southeast direction.
-            return self.can_move_southeast(coor)
-        else:
+        if ( dx == 0 and dy == 0 ):
             raise ValueError("dx and dy may not both be zero at the same time.")
 
+        # Look up the passability tables of the map. Same results with
+        # can_move_east() ... can_move_southeast().
+        d = DIRECTION_MASKS[ int( dy > 0 ) - int( dy < 0 ) + 1 ][ int( dx > 0 ) - int( dx < 0 ) + 1 ]
+
+        return 0 == ( self.map.get_blocked_directions_s( x, y ) & d )
+
     def try_move(self, coorOri, coorDelta):
         """
         coorOri is an object of BlockCoor. Will be deepcopied.
         coorDelta is the delta.
 
         Return new location coordinate, block value, flag of termination.
+
+        The grid traversal engine is used by default. Use disable_grid_traversal()
+        to switch to the line intersection engine.
         """
 
-        coor = copy.deepcopy(coorOri)
-        val  = 0 # The block value.
+        if ( True == self.gridTraversal ):
+            return self.try_move_grid_traversal( coorOri, coorDelta )
+        else:
+            return self.try_move_line_intersection( coorOri, coorDelta )
+
+    def check_ending(self, coor, val):
+        """
+        Check if coor reaches the ending block according to the ending point mode.
+        Return the updated value and the termination flag.
+        """
+
+        flagTerm = False
+
+        if ( GridMapEnv.END_POINT_MODE_BLOCK == self.endPointMode ):
+            if ( True == self.map.is_in_ending_block_s( coor.x, coor.y ) ):
+                flagTerm = True
+                val += self.map.valueEndingBlock
+        elif ( GridMapEnv.END_POINT_MODE_RADIUS == self.endPointMode ):
+            if ( True == self.map.is_around_ending_block_s( coor.x, coor.y, self.endPointRadius ) ):
+                flagTerm = True
+                val += self.map.valueEndingBlock
+        else:
+            raise GridMapException("Unexpected self.endPointMode. self.endPointMode = {}".format(self.endPointMode))
+
+        return val, flagTerm
+
+    def check_ending_array(self, xs, ys, values):
+        """
+        Vectorized version of check_ending(). Return the updated values and the
+        termination flags as NumPy arrays.
+        """
+
+        if ( GridMapEnv.END_POINT_MODE_BLOCK == self.endPointMode ):
+            flags = self.map.is_in_ending_block_array( xs, ys )
+        elif ( GridMapEnv.END_POINT_MODE_RADIUS == self.endPointMode ):
+            flags = self.map.is_around_ending_block_array( xs, ys, self.endPointRadius )
+        else:
+            raise GridMapException("Unexpected self.endPointMode. self.endPointMode = {}".format(self.endPointMode))
+
+        values = values.copy()
+        values[flags] += self.map.valueEndingBlock
+
+        return values, flags
+
+    def try_move_array(self, xs, ys, dxs, dys):
+        """
+        Vectorized version of try_move(). xs, ys, dxs, and dys are NumPy arrays of
+        n elements. Return the new xs and ys, the values, and the termination flags
+        as NumPy arrays of n elements. The results are the same with calling
+        try_move() for every element.
+
+        All the agents take the steps of try_move_grid_traversal() in lockstep,
+        crossing one grid line per iteration, until every agent has stopped. The rare
+        cases are moved by try_move() one by one, i.e., rolling back from out of
+        boundary, reaching tryMoveMaxCount, and zero actions, which raise an
+        exception. Everything is moved by try_move() if the line intersection engine
+        or the debugging of try_move() is enabled.
+        """
+
+        xs0 = np.asarray( xs, dtype=np.float64 ).reshape( ( -1, ) )
+        ys0 = np.asarray( ys, dtype=np.float64 ).reshape( ( -1, ) )
+        dxs = np.asarray( dxs, dtype=np.float64 ).reshape( ( -1, ) )
+        dys = np.asarray( dys, dtype=np.float64 ).reshape( ( -1, ) )
+
+        n = xs0.size
+
+        resXs  = np.zeros( ( n, ), dtype=np.float64 )
+        resYs  = np.zeros( ( n, ), dtype=np.float64 )
+        values = np.zeros( ( n, ), dtype=np.float64 )
+        flags  = np.zeros( ( n, ), dtype=np.bool_ )
+
+        # The agents moved by try_move().
+        if ( False == self.gridTraversal or True == self.tryMoveDebug ):
+            scalar = np.ones( ( n, ), dtype=np.bool_ )
+        else:
+            signXs = np.sign( dxs ).astype(np.int64)
+            signYs = np.sign( dys ).astype(np.int64)
+
+            scalar = ( 0 == signXs ) & ( 0 == signYs )
+
+            # Regularize input coordinates.
+            xs = round_if_needed_array( xs0 )
+            ys = round_if_needed_array( ys0 )
+
+            # Agents that could not move at all. Same with can_move().
+            blocked = ~scalar & ( 0 != ( self.map.get_blocked_directions( xs, ys ) & \
+                np.array( DIRECTION_MASKS, dtype=np.int64 )[ signYs + 1, signXs + 1 ] ) )
+
+            resXs[blocked] = xs[blocked]
+            resYs[blocked] = ys[blocked]
+
+            idx = np.flatnonzero( ~scalar & ~blocked )
+
+            x, y, fallback = self.traverse_grid_array( \
+                xs0[idx], ys0[idx], dxs[idx], dys[idx], xs[idx], ys[idx], signXs[idx], signYs[idx] )
+
+            scalar[ idx[fallback] ] = True
+            idx = idx[~fallback]
+
+            resXs[idx] = x[~fallback]
+            resYs[idx] = y[~fallback]
+
+            # Evaluate all the agents at once. An agent that has moved into the ending
+            # block gets no block value.
+            moved = ~scalar
+            x, y = resXs[moved], resYs[moved]
+
+            v = self.map.evaluate_coordinates( x, y )
+            v[ ~blocked[moved] & self.map.is_in_ending_block_array( x, y ) ] = 0
+
+            values[moved], flags[moved] = self.check_ending_array( x, y, v )
+
+        for i in np.flatnonzero( scalar ):
+            coor, values[i], flags[i] = self.try_move( BlockCoor( xs0[i], ys0[i] ), BlockCoorDelta( dxs[i], dys[i] ) )
+
+            resXs[i] = coor.x
+            resYs[i] = coor.y
+
+        return resXs, resYs, values, flags
+
+    def traverse_grid_array(self, x0, y0, dx, dy, x, y, sx, sy):
+        """
+        The grid traversal of try_move_array(). x0, y0, dx, and dy are the inputs of
+        the agents, x and y are the regularized x0 and y0, and sx and sy are the
+        signs of dx and dy. Every operation is the same with try_move_grid_traversal()
+        to get the same floating point results. np.power() is used for the ** operator
+        since both call pow().
+
+        Return the final x and y, and a boolean array of the agents to be moved by
+        try_move() instead.
+        """
+
+        m = self.map
+
+        w  = float( m.stepSize[GridMap2D.I_X] )
+        h  = float( m.stepSize[GridMap2D.I_Y] )
+        ox = float( m.origin[GridMap2D.I_X] )
+        oy = float( m.origin[GridMap2D.I_Y] )
+
+        xMin = m.corners[0][GridMap2D.I_X]
+        xMax = m.corners[1][GridMap2D.I_X]
+        yMin = m.corners[0][GridMap2D.I_Y]
+        yMax = m.corners[3][GridMap2D.I_Y]
+
+        blockTypes = m.blockTypes
+
+        x = x.copy()
+        y = y.copy()
+
+        hasX = ( 0 != sx )
+        hasY = ( 0 != sy )
+
+        # Avoid dividing by zero. The agents not moving along an axis never cross its lines.
+        adx = np.where( hasX, dx, 1.0 )
+        ady = np.where( hasY, dy, 1.0 )
+
+        # The next vertical lines, their line parameters and the parameter increments.
+        tDeltaX = np.where( hasX, w / np.fabs( adx ), 0.0 )
+        c = ( ( x - ox ) / w ).astype(np.int64)
+        cNext = np.where( sx > 0, c + 1, np.where( x == c * w, c - 1, c ) )
+        tMaxX = np.where( hasX, ( cNext * w - x0 ) / adx, 2.0 )
+
+        # The next horizontal lines, their line parameters and the parameter increments.
+        tDeltaY = np.where( hasY, h / np.fabs( ady ), 0.0 )
+        r = ( ( y - oy ) / h ).astype(np.int64)
+        rNext = np.where( sy > 0, r + 1, np.where( y == r * h, r - 1, r ) )
+        tMaxY = np.where( hasY, ( rNext * h - y0 ) / ady, 2.0 )
+
+        active   = np.ones( x.shape, dtype=np.bool_ )
+        fallback = np.zeros( x.shape, dtype=np.bool_ )
+
+        tryCount = 0
+
+        while ( True == active.any() ):
+            if ( self.tryMoveMaxCount > 0 and tryCount >= self.tryMoveMaxCount ):
+                # Let try_move() raise the exception.
+                fallback |= active
+                break
+            else:
+                tryCount += 1
+
+            a = np.flatnonzero( active )
+
+            xa, ya = x[a], y[a]
+            sxa, sya = sx[a], sy[a]
+            cNa, rNa = cNext[a], rNext[a]
+            tXa, tYa = tMaxX[a], tMaxY[a]
+
+            # Is the current coordinate on a horizontal or vertical line.
+            onH = ( ya == ( ( ya - oy ) / h ).astype(np.int64) * h )
+            onV = ( xa == ( ( xa - ox ) / w ).astype(np.int64) * w )
+
+            # The intersections with the next vertical and horizontal lines.
+            flagV = hasX[a] & ( tXa >= 0 ) & ( tXa <= 1 )
+            flagH = hasY[a] & ( tYa >= 0 ) & ( tYa <= 1 )
+
+            xV = cNa * w
+            yV = round_if_needed_array( y0[a] + tXa * dy[a] )
+
+            xH = round_if_needed_array( x0[a] + tYa * dx[a] )
+            yH = rNa * h
+
+            corner = flagV & flagH & \
+                ( yV == ( ( yV - oy ) / h ).astype(np.int64) * h ) & \
+                ( xH == ( ( xH - ox ) / w ).astype(np.int64) * w )
+
+            crossV = ~corner & flagV & ( ~flagH | \
+                ( np.power( xV - xa, 2.0 ) + np.power( yV - ya, 2.0 ) < np.power( xH - xa, 2.0 ) + np.power( yH - ya, 2.0 ) ) )
+
+            crossH = ~corner & ~crossV & flagH
+
+            # No valid intersections. Stop at the end of the line segment.
+            none = ~corner & ~crossV & ~crossH
+
+            nx = np.where( corner | crossV, xV, np.where( crossH, xH, x0[a] + dx[a] ) )
+            ny = np.where( corner | crossV, yV, np.where( crossH, yH, y0[a] + dy[a] ) )
+
+            x[a] = nx
+            y[a] = ny
+
+            # Stop on the boundary.
+            stop = none | ( nx <= xMin ) | ( nx >= xMax ) | ( ny <= yMin ) | ( ny >= yMax )
+
+            # The blocks on the other side of the crossed lines.
+            k = np.flatnonzero( ~stop )
+            rk = ( ( ny[k] - oy ) / h ).astype(np.int64)
+            ck = ( ( nx[k] - ox ) / w ).astype(np.int64)
+
+            isCorner, isV = corner[k], crossV[k]
+            isH = ~isCorner & ~isV
+
+            # Crossing a vertical line to the left, or a horizontal line downwards.
+            ckV = ck - ( isV & ( sxa[k] < 0 ) )
+            rkH = rk - ( isH & ( sya[k] < 0 ) )
+
+            obstacle = BLOCK_TYPE_OBSTACLE == blockTypes[ rkH, ckV ]
+
+            # Since we are at a corner point, we simply checkout all four neighboring blocks.
+            obstacle |= isCorner & ( \
+                ( BLOCK_TYPE_OBSTACLE == blockTypes[ rk,     ck - 1 ] ) | \
+                ( BLOCK_TYPE_OBSTACLE == blockTypes[ rk - 1, ck - 1 ] ) | \
+                ( BLOCK_TYPE_OBSTACLE == blockTypes[ rk - 1, ck     ] ) )
+
+            # Travelling along a horizontal or vertical line.
+            obstacle |= isV & onH[k] & ( 0 == sya[k] ) & ( BLOCK_TYPE_OBSTACLE == blockTypes[ rk - 1, ckV ] )
+            obstacle |= isH & onV[k] & ( 0 == sxa[k] ) & ( BLOCK_TYPE_OBSTACLE == blockTypes[ rkH, ck - 1 ] )
+
+            stop[ k[obstacle] ] = True
+            active[ a[stop] ] = False
+
+            # Advance to the next lines.
+            go = ~stop
+            goX = go & ( corner | crossV )
+            goY = go & ( corner | crossH )
+
+            cNext[ a[goX] ] += sxa[goX]
+            tMaxX[ a[goX] ] += tDeltaX[ a[goX] ]
+            rNext[ a[goY] ] += sya[goY]
+            tMaxY[ a[goY] ] += tDeltaY[ a[goY] ]
+
+            # x may be rounded onto a vertical line. Find the next vertical line again.
+            j = a[ go & crossH & hasX[a] ]
+
+            if ( j.size > 0 ):
+                cj = ( ( x[j] - ox ) / w ).astype(np.int64)
+                cj = np.where( sx[j] > 0, cj + 1, np.where( x[j] == cj * w, cj - 1, cj ) )
+
+                changed = cj != cNext[j]
+                j, cj = j[changed], cj[changed]
+
+                cNext[j] = cj
+                tMaxX[j] = ( cj * w - x0[j] ) / dx[j]
+
+        # try_move() rolls back the agents out of boundary.
+        fallback |= m.is_out_of_boundary_array( x, y )
+
+        return x, y, fallback
+
+    def try_move_grid_traversal(self, coorOri, coorDelta):
+        """
+        The grid traversal (Amanatides-Woo) version of try_move().
+
+        The grid lines crossed by the line segment from coorOri to coorOri + coorDelta
+        are visited in order. The line parameters of the next vertical and horizontal
+        grid lines, tMaxX and tMaxY, are advanced by tDeltaX and tDeltaY for every
+        crossing. The obstacle, corner, and boundary rules are the same with
+        try_move_line_intersection().
+        """
+
+        m = self.map
+
+        x0, y0 = float( coorOri.x ), float( coorOri.y )
+        dx, dy = float( coorDelta.dx ), float( coorDelta.dy )
+
+        # Regularize input coordinate.
+        x = round_if_needed(x0)
+        y = round_if_needed(y0)
+
+        # Directions.
+        sx = 1 if dx > 0 else ( -1 if dx < 0 else 0 )
+        sy = 1 if dy > 0 else ( -1 if dy < 0 else 0 )
+
+        if ( False == self.can_move( x, y, sx, sy ) ):
+            # Cannot move.
+            coor = BlockCoor( x, y )
+            val  = m.evaluate_coordinate_s( x, y )
+
+            return ( coor, ) + self.check_ending( coor, val )
+
+        w  = m.stepSize[GridMap2D.I_X]
+        h  = m.stepSize[GridMap2D.I_Y]
+        ox = m.origin[GridMap2D.I_X]
+        oy = m.origin[GridMap2D.I_Y]
+
+        xMin = m.corners[0][GridMap2D.I_X]
+        xMax = m.corners[1][GridMap2D.I_X]
+        yMin = m.corners[0][GridMap2D.I_Y]
+        yMax = m.corners[3][GridMap2D.I_Y]
+
+        blockTypes = m.blockTypes
+
+        # The next vertical line, its line parameter and the parameter increment.
+        if ( 0 != sx ):
+            tDeltaX = w / math.fabs( dx )
+            c = int( ( 1.0*x - ox ) / w )
+            if ( sx > 0 ):
+                cNext = c + 1
+            elif ( x == c * w ):
+                # Starting from a vertical line.
+                cNext = c - 1
+            else:
+                cNext = c
+            tMaxX = ( cNext * w - x0 ) / dx
+
+        # The next horizontal line, its line parameter and the parameter increment.
+        if ( 0 != sy ):
+            tDeltaY = h / math.fabs( dy )
+            r = int( ( 1.0*y - oy ) / h )
+            if ( sy > 0 ):
+                rNext = r + 1
+            elif ( y == r * h ):
+                # Starting from a horizontal line.
+                rNext = r - 1
+            else:
+                rNext = r
+            tMaxY = ( rNext * h - y0 ) / dy
+
+        xPre, yPre = x, y
+        tryCount = 0
+
+        # Status monitor. Only used for debugging.
+        tryCoor = [] if ( True == self.tryMoveDebug ) else None
+
+        while ( True ):
+            if ( tryCoor is not None ):
+                tryCoor.append( ( x, y ) )
+
+            if ( self.tryMoveMaxCount > 0 and tryCount >= self.tryMoveMaxCount ):
+                print("coorOri = %s" % (coorOri) )
+                print("coorDelta = %s" % (coorDelta) )
+
+                if ( tryCoor is not None ):
+                    for xt, yt in tryCoor:
+                        print("coor(%s, %s)" % ( xt, yt ))
+
+                raise GridMapException("try_move() reaches its maximum allowed moves.")
+            else:
+                tryCount += 1
+
+            # Is the current coordinate on a horizontal or vertical line.
+            onH = ( y == int( ( 1.0*y - oy ) / h ) * h )
+            onV = ( x == int( ( 1.0*x - ox ) / w ) * w )
+
+            # The intersections with the next vertical and horizontal lines.
+            flagV = ( 0 != sx and tMaxX >= 0 and tMaxX <= 1 )
+            flagH = ( 0 != sy and tMaxY >= 0 and tMaxY <= 1 )
+
+            if ( True == flagV ):
+                xV = float( cNext * w )
+                yV = round_if_needed( y0 + tMaxX * dy )
+
+            if ( True == flagH ):
+                xH = round_if_needed( x0 + tMaxY * dx )
+                yH = float( rNext * h )
+
+            if ( True == flagV and True == flagH and \
+                 yV == int( ( yV - oy ) / h ) * h and \
+                 xH == int( ( xH - ox ) / w ) * w ):
+                # Crossing a corner.
+                xPre, yPre = x, y
+                x, y = xV, yV
+
+                # Check if (x, y) is on the boundary.
+                if ( x <= xMin or x >= xMax or y <= yMin or y >= yMax ):
+                    break
+
+                # Since we are at a corner point, we simply checkout all four neighboring blocks.
+                r = int( ( y - oy ) / h )
+                c = int( ( x - ox ) / w )
+
+                if ( BLOCK_TYPE_OBSTACLE == blockTypes[ r,     c     ] or \
+                     BLOCK_TYPE_OBSTACLE == blockTypes[ r,     c - 1 ] or \
+                     BLOCK_TYPE_OBSTACLE == blockTypes[ r - 1, c - 1 ] or \
+                     BLOCK_TYPE_OBSTACLE == blockTypes[ r - 1, c     ] ):
+                    break
+
+                cNext += sx; tMaxX += tDeltaX
+                rNext += sy; tMaxY += tDeltaY
+                continue
+
+            if ( True == flagV and \
+                 ( False == flagH or \
+                   ( xV - x )**2 + ( yV - y )**2 < ( xH - x )**2 + ( yH - y )**2 ) ):
+                # Crossing a vertical line.
+                xPre, yPre = x, y
+                x, y = xV, yV
+
+                # Check if (x, y) is on the boundary.
+                if ( x <= xMin or x >= xMax or y <= yMin or y >= yMax ):
+                    break
+
+                # The block on the other side of the vertical line.
+                r = int( ( y - oy ) / h )
+                c = int( ( x - ox ) / w )
+
+                if ( sx < 0 ):
+                    # Left direction.
+                    c -= 1
+
+                if ( BLOCK_TYPE_OBSTACLE == blockTypes[ r, c ] ):
+                    break
+
+                # Check if we are travelling along a horizontal line.
+                if ( True == onH and 0 == sy and \
+                     BLOCK_TYPE_OBSTACLE == blockTypes[ r - 1, c ] ):
+                    break
+
+                cNext += sx; tMaxX += tDeltaX
+                continue
+
+            if ( True == flagH ):
+                # Crossing a horizontal line.
+                xPre, yPre = x, y
+                x, y = xH, yH
+
+                # Check if (x, y) is on the boundary.
+                if ( x <= xMin or x >= xMax or y <= yMin or y >= yMax ):
+                    break
+
+                # The block on the other side of the horizontal line.
+                r = int( ( y - oy ) / h )
+                c = int( ( x - ox ) / w )
+
+                if ( sy < 0 ):
+                    # Downwards direction.
+                    r -= 1
+
+                if ( BLOCK_TYPE_OBSTACLE == blockTypes[ r, c ] ):
+                    break
+
+                # Check if we are travelling along a vertical line.
+                if ( True == onV and 0 == sx and \
+                     BLOCK_TYPE_OBSTACLE == blockTypes[ r, c - 1 ] ):
+                    break
+
+                rNext += sy; tMaxY += tDeltaY
+
+                # x may be rounded onto a vertical line. Find the next vertical line again.
+                if ( 0 != sx ):
+                    c = int( ( x - ox ) / w )
+                    if ( sx > 0 ):
+                        c += 1
+                    elif ( x == c * w ):
+                        c -= 1
+
+                    if ( c != cNext ):
+                        cNext = c
+                        tMaxX = ( cNext * w - x0 ) / dx
+
+                continue
+
+            # No valid intersectons. Stop here.
+            xPre, yPre = x, y
+            x, y = x0 + dx, y0 + dy
+            break
+
+        # Check if (x, y) is out of boundary.
+        if ( True == m.is_out_of_boundary_s( x, y ) ):
+            s = "Out of boundary before evaluation. coorOri = %s, coorDelta - %s" % \
+                (coorOri, coorDelta)
+            print(s)
+
+            # Roll back to the previous valid intersection.
+            x, y = xPre, yPre
+            print( "Rolled back to previous coordinate (%f, %f)" % ( x, y ) )
+
+        coor = BlockCoor( x, y )
+        val  = 0
+
+        if ( False == m.is_in_ending_block_s( x, y ) ):
+            val = m.evaluate_coordinate_s( x, y )
+
+        return ( coor, ) + self.check_ending( coor, val )
+
+    def try_move_line_intersection(self, coorOri, coorDelta):
+        """
+        The line intersection version of try_move().
+
+        The intersections with the next vertical and horizontal grid lines are
+        calculated by the axis-aligned functions of LineIntersection2D for every crossing.
+        """
 
         # Regularize input coor.
-        coor.x = round_if_needed(coor.x)
-        coor.y = round_if_needed(coor.y)
+        coor = BlockCoor( round_if_needed(coorOri.x), round_if_needed(coorOri.y) )
+        val  = 0 # The block value.
 
         # dx and dy.
         delta = coorDelta.convert_to_direction_delta()
@@ -2183,27 +4048,25 @@ class GridMapEnv(object):
         coorH = BlockCoor(0, 0)
         coorV = BlockCoor(0, 0)
 
-        # Status monitor.
-        tryCount     = 0
-        tryCoor      = []
-        tryCoorDelta = []
+        # Status monitor. Only used for debugging.
+        tryCount = 0
+        tryCoor  = [] if ( True == self.tryMoveDebug ) else None
 
         # Try to move.
         if ( True == self.can_move( coor.x, coor.y, delta.dx, delta.dy ) ):
-            coorPre = copy.deepcopy( coor )
+            coorPre = BlockCoor( coor.x, coor.y )
             while ( True ):
                 # Status monitor.
-                tryCoor.append( copy.deepcopy(coor) )
-                tryCoorDelta.append( copy.deepcopy(delta) )
+                if ( tryCoor is not None ):
+                    tryCoor.append( ( coor.x, coor.y ) )
 
                 if ( self.tryMoveMaxCount > 0 and tryCount >= self.tryMoveMaxCount ):
                     print("coorOri = %s" % (coorOri) )
                     print("coorDelta = %s" % (coorDelta) )
 
-                    n = len(tryCoor)
-
-                    for i in range(n):
-                        print("%s, %s" % (tryCoor[i], tryCoorDelta[i]))
+                    if ( tryCoor is not None ):
+                        for xt, yt in tryCoor:
+                            print("coor(%s, %s), %s" % ( xt, yt, delta ))
                     
                     raise GridMapException("try_move() reaches its maximum allowed moves.")
                 else:
@@ -2211,47 +4074,45 @@ class GridMapEnv(object):
                 
                 # Done with status monitor.
 
-                # Get the index of coor.
-                index = self.map.get_index_by_coordinates( coor )
-
-                # Get information on coor.
-                loc = self.map.is_corner_or_principle_line( coor )
+                # Get information and the index of coor.
+                loc = self.map.is_corner_or_principle_line_s( coor.x, coor.y )
+                indexR, indexC = loc[3], loc[4]
 
                 # Get the targeting vertical and horizontal line index.
                 if ( delta.dx >= 0 ):
-                    idxV.c = index.c + int( delta.dx )
+                    idxV.c = indexC + int( delta.dx )
                 else:
                     if ( True == loc[2] ):
                         # Starting from a vertical line.
-                        idxV.c = index.c + int( delta.dx )
+                        idxV.c = indexC + int( delta.dx )
                     else:
-                        idxV.c = index.c
+                        idxV.c = indexC
 
                 if ( delta.dy >= 0 ):
-                    idxH.r = index.r + int( delta.dy )
+                    idxH.r = indexR + int( delta.dy )
                 else:
                     if ( True == loc[1] ):
                         # Starting from a horizontal line.
-                        idxH.r = index.r + int( delta.dy )
+                        idxH.r = indexR + int( delta.dy )
                     else:
-                        idxH.r = index.r
+                        idxH.r = indexR
 
                 # Get the x coordinates for the vertical line.
-                coorV = self.map.convert_to_coordinates( idxV )
+                coorV.x = idxV.c * self.map.stepSize[GridMap2D.I_X]
                 # Get the y coordinates for the horizontal line.
-                coorH = self.map.convert_to_coordinates( idxH )
+                coorH.y = idxH.r * self.map.stepSize[GridMap2D.I_Y]
 
                 # Find two possible intersections with these lines.
-                [xV, yV], flagV = LineIntersection2D.line_intersect( \
+                [xV, yV], flagV = LineIntersection2D.intersect_vertical_line( \
                     coorOri.x, coorOri.y, coorOri.x + coorDelta.dx, coorOri.y + coorDelta.dy, \
-                    coorV.x, self.map.corners[0][GridMap2D.I_Y], coorV.x, self.map.corners[3][GridMap2D.I_Y] )
+                    coorV.x, self.map.corners[0][GridMap2D.I_Y], self.map.corners[3][GridMap2D.I_Y] )
 
                 xV = round_if_needed(xV)
                 yV = round_if_needed(yV)
 
-                [xH, yH], flagH = LineIntersection2D.line_intersect( \
+                [xH, yH], flagH = LineIntersection2D.intersect_horizontal_line( \
                     coorOri.x, coorOri.y, coorOri.x + coorDelta.dx, coorOri.y + coorDelta.dy, \
-                    self.map.corners[0][GridMap2D.I_X], coorH.y, self.map.corners[1][GridMap2D.I_X], coorH.y )
+                    self.map.corners[0][GridMap2D.I_X], self.map.corners[1][GridMap2D.I_X], coorH.y )
                 
                 xH = round_if_needed(xH)
                 yH = round_if_needed(yH)
@@ -2267,8 +4128,8 @@ class GridMapEnv(object):
                     distH = 0
                     
                 # Auxiliary check.
-                auxV = self.map.is_corner_or_principle_line( BlockCoor( xV, yV ) )
-                auxH = self.map.is_corner_or_principle_line( BlockCoor( xH, yH ) )
+                auxV = self.map.is_corner_or_principle_line_s( xV, yV ) if ( xV is not None ) else ( False, )
+                auxH = self.map.is_corner_or_principle_line_s( xH, yH ) if ( xH is not None ) else ( False, )
 
                 if ( LineIntersection2D.VALID_INTERSECTION == flagV and \
                      True == auxV[0] and \
@@ -2284,14 +4145,14 @@ class GridMapEnv(object):
                         raise GridMapException( "Vertical and horizontal intersections must not both be invalid." )
 
                     # Check if (xi, yi) is on the boundary.
-                    if ( True == self.map.is_out_of_or_on_boundary( BlockCoor( xi, yi ) ) ):
+                    if ( True == self.map.is_out_of_or_on_boundary_s( xi, yi ) ):
                         # Stop here.
                         coorPre.x, coorPre.y = coor.x, coor.y
                         coor.x, coor.y = xi, yi
                         break
                     
                     # Get the index at (xi, yi). 
-                    interIdxH = self.map.get_index_by_coordinates( BlockCoor(xi, yi) )
+                    interIdxH = self.map.get_index_by_coordinates_s( xi, yi )
 
                     # Since we are at a corner point, we simply checkout all four neighboring blocks.
                     flagCornerFoundObstacle = False
@@ -2329,14 +4190,14 @@ class GridMapEnv(object):
                     if ( LineIntersection2D.VALID_INTERSECTION != flagH or \
                          distV < distH ):
                         # Check if (xV, yV) is on the boundary.
-                        if ( True == self.map.is_out_of_or_on_boundary( BlockCoor( xV, yV ) ) ):
+                        if ( True == self.map.is_out_of_or_on_boundary_s( xV, yV ) ):
                             # Stop here.
                             coorPre.x, coorPre.y = coor.x, coor.y
                             coor.x, coor.y = xV, yV
                             break
                         
                         # Get the index at (xV, yV).
-                        interIdxV = self.map.get_index_by_coordinates( BlockCoor(xV, yV) )
+                        interIdxV = self.map.get_index_by_coordinates_s( xV, yV )
 
                         if ( delta.dx < 0 ):
                             # Left direction.
@@ -2366,14 +4227,14 @@ class GridMapEnv(object):
                 if ( LineIntersection2D.VALID_INTERSECTION == flagH ):
                     # Not same distance.
                     # Check if (xH, yH) is on the boundary.
-                    if ( True == self.map.is_out_of_or_on_boundary( BlockCoor( xH, yH ) ) ):
+                    if ( True == self.map.is_out_of_or_on_boundary_s( xH, yH ) ):
                         # Stop here.
                         coorPre.x, coorPre.y = coor.x, coor.y
                         coor.x, coor.y = xH, yH
                         break
                     
                     # Get the index at (xH, yH).
-                    interIdxH = self.map.get_index_by_coordinates( BlockCoor(xH, yH) )
+                    interIdxH = self.map.get_index_by_coordinates_s( xH, yH )
 
                     if ( delta.dy < 0 ):
                         # Downwards direction.
@@ -2428,18 +4289,7 @@ class GridMapEnv(object):
             val = self.map.evaluate_coordinate( coor )
 
         # Check if it is in the ending block.
-        flagTerm = False
-
-        if ( GridMapEnv.END_POINT_MODE_BLOCK == self.endPointMode ):
-            if ( True == self.map.is_in_ending_block( coor ) ):
-                flagTerm = True
-                val += self.map.valueEndingBlock
-        elif ( GridMapEnv.END_POINT_MODE_RADIUS == self.endPointMode ):
-            if ( True == self.map.is_around_ending_block( coor, self.endPointRadius ) ):
-                flagTerm = True
-                val += self.map.valueEndingBlock
-        else:
-            raise GridMapException("Unexpected self.endPointMode. self.endPointMode = {}".format(self.endPointMode))
+        val, flagTerm = self.check_ending( coor, val )
 
         return coor, val, flagTerm
 
@@ -2473,6 +4323,7 @@ class GridMapEnv(object):
 
         s += "visAgentRadius = %f\n" % (self.visAgentRadius)
         s += "visPathArrowWidth = %f\n" % (self.visPathArrowWidth)
+        s += "visPixelsPerBlock = %d\n" % (self.visPixelsPerBlock)
 
         s += "nSteps = %d\n" % (self.nSteps)
         s += "totalValue = %f\n" % ( self.totalValue )
@@ -5,6 +5,8 @@ import math
 import os
 import unittest
 
+import numpy as np
+
 import GridMap
 
 class TestGridMap2D(unittest.TestCase):
@@ -61,6 +63,27 @@ class TestGridMap2D(unittest.TestCase):
         self.assertRaises( GridMap.GridMapException, self.map.evaluate_coordinate, (-0.01,    5) )
         self.assertRaises( GridMap.GridMapException, self.map.evaluate_coordinate, (20.01,    5) )
 
+    def test_evaluate_coordinates_batch(self):
+        print("test_evaluate_coordinates_batch")
+
+        # Make the normal blocks have different values.
+        self.map.enable_potential_value( -20, 1 )
+        self.map.update_potential_value()
+
+        # Corners, lines, and points inside blocks.
+        xs, ys = np.meshgrid( np.linspace( 0, 20, 81 ), np.linspace( 0, 10, 41 ) )
+
+        vals = self.map.evaluate_coordinates( xs, ys )
+
+        self.assertEqual( vals.shape, xs.shape )
+
+        for i in range( xs.shape[0] ):
+            for j in range( xs.shape[1] ):
+                self.assertEqual( vals[i, j], self.map.evaluate_coordinate( ( xs[i, j], ys[i, j] ) ) )
+
+        self.assertRaises( GridMap.GridMapException, self.map.evaluate_coordinates, np.array([ 9, -1 ]), np.array([ 5, 5 ]) )
+        self.assertRaises( GridMap.GridMapException, self.map.evaluate_coordinates, np.array([ 9, 9 ]), np.array([ 5, 10.01 ]) )
+
     def test_get_block(self):
         print("test_get_block")
 
@@ -74,6 +97,111 @@ class TestGridMap2D(unittest.TestCase):
         index.r = 5; index.c = 10
         self.assertTrue( isinstance(self.map.get_block(index), GridMap.ObstacleBlock) )
 
+    def test_block_arrays(self):
+        print("test_block_arrays")
+
+        self.assertEqual( self.map.blockTypes.shape, ( self.rows, self.cols ) )
+        self.assertEqual( self.map.blockValues.shape, ( self.rows, self.cols ) )
+
+        self.assertEqual( self.map.blockTypes[0, 0], GridMap.BLOCK_TYPE_STARTING )
+        self.assertEqual( self.map.blockTypes[9, 19], GridMap.BLOCK_TYPE_ENDING )
+        self.assertEqual( self.map.blockTypes[5, 10], GridMap.BLOCK_TYPE_OBSTACLE )
+        self.assertEqual( self.map.blockTypes[4, 9], GridMap.BLOCK_TYPE_NORMAL )
+        self.assertEqual( ( self.map.blockTypes == GridMap.BLOCK_TYPE_OBSTACLE ).sum(), 9 )
+
+        self.assertEqual( self.map.blockValues[5, 10], -100 )
+        self.assertEqual( self.map.blockValues[4, 9], -1 )
+
+        # get_block() returns a view. Changing it does not change the map.
+        b = self.map.get_block( GridMap.BlockIndex( 4, 9 ) )
+        self.assertEqual( b.coor, [9, 4] )
+        self.assertEqual( b.value, -1 )
+        b.value = 10
+        self.assertEqual( self.map.get_block( GridMap.BlockIndex( 4, 9 ) ).value, -1 )
+
+        # Compatibility view.
+        blockRows = self.map.blockRows
+        self.assertEqual( len(blockRows), self.rows )
+        self.assertEqual( len(blockRows[0]), self.cols )
+        self.assertTrue( isinstance( blockRows[5][10], GridMap.ObstacleBlock ) )
+
+    def test_copy(self):
+        print("test_copy")
+
+        coor = GridMap.BlockCoor( 1.5, 2.5 )
+        c = coor.copy()
+        c.x = 0
+        self.assertEqual( coor.x, 1.5 )
+        self.assertEqual( c.y, 2.5 )
+
+        index = GridMap.BlockIndex( 3, 4 )
+        i = index.copy()
+        i.r = 0
+        self.assertEqual( index.r, 3 )
+        self.assertEqual( i.c, 4 )
+
+        delta = GridMap.BlockCoorDelta( -1.0, 0.5 )
+        d = delta.copy()
+        d.dx = 0
+        self.assertEqual( delta.dx, -1.0 )
+        self.assertEqual( d.dy, 0.5 )
+        self.assertEqual( d.size, 2 )
+
+        # No per-instance dictionaries.
+        self.assertRaises( AttributeError, setattr, coor, "z", 0 )
+        self.assertRaises( AttributeError, setattr, self.map.get_block( index ), "z", 0 )
+
+        # Blocks keep their types.
+        b = self.map.get_block( GridMap.BlockIndex( 9, 19 ) )
+        bc = b.copy()
+        self.assertTrue( isinstance( bc, GridMap.EndingBlock ) )
+        bc.endPoint[0] = 0
+        bc.corners[0][0] = 0
+        self.assertEqual( b.endPoint[0], 19.5 )
+        self.assertEqual( b.corners[0][0], 19 )
+        self.assertEqual( bc.value, b.value )
+
+    def test_add_obstacles(self):
+        print("test_add_obstacles")
+
+        self.assertEqual( len( self.map.obstacleIndices ), 9 )
+        self.assertTrue( [ 5, 10 ] in self.map.obstacleIndices )
+
+        # Same results with add_obstacle().
+        m = GridMap.GridMap2D( self.rows, self.cols, outOfBoundValue=-200 )
+        m.set_value_normal_block(-1)
+        m.set_value_starting_block(0)
+        m.set_value_ending_block(100)
+        m.set_value_obstacle_block(-100)
+        m.initialize()
+        m.set_starting_block((0, 0))
+        m.set_ending_block((9, 19))
+        m.add_obstacles( [ [0, 10], [4, 10], [5, 0], [5, 9], [5, 10], [5, 11], [5, 19], [6, 10], [9, 10], [5, 10] ] )
+
+        self.assertTrue( ( m.blockTypes == self.map.blockTypes ).all() )
+        self.assertTrue( ( m.blockValues == self.map.blockValues ).all() )
+        self.assertEqual( m.obstacleIndices, self.map.obstacleIndices )
+
+        # Mask.
+        mask = np.zeros( ( self.rows, self.cols ), dtype=np.bool_ )
+        mask[2, 3:6] = True
+        mask[5, 10]  = True # Already an obstacle.
+        m.add_obstacles_from_mask( mask, value=-50 )
+
+        self.assertEqual( len( m.obstacleIndices ), 12 )
+        self.assertTrue( m.is_obstacle_block( ( 2, 4 ) ) )
+        self.assertEqual( m.blockValues[2, 4], -50 )
+        self.assertEqual( m.blockValues[5, 10], -100 )
+
+        # Starting and ending blocks could not be obstacles.
+        mask[0, 0] = True
+        self.assertRaises( IndexError, m.add_obstacles_from_mask, mask )
+        self.assertRaises( IndexError, m.add_obstacles, [ [9, 19] ] )
+        self.assertRaises( IndexError, m.add_obstacles, [ [10, 0] ] )
+        self.assertRaises( GridMap.GridMapException, m.add_obstacles_from_mask, mask[:5] )
+
+        self.assertFalse( m.is_obstacle_block( ( 0, 0 ) ) )
+
     def test_is_normal_block(self):
         print("test_is_normal_block")
 
@@ -639,6 +767,122 @@ class TestGridMap2D(unittest.TestCase):
         tempMap.read_JSON( "./WD_TestGridMap2D/Map.json" )
         print(tempMap)
 
+    def test_dump_read_JSON_obstacle_encodings(self):
+        print("test_dump_read_JSON_obstacle_encodings")
+
+        if ( not os.path.isdir( "./WD_TestGridMap2D" ) ):
+            os.makedirs("./WD_TestGridMap2D")
+
+        # A wall of obstacles.
+        for c in range( 12, 18 ):
+            self.map.add_obstacle( ( 7, c ) )
+
+        sizes = {}
+
+        for encoding in GridMap.OBSTACLE_ENCODINGS:
+            fn = "./WD_TestGridMap2D/Map_%s.json" % ( encoding )
+            self.map.dump_JSON( fn, obstacleEncoding=encoding )
+
+            sizes[encoding] = os.path.getsize( fn )
+
+            tempMap = GridMap.GridMap2D(rows=1, cols=1)
+            tempMap.read_JSON( fn )
+
+            self.assertEqual( tempMap.obstacleIndices, self.map.obstacleIndices )
+            self.assertTrue( ( tempMap.blockTypes == self.map.blockTypes ).all() )
+            self.assertTrue( ( tempMap.blockValues == self.map.blockValues ).all() )
+
+        self.assertTrue( sizes[GridMap.OBSTACLE_ENCODING_RLE] < sizes[GridMap.OBSTACLE_ENCODING_LIST] )
+        self.assertTrue( sizes[GridMap.OBSTACLE_ENCODING_BITMAP] < sizes[GridMap.OBSTACLE_ENCODING_LIST] )
+
+        self.assertRaises( GridMap.GridMapException, self.map.dump_JSON, "./WD_TestGridMap2D/Map_bad.json", "bad" )
+
+        # Runs at the ends of the rows and empty maps.
+        mask = np.zeros( ( 3, 5 ), dtype=np.bool_ )
+        mask[0, 3:] = True
+        mask[1, :]  = True
+        mask[2, 0]  = True
+
+        for encoding in GridMap.OBSTACLE_ENCODINGS:
+            d = GridMap.encode_obstacle_mask( mask, encoding )
+            self.assertTrue( ( GridMap.decode_obstacle_mask( d, 3, 5 ) == mask ).all() )
+
+            d = GridMap.encode_obstacle_mask( np.zeros_like( mask ), encoding )
+            self.assertFalse( GridMap.decode_obstacle_mask( d, 3, 5 ).any() )
+
+        self.assertEqual( GridMap.encode_obstacle_mask( mask, GridMap.OBSTACLE_ENCODING_RLE )["obstacleRuns"], \
+            [ [0, 3, 2], [1, 0, 5], [2, 0, 1] ] )
+
+    def test_version(self):
+        print("test_version")
+
+        v = self.map.version
+
+        self.map.add_obstacle( ( 1, 1 ) )
+        self.assertTrue( self.map.version > v )
+        v = self.map.version
+
+        self.map.add_obstacles_from_mask( np.zeros( ( self.rows, self.cols ), dtype=np.bool_ ) )
+        self.assertEqual( self.map.version, v )
+
+        self.map.set_ending_block( ( 1, 2 ) )
+        self.assertTrue( self.map.version > v )
+        v = self.map.version
+
+        # Settings and values without changing the block types.
+        self.map.set_value_out_of_boundary( -300 )
+        self.assertTrue( self.map.version > v )
+        v = self.map.version
+
+        self.map.enable_potential_value( 10, 1 )
+        self.assertTrue( self.map.version > v )
+        v = self.map.version
+
+        self.map.update_potential_value()
+        self.assertTrue( self.map.version > v )
+        v = self.map.version
+
+        self.map.initialize()
+        self.assertTrue( self.map.version > v )
+
+    def test_dump_read_binary(self):
+        print("test_dump_read_binary")
+
+        if ( not os.path.isdir( "./WD_TestGridMap2D" ) ):
+            os.makedirs("./WD_TestGridMap2D")
+
+        self.map.dump_binary( "./WD_TestGridMap2D/Map.gmb" )
+
+        for memoryMap in [ True, False ]:
+            tempMap = GridMap.GridMap2D(rows=1, cols=1)
+            tempMap.read_binary( "./WD_TestGridMap2D/Map.gmb", memoryMap=memoryMap )
+
+            self.assertEqual( tempMap.rows, self.rows )
+            self.assertEqual( tempMap.cols, self.cols )
+            self.assertEqual( tempMap.outOfBoundValue, -200 )
+            self.assertEqual( tempMap.corners, self.map.corners )
+            self.assertTrue( ( tempMap.blockTypes == self.map.blockTypes ).all() )
+            self.assertTrue( ( tempMap.blockValues == self.map.blockValues ).all() )
+            self.assertEqual( tempMap.obstacleIndices, self.map.obstacleIndices )
+            self.assertTrue( tempMap.haveStartingBlock )
+            self.assertEqual( tempMap.startingBlockIdx.r, 0 )
+            self.assertEqual( tempMap.endingBlockIdx.c, 19 )
+            self.assertEqual( tempMap.endingPoint.x, self.map.endingPoint.x )
+
+            self.assertEqual( tempMap.evaluate_coordinate( ( 10, 5 ) ), -300 )
+
+            # Modifying the map does not change the file.
+            tempMap.add_obstacle( ( 1, 1 ) )
+            self.assertTrue( tempMap.is_obstacle_block( ( 1, 1 ) ) )
+
+        tempMap = GridMap.GridMap2D(rows=1, cols=1)
+        tempMap.read_binary( "./WD_TestGridMap2D/Map.gmb" )
+        self.assertTrue( tempMap.is_normal_block( ( 1, 1 ) ) )
+
+        # Not a binary map.
+        self.map.dump_JSON( "./WD_TestGridMap2D/Map.json" )
+        self.assertRaises( GridMap.GridMapException, tempMap.read_binary, "./WD_TestGridMap2D/Map.json" )
+
 class TestGridMap2D_WithPotential(unittest.TestCase):
     def setUp(self):
         self.rows = 10
@@ -1098,6 +1342,34 @@ class TestGridMapEnv(unittest.TestCase):
         self.assertEqual( self.gme.can_move( self.boundaryPoints[ 6].x, self.boundaryPoints[ 6].y, dx, dy ), False )
         self.assertEqual( self.gme.can_move( self.boundaryPoints[ 7].x, self.boundaryPoints[ 7].y, dx, dy ), False )
 
+    def test_can_move_passability_tables(self):
+        print("test_can_move_passability_tables")
+
+        canMoveFuncs = [ \
+            (  1,  0, self.gme.can_move_east ), \
+            (  1,  1, self.gme.can_move_northeast ), \
+            (  0,  1, self.gme.can_move_north ), \
+            ( -1,  1, self.gme.can_move_northwest ), \
+            ( -1,  0, self.gme.can_move_west ), \
+            ( -1, -1, self.gme.can_move_southwest ), \
+            (  0, -1, self.gme.can_move_south ), \
+            (  1, -1, self.gme.can_move_southeast ) ]
+
+        xs = [ 0.5 * i for i in range( 2 * self.cols + 1 ) ]
+        ys = [ 0.5 * i for i in range( 2 * self.rows + 1 ) ]
+
+        # Add an obstacle after the tables are built.
+        self.gme.can_move( 0.5, 0.5, 1, 0 )
+        self.gme.map.add_obstacle( ( 2, 3 ) )
+
+        for x in xs:
+            for y in ys:
+                coor = GridMap.BlockCoor( x, y )
+
+                for dx, dy, func in canMoveFuncs:
+                    self.assertEqual( self.gme.can_move( x, y, dx, dy ), func( coor ), \
+                        "coor = %s, dx = %d, dy = %d" % ( coor, dx, dy ) )
+
     def test_try_move(self):
         """Test try_move()."""
 
@@ -1162,6 +1434,353 @@ class TestGridMapEnv(unittest.TestCase):
         self.assertEqual( val, -200 )
         self.assertEqual( flagTerm, False )
 
+    def test_try_move_grid_traversal(self):
+        """The grid traversal engine gives the same results with the line intersection engine."""
+
+        print("test_try_move_grid_traversal")
+
+        deltas = []
+        for dx in [ -13.5, -3, -1, -0.5, 0, 0.5, 1, 2.25, 8, 30 ]:
+            for dy in [ -7.5, -2, -1, -0.25, 0, 0.5, 1, 3, 15 ]:
+                if ( 0 == dx and 0 == dy ):
+                    continue
+                deltas.append( GridMap.BlockCoorDelta( dx, dy ) )
+
+        points = self.points + self.boundaryPoints + \
+            [ GridMap.BlockCoor( 0.5, 0.5 ), GridMap.BlockCoor( 3.3, 7.1 ), GridMap.BlockCoor( 14.0, 2.7 ) ]
+
+        for coor in points:
+            for coorDelta in deltas:
+                self.gme.enable_grid_traversal()
+                coorGT, valGT, flagTermGT = self.gme.try_move( coor, coorDelta )
+
+                self.gme.disable_grid_traversal()
+                coorLI, valLI, flagTermLI = self.gme.try_move( coor, coorDelta )
+
+                msg = "coor = %s, coorDelta = %s" % ( coor, coorDelta )
+                self.assertAlmostEqual( coorGT.x, coorLI.x, places=4, msg=msg )
+                self.assertAlmostEqual( coorGT.y, coorLI.y, places=4, msg=msg )
+                self.assertEqual( valGT, valLI, msg=msg )
+                self.assertEqual( flagTermGT, flagTermLI, msg=msg )
+
+                # Both engines return floating point coordinates.
+                self.assertFalse( isinstance( coorLI.x, (int, long) ), msg=msg )
+                self.assertFalse( isinstance( coorLI.y, (int, long) ), msg=msg )
+
+        self.gme.enable_grid_traversal()
+
+    def test_try_move_array(self):
+        """The vectorized try_move() gives exactly the same results with try_move()."""
+
+        print("test_try_move_array")
+
+        points = self.points + self.boundaryPoints + \
+            [ GridMap.BlockCoor( 0.5, 0.5 ), GridMap.BlockCoor( 3.3, 7.1 ), GridMap.BlockCoor( 14.0, 2.7 ) ]
+
+        xs, ys, dxs, dys = [], [], [], []
+
+        for coor in points:
+            for dx in [ -13.5, -3, -1, -0.5, 0, 0.5, 1, 2.25, 8, 30 ]:
+                for dy in [ -7.5, -2, -1, -0.25, 0, 0.5, 1, 3, 15 ]:
+                    if ( 0 == dx and 0 == dy ):
+                        continue
+
+                    xs.append( coor.x ); ys.append( coor.y )
+                    dxs.append( dx ); dys.append( dy )
+
+        # Random locations on the blocks, the grid lines, and the grid vertices.
+        rng = np.random.RandomState(0)
+        n = 2000
+        x = rng.rand(n) * self.cols
+        y = rng.rand(n) * self.rows
+        x[ :n//2 ] = np.round( x[ :n//2 ] )
+        y[ n//4:3*n//4 ] = np.round( y[ n//4:3*n//4 ] )
+        theta = rng.rand(n) * 2 * math.pi
+        mag = rng.choice( [ 0.3, 1, 5, 30 ], n )
+
+        xs = np.concatenate( ( xs, x ) )
+        ys = np.concatenate( ( ys, y ) )
+        dxs = np.concatenate( ( dxs, mag * np.cos(theta) ) )
+        dys = np.concatenate( ( dys, mag * np.sin(theta) ) )
+
+        # Diagonal moves through the grid vertices.
+        dys[-100:] = dxs[-100:]
+
+        for radius in [ None, 1.5 ]:
+            if ( radius is not None ):
+                self.gme.enable_ending_point_radius( radius )
+
+            resX, resY, values, flags = self.gme.try_move_array( xs, ys, dxs, dys )
+
+            for i in range( xs.size ):
+                coor, val, flagTerm = self.gme.try_move( \
+                    GridMap.BlockCoor( xs[i], ys[i] ), GridMap.BlockCoorDelta( dxs[i], dys[i] ) )
+
+                msg = "coor = (%s, %s), coorDelta = (%s, %s)" % ( xs[i], ys[i], dxs[i], dys[i] )
+                self.assertEqual( resX[i], coor.x, msg=msg )
+                self.assertEqual( resY[i], coor.y, msg=msg )
+                self.assertEqual( values[i], val, msg=msg )
+                self.assertEqual( flags[i], flagTerm, msg=msg )
+
+        # Zero actions are not allowed.
+        self.assertRaises( ValueError, self.gme.try_move_array, [ 0.5 ], [ 0.5 ], [ 0 ], [ 0 ] )
+
+        # Reaching tryMoveMaxCount.
+        self.gme.tryMoveMaxCount = 2
+        self.assertRaises( GridMap.GridMapException, self.gme.try_move_array, [ 0.5, 0.5 ], [ 1.5, 0.5 ], [ 8.0, 0.1 ], [ 0.5, 0.1 ] )
+
+    def test_try_move_debug(self):
+        print("test_try_move_debug")
+
+        coor      = GridMap.BlockCoor( 0.5, 1.5 )
+        coorDelta = GridMap.BlockCoorDelta( 8.0, 0.5 )
+
+        self.gme.enable_try_move_debug()
+        self.gme.tryMoveMaxCount = 2
+
+        self.assertRaises( GridMap.GridMapException, self.gme.try_move, coor, coorDelta )
+
+        self.gme.disable_grid_traversal()
+        self.assertRaises( GridMap.GridMapException, self.gme.try_move, coor, coorDelta )
+
+        self.gme.enable_grid_traversal()
+        self.gme.disable_try_move_debug()
+        self.gme.tryMoveMaxCount = 0
+
+        coorNew, val, flagTerm = self.gme.try_move( coor, coorDelta )
+        self.assertEqual( coorNew.x, 8.5 )
+        self.assertEqual( coorNew.y, 2.0 )
+
+    def test_step_history_not_shared(self):
+        print("test_step_history_not_shared")
+
+        action = GridMap.BlockCoorDelta( 1.0, 0.0 )
+        state, val, flagTerm, dummy = self.gme.step( action )
+
+        # Changing the returned state or the action does not change the history.
+        x = state.x
+        state.x = -1.0
+        action.dx = -1.0
+
+        self.assertEqual( self.gme.agentCurrentLoc.x, x )
+        self.assertEqual( self.gme.agentLocs[-1].x, x )
+        self.assertEqual( self.gme.agentActs[-1].dx, 1.0 )
+
+    def test_get_set_state(self):
+        print("test_get_set_state")
+
+        self.gme.enable_random_coordinating( 0.1 )
+
+        self.gme.step( GridMap.BlockCoorDelta( 1.0, 1.0 ) )
+        state = self.gme.get_state()
+
+        # Two branches from the same state.
+        results = []
+        for i in range(2):
+            self.gme.set_state( state )
+
+            for j in range(3):
+                s, val, flagTerm, dummy = self.gme.step( GridMap.BlockCoorDelta( 2.0, 0.5 ) )
+
+            results.append( ( s.x, s.y, self.gme.totalValue, self.gme.nSteps ) )
+
+            self.assertEqual( len( self.gme.agentLocs ), 5 )
+            self.assertEqual( len( self.gme.agentActs ), 4 )
+
+        self.assertEqual( results[0], results[1] )
+
+        self.gme.set_state( state )
+        self.assertEqual( self.gme.get_state()[:8], state[:8] )
+        self.assertEqual( len( self.gme.agentLocs ), 2 )
+
+        self.assertRaises( GridMap.GridMapException, GridMap.GridMapEnv().get_state )
+
+    def test_set_state_other_branch(self):
+        print("test_set_state_other_branch")
+
+        root = self.gme.get_state()
+
+        # Branch A.
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.5 ) )
+
+        stateA = self.gme.get_state()
+        locsA = self.gme.get_trajectory_array().copy()
+
+        # Branch B with the same number of steps.
+        self.gme.set_state( root )
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 1.0 ) )
+
+        self.gme.set_state( stateA )
+
+        # The locations of branch B are not kept as the ones leading to stateA.
+        locs = self.gme.get_trajectory_array()
+        self.assertEqual( locs.shape, ( 1, 2 ) )
+        self.assertTrue( np.array_equal( locs[0], locsA[-1] ) )
+        self.assertEqual( self.gme.history.nTotal, 4 )
+        self.assertEqual( self.gme.get_state()[:7], stateA[:7] )
+
+        # The history goes on from the restored location.
+        self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.5 ) )
+        self.assertEqual( self.gme.get_trajectory_array().shape, ( 2, 2 ) )
+        self.assertTrue( np.array_equal( self.gme.get_action_array(), [ [ 1.0, 0.5 ] ] ) )
+
+        # Restoring an ancestor still truncates.
+        self.gme.set_state( stateA )
+        self.gme.set_state( root )
+        self.assertEqual( self.gme.get_trajectory_array().shape, ( 1, 2 ) )
+
+        # A state taken before reset().
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 1.0 ) )
+
+        self.gme.reset()
+        self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.5 ) )
+        self.gme.set_state( stateA )
+        self.assertEqual( self.gme.get_trajectory_array().shape, ( 1, 2 ) )
+        self.assertEqual( self.gme.history.nTotal, 4 )
+
+    def test_rollout(self):
+        print("test_rollout")
+
+        actions = np.array( [ [ 1.0, 0.5 ], [ 2.0, 3.0 ], [ 0.5, -1.0 ], [ 5.0, 5.0 ] ] * 5 )
+
+        self.gme.set_max_steps( 15 )
+
+        # Reference by step().
+        ref = []
+        for a in actions:
+            state, val, flagTerm, dummy = self.gme.step( GridMap.BlockCoorDelta( a[0], a[1] ) )
+            ref.append( ( state.x, state.y, val, flagTerm ) )
+
+            if ( flagTerm ):
+                break
+
+        self.gme.reset()
+        states, acts, values, flags = self.gme.rollout( actions )
+
+        self.assertEqual( states.shape, ( len(ref), 2 ) )
+        self.assertTrue( np.array_equal( acts, actions[:len(ref)] ) )
+        self.assertTrue( np.array_equal( states, [ r[:2] for r in ref ] ) )
+        self.assertTrue( np.array_equal( values, [ r[2] for r in ref ] ) )
+        self.assertTrue( np.array_equal( flags, [ r[3] for r in ref ] ) )
+        self.assertTrue( flags[-1] )
+        self.assertEqual( self.gme.nSteps, len(ref) )
+        self.assertEqual( self.gme.get_trajectory_array().shape[0], len(ref) + 1 )
+
+        # Terminated.
+        self.assertRaises( GridMap.GridMapException, self.gme.rollout, actions )
+
+        # Running out of actions.
+        self.gme.reset()
+        states, acts, values, flags = self.gme.rollout( actions[:3] )
+        self.assertEqual( flags.shape, ( 3, ) )
+        self.assertFalse( flags.any() )
+
+    def test_trajectory_array(self):
+        print("test_trajectory_array")
+
+        self.gme.enable_action_clipping( -1, 1 )
+
+        self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.5 ) )
+        self.gme.step( GridMap.BlockCoorDelta( 5.0, 0.5 ) )
+
+        locs = self.gme.get_trajectory_array()
+        acts = self.gme.get_action_array()
+
+        self.assertEqual( locs.shape, ( 3, 2 ) )
+        self.assertTrue( np.array_equal( locs[-1], [ self.gme.agentCurrentLoc.x, self.gme.agentCurrentLoc.y ] ) )
+        self.assertTrue( np.array_equal( acts, [ [ 1.0, 0.5 ], [ 1.0, 0.5 ] ] ) )
+
+        # Read-only views of the history.
+        self.assertFalse( locs.flags.writeable )
+        self.assertFalse( acts.flags.writeable )
+        self.assertTrue( np.may_share_memory( locs, self.gme.history.locs ) )
+        self.assertTrue( np.may_share_memory( acts, self.gme.history.acts ) )
+        self.assertTrue( self.gme.history.locs.flags.writeable )
+
+    def test_agent_locs_view(self):
+        print("test_agent_locs_view")
+
+        self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.5 ) )
+        self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+
+        locs = self.gme.agentLocs
+        acts = self.gme.agentActs
+
+        self.assertEqual( len(locs), 3 )
+        self.assertEqual( len(acts), 2 )
+        self.assertEqual( [ loc.x for loc in locs ], self.gme.get_trajectory_array()[:, 0].tolist() )
+        self.assertEqual( acts[0].dx, 1.0 )
+        self.assertEqual( len( locs[1:] ), 2 )
+
+        # Changes write through to the history.
+        locs[-1].x = 7.0
+        acts[0] = GridMap.BlockCoorDelta( 2.0, 3.0 )
+        self.assertEqual( self.gme.history.get_locs()[-1, 0], 7.0 )
+        self.assertTrue( np.array_equal( self.gme.history.get_acts()[0], [ 2.0, 3.0 ] ) )
+        self.assertEqual( self.gme.agentLocs[-1].x, 7.0 )
+
+        # The length is fixed.
+        self.assertRaises( AttributeError, getattr, locs, "append" )
+        self.assertRaises( IndexError, locs.__getitem__, 3 )
+
+        # Copies are plain objects.
+        c = locs[0].copy()
+        c.x = -1.0
+        self.assertEqual( type(c), GridMap.BlockCoor )
+        self.assertEqual( self.gme.agentLocs[0].x, locs[0].x )
+        self.assertNotEqual( locs[0].x, -1.0 )
+
+        # Both copies of a row of the ring buffer are written.
+        self.gme.set_history_mode( GridMap.HISTORY_MODE_RING, 2 )
+        first = self.gme.agentLocs[0]
+        self.gme.agentLocs[-1].y = 9.0
+        self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+        self.assertEqual( self.gme.history.get_locs()[0, 1], 9.0 )
+
+        # A dropped location.
+        self.assertRaises( GridMap.GridMapException, getattr, first, "x" )
+
+    def test_history_modes(self):
+        print("test_history_modes")
+
+        self.gme.set_history_mode( GridMap.HISTORY_MODE_RING, 3 )
+
+        for i in range(5):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+
+        self.assertEqual( len( self.gme.agentLocs ), 3 )
+        self.assertEqual( len( self.gme.agentActs ), 2 )
+        self.assertEqual( self.gme.agentLocs[-1].x, self.gme.agentCurrentLoc.x )
+
+        img = self.gme.render( mode = GridMap.GridMapEnv.RENDER_MODE_RGB_ARRAY )
+        self.assertEqual( img.ndim, 3 )
+
+        self.gme.save( "GridMapEnvRing.json" )
+
+        tempGme = GridMap.GridMapEnv()
+        tempGme.load( self.workingDir, "GridMapEnvRing.json" )
+        self.assertEqual( tempGme.get_history_mode(), GridMap.HISTORY_MODE_RING )
+        self.assertTrue( np.array_equal( tempGme.history.get_locs(), self.gme.history.get_locs() ) )
+        self.assertTrue( np.array_equal( tempGme.history.get_acts(), self.gme.history.get_acts() ) )
+
+        # No history at all.
+        self.gme.set_history_mode( GridMap.HISTORY_MODE_OFF )
+        self.gme.reset()
+        self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+
+        self.assertEqual( len( self.gme.agentLocs ), 0 )
+        self.assertEqual( self.gme.nSteps, 1 )
+
+        self.gme.render( mode = GridMap.GridMapEnv.RENDER_MODE_RGB_ARRAY )
+        self.gme.save( "GridMapEnvOff.json" )
+
+        tempGme.load( self.workingDir, "GridMapEnvOff.json" )
+        self.assertEqual( tempGme.nSteps, 1 )
+        self.assertEqual( len( tempGme.agentLocs ), 0 )
+
     def test_try_move_long_distance_with_no_obstacles(self):
         print("test_try_move_long_distance_with_no_obstacles")
 
@@ -2243,6 +2862,123 @@ class TestGridMapEnv(unittest.TestCase):
         # Show the temporary environment.
         print(tempGme)
 
+    def test_save_load_binary_map(self):
+        print("test_save_load_binary_map")
+
+        self.gme.save( "GridMapEnvBinary.json", binaryMap=True )
+
+        self.assertTrue( os.path.isfile( os.path.join( self.workingDir, "GridMapEnvBinary_Map.gmb" ) ) )
+
+        tempGme = GridMap.GridMapEnv()
+        tempGme.load( self.workingDir, "GridMapEnvBinary.json" )
+
+        self.assertTrue( ( tempGme.map.blockTypes == self.gme.map.blockTypes ).all() )
+        self.assertTrue( ( tempGme.map.blockValues == self.gme.map.blockValues ).all() )
+
+class TestAgentHistory(unittest.TestCase):
+    def append(self, h, n):
+        for i in range(n):
+            h.append( i, 10 * i, -i, -10 * i )
+
+    def test_full(self):
+        print("test_full")
+
+        h = GridMap.AgentHistory()
+        self.append( h, 200 )
+
+        self.assertEqual( len(h), 200 )
+        self.assertTrue( h.locs.shape[0] >= 200 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], np.arange(200) ) )
+        self.assertTrue( np.array_equal( h.get_acts()[:, 0], -np.arange( 1, 200 ) ) )
+
+    def test_ring(self):
+        print("test_ring")
+
+        h = GridMap.AgentHistory( GridMap.HISTORY_MODE_RING, 5 )
+        self.append( h, 3 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 0, 1, 2 ] ) )
+
+        self.append( h, 13 )
+        self.assertEqual( h.nTotal, 16 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 8, 9, 10, 11, 12 ] ) )
+        self.assertTrue( np.array_equal( h.get_acts()[:, 0], [ -9, -10, -11, -12 ] ) )
+        self.assertTrue( h.get_locs().flags.c_contiguous )
+
+        # Drop the last 2.
+        h.truncate( 14 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 8, 9, 10 ] ) )
+        h.append( 100, 0 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 8, 9, 10, 100 ] ) )
+
+        # Switch to the full mode and back.
+        h.set_mode( GridMap.HISTORY_MODE_FULL )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 8, 9, 10, 100 ] ) )
+        h.set_mode( GridMap.HISTORY_MODE_RING, 2 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 10, 100 ] ) )
+        self.assertEqual( h.nTotal, 15 )
+
+        self.assertRaises( ValueError, h.set_mode, GridMap.HISTORY_MODE_RING, 0 )
+        self.assertRaises( ValueError, h.set_mode, "unknown" )
+
+    def test_off(self):
+        print("test_off")
+
+        h = GridMap.AgentHistory( GridMap.HISTORY_MODE_OFF )
+        self.append( h, 10 )
+
+        self.assertEqual( len(h), 0 )
+        self.assertEqual( h.nTotal, 10 )
+        self.assertEqual( h.get_locs().shape, ( 0, 2 ) )
+        self.assertEqual( h.get_acts().shape, ( 0, 2 ) )
+
+    def test_set(self):
+        print("test_set")
+
+        h = GridMap.AgentHistory( GridMap.HISTORY_MODE_RING, 3 )
+        h.set( [ [ 0, 0 ], [ 1, 1 ], [ 2, 2 ], [ 3, 3 ] ], [ [ 1, 1 ] ] * 3 )
+        self.assertTrue( np.array_equal( h.get_locs()[:, 0], [ 1, 2, 3 ] ) )
+        self.assertEqual( h.get_acts().shape, ( 2, 2 ) )
+
+        self.assertRaises( ValueError, h.set, [ [ 0, 0 ], [ 1, 1 ] ], [ [ 1, 1 ] ] * 2 )
+
+    def test_restore(self):
+        print("test_restore")
+
+        for h in [ GridMap.AgentHistory(), GridMap.AgentHistory( GridMap.HISTORY_MODE_RING, 4 ) ]:
+            self.append( h, 3 )
+            root = h.get_mark()
+
+            self.append( h, 3 )
+            markA = h.get_mark()
+
+            # An ancestor.
+            self.assertTrue( h.restore( root, 2, 20, -2, -20 ) )
+            self.assertEqual( h.nTotal, 3 )
+            self.assertEqual( h.get_locs()[-1, 0], 2 )
+
+            # The same number of locations on another branch.
+            for i in range(3):
+                h.append( 100 + i, 0 )
+
+            self.assertNotEqual( h.get_mark(), markA )
+            self.assertFalse( h.restore( markA, 5, 50, -5, -50 ) )
+            self.assertEqual( h.nTotal, 6 )
+            self.assertTrue( np.array_equal( h.get_locs(), [ [ 5, 50 ] ] ) )
+            self.assertEqual( h.get_acts().shape, ( 0, 2 ) )
+            self.assertTrue( np.array_equal( h.acts[ h.get_rows(5)[0] ], [ -5, -50 ] ) )
+
+            # A longer mark after clear().
+            h.clear()
+            self.append( h, 2 )
+            self.assertFalse( h.restore( markA, 5, 50, -5, -50 ) )
+            self.assertEqual( h.nTotal, 6 )
+            self.assertEqual( len(h), 1 )
+
+            # The current state.
+            mark = h.get_mark()
+            self.assertTrue( h.restore( mark, 5, 50, -5, -50 ) )
+            self.assertEqual( h.get_mark(), mark )
+
 class TestGridMapEnv_RLTrain(unittest.TestCase):
     def setUp(self):
         self.rows = 11
@@ -2467,6 +3203,7 @@ if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromTestCase( TestGridMap2D )
     suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestGridMap2D_WithPotential ) )
     suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestGridMapEnv ) )
+    suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestAgentHistory ) )
     suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestGridMapEnv_RLTrain ) )
     suite.addTest( unittest.TestLoader().loadTestsFromTestCase( TestGridMapEnv_README ) )
     unittest.TextTestRunner().run( suite )
@@ -132,3 +132,153 @@ def line_intersect(x0, y0, x1, y1, x2, y2, x3, y3, eps = 1e-6):
         flag = FALL_OUT_INTERSECTION
 
     return [ x, y ], flag
+
+def intersect_vertical_line(x0, y0, x1, y1, x, y2, y3, eps = 1e-6):
+    """
+    Calculates the intersection point of the line segment (x0, y0) - (x1, y1) and the
+    vertical line segment (x, y2) - (x, y3).
+
+    This is a fast version of line_intersect() for a vertical target line. Only scalar 
+    arithmetic is used. The return values and the flags are the same with line_intersect().
+    """
+
+    assert( eps > 0 )
+
+    dx0 = x1 - x0
+    dy0 = y1 - y0
+    dy2 = y3 - y2
+
+    # Test if lines segments are degenerated.
+    d01 = math.sqrt( dx0**2 + dy0**2 )
+    d23 = math.fabs( dy2 )
+    if ( d01 < eps or d23 < eps ):
+        return [None, None], NO_VALID_INTERSECTION
+
+    # Test if lines are parallel.
+    if ( math.fabs( math.fabs( dy0*dy2 ) - d01*d23 ) <= eps ):
+        return [None, None], PARALLAL
+
+    # Intersection. x is converted such that the type does not depend on the caller.
+    x = float( x )
+    y = y0 + 1.0 * ( x - x0 ) * dy0 / dx0
+
+    # Test if the intersection falls into the line segments.
+    if ( ( x0 - x ) * ( x1 - x ) + ( y0 - y ) * ( y1 - y ) <= 0 and \
+         ( y2 - y ) * ( y3 - y ) <= 0 ):
+        flag = VALID_INTERSECTION
+    else:
+        flag = FALL_OUT_INTERSECTION
+
+    return [ x, y ], flag
+
+def intersect_horizontal_line(x0, y0, x1, y1, x2, x3, y, eps = 1e-6):
+    """
+    Calculates the intersection point of the line segment (x0, y0) - (x1, y1) and the
+    horizontal line segment (x2, y) - (x3, y).
+
+    This is a fast version of line_intersect() for a horizontal target line. Only scalar 
+    arithmetic is used. The return values and the flags are the same with line_intersect().
+    """
+
+    assert( eps > 0 )
+
+    dx0 = x1 - x0
+    dy0 = y1 - y0
+    dx2 = x3 - x2
+
+    # Test if lines segments are degenerated.
+    d01 = math.sqrt( dx0**2 + dy0**2 )
+    d23 = math.fabs( dx2 )
+    if ( d01 < eps or d23 < eps ):
+        return [None, None], NO_VALID_INTERSECTION
+
+    # Test if lines are parallel.
+    if ( math.fabs( math.fabs( dx0*dx2 ) - d01*d23 ) <= eps ):
+        return [None, None], PARALLAL
+
+    # Intersection. y is converted such that the type does not depend on the caller.
+    y = float( y )
+    x = x0 + 1.0 * ( y - y0 ) * dx0 / dy0
+
+    # Test if the intersection falls into the line segments.
+    if ( ( x0 - x ) * ( x1 - x ) + ( y0 - y ) * ( y1 - y ) <= 0 and \
+         ( x2 - x ) * ( x3 - x ) <= 0 ):
+        flag = VALID_INTERSECTION
+    else:
+        flag = FALL_OUT_INTERSECTION
+
+    return [ x, y ], flag
+
+def line_intersect_many(segs0, segs1, eps = 1e-6, elementwise = False):
+    """
+    Vectorized version of line_intersect().
+
+    segs0 is a K x 4 array and segs1 is an M x 4 array. Every row of these arrays 
+    represents a line segment as [x0, y0, x1, y1]. If elementwise is False, every
+    segment in segs0 is intersected with every segment in segs1 and the results are 
+    K x M arrays. If elementwise is True, K must equal M and the i-th segment of segs0
+    is intersected with the i-th segment of segs1. The results are arrays with K elements.
+
+    The return values are xs, ys, and flags. The flags are the same with line_intersect().
+    For the PARALLAL and NO_VALID_INTERSECTION cases, xs and ys are NaN.
+    The calculation is carried out in float64.
+    """
+
+    assert( eps > 0 )
+
+    segs0 = np.asarray( segs0, dtype=np.float64 )
+    segs1 = np.asarray( segs1, dtype=np.float64 )
+
+    if ( 2 != segs0.ndim or 4 != segs0.shape[1] ):
+        raise ValueError("segs0 must be a K x 4 array. segs0.shape = {}.".format( segs0.shape ))
+
+    if ( 2 != segs1.ndim or 4 != segs1.shape[1] ):
+        raise ValueError("segs1 must be a M x 4 array. segs1.shape = {}.".format( segs1.shape ))
+
+    if ( True == elementwise ):
+        if ( segs0.shape[0] != segs1.shape[0] ):
+            raise ValueError("segs0 and segs1 must have the same number of segments. {} != {}.".format( segs0.shape[0], segs1.shape[0] ))
+    else:
+        segs0 = segs0[:, np.newaxis, :]
+        segs1 = segs1[np.newaxis, :, :]
+
+    x0, y0, x1, y1 = segs0[..., 0], segs0[..., 1], segs0[..., 2], segs0[..., 3]
+    x2, y2, x3, y3 = segs1[..., 0], segs1[..., 1], segs1[..., 2], segs1[..., 3]
+
+    dx0 = x1 - x0
+    dy0 = y1 - y0
+
+    dx2 = x3 - x2
+    dy2 = y3 - y2
+
+    # Test if lines segments are degenerated.
+    d01 = np.sqrt( dx0**2 + dy0**2 )
+    d23 = np.sqrt( dx2**2 + dy2**2 )
+    degenerated = ( d01 < eps ) | ( d23 < eps )
+
+    # Test if lines are parallel.
+    parallel = ~degenerated & ( np.fabs( np.fabs( dx0*dx2 + dy0*dy2 ) - d01*d23 ) <= eps )
+
+    # Intersection calculation.
+    det = dx0*dy2 - dy0*dx2
+    det = np.where( degenerated | parallel, 1.0, det )
+
+    r0 = x0*y1 - x1*y0
+    r1 = x2*y3 - x3*y2
+
+    xs = ( dx0*r1 - dx2*r0 ) / det
+    ys = ( dy0*r1 - dy2*r0 ) / det
+
+    # Test if the intersection falls into the line segments.
+    inside = ( ( x0 - xs ) * ( x1 - xs ) + ( y0 - ys ) * ( y1 - ys ) <= 0 ) & \
+             ( ( x2 - xs ) * ( x3 - xs ) + ( y2 - ys ) * ( y3 - ys ) <= 0 )
+
+    flags = np.where( inside, VALID_INTERSECTION, FALL_OUT_INTERSECTION )
+    flags[parallel]    = PARALLAL
+    flags[degenerated] = NO_VALID_INTERSECTION
+
+    invalid = degenerated | parallel
+    xs[invalid] = np.nan
+    ys[invalid] = np.nan
+
+    return xs, ys, flags
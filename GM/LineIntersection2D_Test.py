@@ -1,6 +1,8 @@
 
 from __future__ import print_function
 
+import numpy as np
+
 import LineIntersection2D
 
 import unittest
@@ -163,6 +165,132 @@ class TestLineIntersection(unittest.TestCase):
         self.assertEqual( x, -1.0 )
         self.assertEqual( y, -1.0 )
 
+    def test_intersect_vertical_line(self):
+        """Test the axis-aligned version for vertical lines."""
+
+        print("test_intersect_vertical_line")
+
+        [x, y], flag = LineIntersection2D.intersect_vertical_line( \
+            0, 0, 2, 1, 1, 0, 2, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.VALID_INTERSECTION )
+        self.assertEqual( x, 1.0 )
+        self.assertEqual( y, 0.5 )
+        self.assertTrue( isinstance( x, float ) )
+
+        [x, y], flag = LineIntersection2D.intersect_vertical_line( \
+            0, 0, 2, 1, 3, 0, 2, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.FALL_OUT_INTERSECTION )
+        self.assertEqual( x, 3.0 )
+        self.assertEqual( y, 1.5 )
+
+        [x, y], flag = LineIntersection2D.intersect_vertical_line( \
+            0, 0, 0, 2, 1, 0, 2, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.PARALLAL )
+        self.assertIsNone( x )
+        self.assertIsNone( y )
+
+        [x, y], flag = LineIntersection2D.intersect_vertical_line( \
+            0, 0, 0, 0, 1, 0, 2, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.NO_VALID_INTERSECTION )
+
+    def test_intersect_horizontal_line(self):
+        """Test the axis-aligned version for horizontal lines."""
+
+        print("test_intersect_horizontal_line")
+
+        [x, y], flag = LineIntersection2D.intersect_horizontal_line( \
+            0, 0, 1, 2, 0, 2, 1, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.VALID_INTERSECTION )
+        self.assertEqual( x, 0.5 )
+        self.assertEqual( y, 1.0 )
+        self.assertTrue( isinstance( y, float ) )
+
+        [x, y], flag = LineIntersection2D.intersect_horizontal_line( \
+            0, 0, 1, 2, 1, 2, 1, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.FALL_OUT_INTERSECTION )
+        self.assertEqual( x, 0.5 )
+        self.assertEqual( y, 1.0 )
+
+        [x, y], flag = LineIntersection2D.intersect_horizontal_line( \
+            0, 1, 2, 1, 0, 2, 2, self.eps )
+
+        self.assertEqual( flag, LineIntersection2D.PARALLAL )
+        self.assertIsNone( x )
+        self.assertIsNone( y )
+
+    def test_axis_aligned_same_as_general(self):
+        """The axis-aligned versions should agree with line_intersect()."""
+
+        print("test_axis_aligned_same_as_general")
+
+        segs = [ ( 0, 0, 2, 1 ), ( 2, 3, -1, -2 ), ( 0.5, 0.5, 0.5, 3 ), ( -1, 1.5, 4, 1.5 ), ( 1, 1, 1, 1 ) ]
+
+        for x0, y0, x1, y1 in segs:
+            for v in [ -1, 0, 0.5, 1, 2 ]:
+                [xG, yG], flagG = LineIntersection2D.line_intersect( \
+                    x0, y0, x1, y1, v, -1, v, 2, self.eps )
+                [x, y], flag = LineIntersection2D.intersect_vertical_line( \
+                    x0, y0, x1, y1, v, -1, 2, self.eps )
+
+                self.assertEqual( flag, flagG )
+                if ( xG is not None ):
+                    self.assertAlmostEqual( x, xG, places=5 )
+                    self.assertAlmostEqual( y, yG, places=5 )
+
+                [xG, yG], flagG = LineIntersection2D.line_intersect( \
+                    x0, y0, x1, y1, -1, v, 2, v, self.eps )
+                [x, y], flag = LineIntersection2D.intersect_horizontal_line( \
+                    x0, y0, x1, y1, -1, 2, v, self.eps )
+
+                self.assertEqual( flag, flagG )
+                if ( xG is not None ):
+                    self.assertAlmostEqual( x, xG, places=5 )
+                    self.assertAlmostEqual( y, yG, places=5 )
+
+    def test_line_intersect_many(self):
+        """The vectorized version should agree with line_intersect()."""
+
+        print("test_line_intersect_many")
+
+        segs0 = np.array( [ [ 0, 0, 2, 1 ], [ 2, 3, -1, -2 ], [ 0.5, 0.5, 0.5, 3 ], [ 1, 1, 1, 1 ] ] )
+        segs1 = np.array( [ [ 1, 0, 1, 2 ], [ -1, 1.5, 4, 1.5 ], [ 0, 0, 4, 2 ], [ 0, 2, 1, 0 ], [ 3, 3, 3, 3 ] ] )
+
+        xs, ys, flags = LineIntersection2D.line_intersect_many( segs0, segs1, self.eps )
+
+        self.assertEqual( flags.shape, ( 4, 5 ) )
+
+        for i in range( segs0.shape[0] ):
+            for j in range( segs1.shape[0] ):
+                [x, y], flag = LineIntersection2D.line_intersect( \
+                    *( list( segs0[i] ) + list( segs1[j] ) ), eps=self.eps )
+
+                self.assertEqual( flags[i, j], flag )
+
+                if ( x is None ):
+                    self.assertTrue( np.isnan( xs[i, j] ) )
+                    self.assertTrue( np.isnan( ys[i, j] ) )
+                else:
+                    self.assertAlmostEqual( xs[i, j], x, places=5 )
+                    self.assertAlmostEqual( ys[i, j], y, places=5 )
+
+        # Elementwise.
+        xs, ys, flags = LineIntersection2D.line_intersect_many( segs0, segs1[:4], self.eps, elementwise=True )
+
+        self.assertEqual( flags.shape, ( 4, ) )
+        self.assertEqual( flags[0], LineIntersection2D.VALID_INTERSECTION )
+        self.assertEqual( xs[0], 1.0 )
+        self.assertEqual( ys[0], 0.5 )
+        self.assertEqual( flags[2], LineIntersection2D.FALL_OUT_INTERSECTION )
+        self.assertEqual( flags[3], LineIntersection2D.NO_VALID_INTERSECTION )
+
+        self.assertRaises( ValueError, LineIntersection2D.line_intersect_many, segs0, segs1, self.eps, True )
+
 if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromTestCase( TestLineIntersection )
     unittest.TextTestRunner().run( suite )
@@ -0,0 +1,551 @@
+from __future__ import print_function
+
+import numpy as np
+import struct
+import zlib
+
+import GridMap
+
+# Names of the render backends.
+RENDER_BACKEND_NONE       = "none"
+RENDER_BACKEND_MATPLOTLIB = "matplotlib"
+RENDER_BACKEND_ARRAY      = "array"
+
+RENDER_BACKENDS = [ RENDER_BACKEND_NONE, RENDER_BACKEND_MATPLOTLIB, RENDER_BACKEND_ARRAY ]
+
+def hex_to_rgba(s):
+    """Convert a color string like #RRGGBB or #RRGGBBAA into a list of 4 integers."""
+
+    s = s.lstrip("#")
+
+    if ( 6 == len(s) ):
+        s = s + "FF"
+    elif ( 8 != len(s) ):
+        raise ValueError("Unexpected color string %s." % (s))
+
+    return [ int( s[i:i+2], 16 ) for i in range( 0, 8, 2 ) ]
+
+def write_png(fn, img):
+    """Write an H x W x 3 uint8 array as a PNG file. No matplotlib is needed."""
+
+    img = np.ascontiguousarray( img, dtype = np.uint8 )
+
+    if ( 3 != img.ndim or 3 != img.shape[2] ):
+        raise ValueError("img must be an H x W x 3 array. Got shape %s." % ( str(img.shape) ))
+
+    h, w = img.shape[:2]
+
+    def chunk(tag, data):
+        c = struct.pack( ">I", len(data) ) + tag + data
+        return c + struct.pack( ">I", zlib.crc32( tag + data ) & 0xFFFFFFFF )
+
+    # Filter type 0 (None) at the beginning of every row.
+    raw = np.zeros( ( h, 1 + w * 3 ), dtype = np.uint8 )
+    raw[:, 1:] = img.reshape( ( h, w * 3 ) )
+
+    with open( fn, "wb" ) as fp:
+        fp.write( b"\x89PNG\r\n\x1a\n" )
+        fp.write( chunk( b"IHDR", struct.pack( ">IIBBBBB", w, h, 8, 2, 0, 0, 0 ) ) )
+        fp.write( chunk( b"IDAT", zlib.compress( raw.tobytes(), 6 ) ) )
+        fp.write( chunk( b"IEND", b"" ) )
+
+def make_arrow_polygons(p0, p1, width):
+    """
+    Create the polygons of the arrows from p0 to p1. p0 and p1 are N x 2 arrays.
+    The shape follows matplotlib's FancyArrow with length_includes_head = True and
+    the default head size. Arrows with zero length are dropped.
+    Returns an M x 7 x 2 array.
+    """
+
+    p0 = np.asarray( p0, dtype = np.float64 ).reshape( ( -1, 2 ) )
+    p1 = np.asarray( p1, dtype = np.float64 ).reshape( ( -1, 2 ) )
+
+    d = p1 - p0
+    length = np.sqrt( d[:, 0]**2 + d[:, 1]**2 )
+
+    flag = length > 0
+    p0, d, length = p0[flag], d[flag], length[flag]
+
+    u = d / length[:, np.newaxis] # Unit vectors along the arrows.
+    n = np.stack( ( -u[:, 1], u[:, 0] ), axis = 1 ) # Unit normal vectors.
+
+    headWidth  = 3.0 * width
+    headLength = np.minimum( 1.5 * headWidth, length )
+
+    # Local coordinates along u and n.
+    xs = np.stack( ( np.zeros_like(length), length - headLength, length - headLength, length, \
+                     length - headLength, length - headLength, np.zeros_like(length) ), axis = 1 )
+    ys = np.array( [ width, width, headWidth, 0, -headWidth, -width, -width ] ) / 2.0
+
+    return p0[:, np.newaxis, :] + xs[:, :, np.newaxis] * u[:, np.newaxis, :] \
+        + ys[np.newaxis, :, np.newaxis] * n[:, np.newaxis, :]
+
+class RenderBackend(object):
+    """
+    The interface of the render backends used by GridMapEnv.render().
+    """
+
+    def __init__(self):
+        self.name = "RenderBackend"
+
+    def render(self, env, pause = 0, flagSave = False, fn = None):
+        """
+        Render env. See GridMapEnv.render() for the arguments.
+        The returned value is passed back to the caller of GridMapEnv.render().
+        """
+
+        raise NotImplementedError()
+
+    def close(self):
+        """Release any resources. The next call to render() starts over."""
+
+        pass
+
+    def save(self, fn):
+        """Save the latest rendered result to fn."""
+
+        raise NotImplementedError()
+
+class NoOpRenderBackend(RenderBackend):
+    """
+    Draws nothing. Use this in headless training workers.
+    """
+
+    def __init__(self):
+        super(NoOpRenderBackend, self).__init__()
+
+        self.name = RENDER_BACKEND_NONE
+
+    def render(self, env, pause = 0, flagSave = False, fn = None):
+        return None
+
+    def save(self, fn):
+        pass
+
+class MatplotlibRenderBackend(RenderBackend):
+    """
+    Draws the map and the agent history with matplotlib. matplotlib is
+    imported on the first call to render().
+
+    The agent locations and the path arrows are kept in one collection each
+    and new steps are appended in place. The number of artists does not grow
+    with the length of an episode.
+
+    The map is rasterized once by an ArrayRenderBackend and shown by a single
+    imshow artist. The raster is kept across close() and is only rendered
+    again when the map changes. Set mapLayer to False to draw every block
+    as a patch instead.
+    """
+
+    # The maximum width or height of the map layer in pixels.
+    MAP_LAYER_MAX_PIXELS = 2000
+    MAP_LAYER_MAX_PIXELS_PER_BLOCK = 20
+
+    def __init__(self, mapLayer = True):
+        super(MatplotlibRenderBackend, self).__init__()
+
+        self.name = RENDER_BACKEND_MATPLOTLIB
+
+        self.flagMapLayer = mapLayer
+        self.mapRasterizer = None # An ArrayRenderBackend.
+
+        self.fig = None # The matplotlib figure.
+        self.ax  = None
+        self.drawnAgentLocations = 0 # The number of agent locations that have been drawn on the canvas.
+        self.drawnAgentPaths     = 0 # The number of agent path that have been drawn on the canvas.
+        self.drawnAgentStamp     = None # The history stamp of the last drawn agent location.
+
+        # A single collection for each of the agent locations and the agent path.
+        self.agentLocArray       = None
+        self.agentLocArrayStart  = 0 # The index in the agent history of the first row of agentLocArray.
+        self.agentLocCollection  = None
+        self.agentPathVerts      = None
+        self.agentPathCollection = None
+
+    def draw_map_layer(self, env):
+        """Draw the cached raster of the map with a single imshow artist."""
+
+        n = max( env.map.rows, env.map.cols )
+        p = max( 1, min( MatplotlibRenderBackend.MAP_LAYER_MAX_PIXELS_PER_BLOCK, \
+            MatplotlibRenderBackend.MAP_LAYER_MAX_PIXELS // n ) )
+
+        if ( self.mapRasterizer is None or self.mapRasterizer.pixelsPerBlock != p ):
+            self.mapRasterizer = ArrayRenderBackend( pixelsPerBlock = p )
+
+        img = self.mapRasterizer.get_map_layer(env)
+
+        corners = env.map.corners
+
+        self.ax.imshow( img, \
+            extent = ( corners[0][GridMap.GridMap2D.I_X], corners[1][GridMap.GridMap2D.I_X], \
+                       corners[0][GridMap.GridMap2D.I_Y], corners[3][GridMap.GridMap2D.I_Y] ), \
+            origin = "upper", interpolation = "nearest", aspect = "auto", zorder = 0 )
+
+    def draw_map_patches(self, env):
+        """Draw every block as a patch."""
+
+        from matplotlib.patches import Rectangle, Circle
+
+        for br in env.map.blockRows:
+            for b in br:
+                if ( GridMap.GridMapEnv.END_POINT_MODE_BLOCK == env.endPointMode ):
+                    rect = Rectangle( (b.coor[0], b.coor[1]), b.size[1], b.size[0], fill = True)
+                    rect.set_facecolor(b.color)
+                    rect.set_edgecolor("k")
+                    self.ax.add_patch(rect)
+                elif ( GridMap.GridMapEnv.END_POINT_MODE_RADIUS == env.endPointMode ):
+                    if ( not isinstance( b, GridMap.EndingBlock ) ):
+                        rect = Rectangle( (b.coor[0], b.coor[1]), b.size[1], b.size[0], fill = True)
+                        rect.set_facecolor(b.color)
+                        rect.set_edgecolor("k")
+                        self.ax.add_patch(rect)
+                    else:
+                        cir = Circle( (b.endPoint[0], b.endPoint[1]), env.endPointRadius, fill=True )
+                        cir.set_facecolor(b.color)
+                        cir.set_edgecolor("k")
+                else:
+                    raise GridMap.GridMapException("Unexpected ending point mode %d." % (env.endPointMode))
+
+        if ( GridMap.GridMapEnv.END_POINT_MODE_RADIUS == env.endPointMode ):
+            self.ax.add_patch(cir)
+
+    def render(self, env, pause = 0, flagSave = False, fn = None):
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import EllipseCollection, PolyCollection
+
+        if ( self.fig is None ):
+            self.fig, self.ax = plt.subplots(1)
+            ax = self.ax
+
+            if ( True == self.flagMapLayer ):
+                self.draw_map_layer(env)
+            else:
+                self.draw_map_patches(env)
+
+            self.agentLocArray = np.zeros( ( 0, 2 ), dtype = np.float64 )
+            self.agentLocCollection = EllipseCollection( \
+                2 * env.visAgentRadius, 2 * env.visAgentRadius, 0, units = "xy", \
+                offsets = self.agentLocArray, transOffset = ax.transData, \
+                facecolors = "#FFFF0080", edgecolors = "k" )
+            ax.add_collection( self.agentLocCollection )
+
+            self.agentPathVerts = []
+            self.agentPathCollection = PolyCollection( self.agentPathVerts, \
+                facecolors = "k", edgecolors = "k", alpha = 0.5 )
+            ax.add_collection( self.agentPathCollection )
+
+            # Annotations.
+            ax.set_xlabel("x")
+            ax.set_ylabel("y")
+            titleStr = "%s:%s" % (env.name, env.map.name)
+            ax.set_title(titleStr)
+        else:
+            ax = self.ax
+
+        # Agent locations and path. The new locations are appended to the
+        # collections created with the figure. The counters are the indices in
+        # the whole history. Start over with the recorded locations if the history
+        # is cleared, truncated, rewritten, or has dropped locations not drawn yet.
+        locs   = env.history.get_locs()
+        nTotal = env.history.nTotal
+        first  = nTotal - locs.shape[0]
+
+        if ( self.drawnAgentLocations > nTotal or self.drawnAgentLocations < first or \
+            ( self.drawnAgentLocations > first and \
+              env.history.get_stamp( self.drawnAgentLocations - 1 ) != self.drawnAgentStamp ) ):
+            self.agentLocArray = np.zeros( ( 0, 2 ), dtype = np.float64 )
+            self.agentLocCollection.set_offsets( self.agentLocArray )
+
+            del self.agentPathVerts[:]
+            self.agentPathCollection.set_verts( self.agentPathVerts )
+
+            self.agentLocArrayStart  = first
+            self.drawnAgentLocations = first
+            self.drawnAgentPaths     = first
+
+        if ( self.drawnAgentLocations < nTotal ):
+            self.agentLocArray = np.concatenate( ( self.agentLocArray, locs[ self.drawnAgentLocations - first: ] ), axis = 0 )
+            self.agentLocCollection.set_offsets( self.agentLocArray )
+
+            self.drawnAgentLocations = nTotal
+            self.drawnAgentStamp     = env.history.get_stamp( nTotal - 1 )
+
+        if ( self.drawnAgentPaths < nTotal - 1 ):
+            i0 = self.drawnAgentPaths - self.agentLocArrayStart
+            i1 = nTotal - 1 - self.agentLocArrayStart
+
+            self.agentPathVerts.extend( make_arrow_polygons( \
+                self.agentLocArray[ i0:i1 ], self.agentLocArray[ i0+1:i1+1 ], env.visPathArrowWidth ) )
+            self.agentPathCollection.set_verts( self.agentPathVerts )
+
+            self.drawnAgentPaths = nTotal - 1
+
+        ax.set_xlim( ( env.map.corners[0][GridMap.GridMap2D.I_X], env.map.corners[1][GridMap.GridMap2D.I_X] ) )
+        ax.set_ylim( ( env.map.corners[0][GridMap.GridMap2D.I_Y], env.map.corners[3][GridMap.GridMap2D.I_Y] ) )
+
+        if ( True == flagSave ):
+            if ( fn is None ):
+                saveFn = "%s/%s_%d-%ds_%dv.png" % (env.renderDir, env.name, env.nSteps, env.maxSteps, env.totalValue)
+            else:
+                saveFn = "%s/%s" % (env.renderDir, fn)
+
+            self.fig.savefig( saveFn, dpi = 300, format = "png" )
+
+        if ( True == env.visIsForcePause ):
+            self.fig.canvas.draw()
+            self.fig.canvas.flush_events()
+            plt.pause(env.visForcePauseTime)
+        else:
+            if ( pause <= 0 ):
+                plt.show()
+            elif ( pause > 0 ):
+                print("Render %s for %f seconds." % (env.name, pause))
+                self.fig.canvas.draw()
+                self.fig.canvas.flush_events()
+                plt.pause(pause)
+
+        return None
+
+    def close(self):
+        if ( self.fig is not None ):
+            import matplotlib.pyplot as plt
+
+            plt.close( self.fig )
+            self.fig = None
+            self.ax  = None
+
+            self.agentLocArray       = None
+            self.agentLocCollection  = None
+            self.agentPathVerts      = None
+            self.agentPathCollection = None
+
+        self.drawnAgentLocations = 0
+        self.drawnAgentPaths     = 0
+        self.drawnAgentStamp     = None
+        self.agentLocArrayStart  = 0
+
+    def save(self, fn):
+        if ( self.fig is None ):
+            raise GridMap.GridMapException("No matplotlib figure is present. Could not save figure.")
+
+        self.fig.savefig( fn, dpi = 300, format = "png" )
+
+class ArrayRenderBackend(RenderBackend):
+    """
+    Rasterizes the map, the agent locations and the agent path into an
+    H x W x 3 uint8 NumPy array. Row 0 of the array is the top of the map.
+    No matplotlib is needed.
+    """
+
+    AGENT_COLOR = "#FFFF0080"
+    PATH_COLOR  = "#00000080"
+
+    def __init__(self, pixelsPerBlock = 10):
+        super(ArrayRenderBackend, self).__init__()
+
+        self.name = RENDER_BACKEND_ARRAY
+
+        if ( pixelsPerBlock < 1 ):
+            raise ValueError("pixelsPerBlock must be positive. Got %s." % ( str(pixelsPerBlock) ))
+
+        self.pixelsPerBlock = int( pixelsPerBlock )
+        self.image = None # The latest rendered image.
+
+        # The cached map layer and the key it is rendered with. See get_map_layer().
+        self.mapLayer    = None
+        self.mapLayerKey = None
+
+        # Colors of the block types, indexed by BLOCK_TYPE_XXX.
+        self.blockColors = np.zeros( ( 4, 3 ), dtype = np.uint8 )
+        self.blockColors[ GridMap.BLOCK_TYPE_NORMAL ]   = hex_to_rgba( GridMap.NormalBlock().color )[:3]
+        self.blockColors[ GridMap.BLOCK_TYPE_OBSTACLE ] = hex_to_rgba( GridMap.ObstacleBlock().color )[:3]
+        self.blockColors[ GridMap.BLOCK_TYPE_STARTING ] = hex_to_rgba( GridMap.StartingBlock().color )[:3]
+        self.blockColors[ GridMap.BLOCK_TYPE_ENDING ]   = hex_to_rgba( GridMap.EndingBlock().color )[:3]
+
+    def get_pixel_scale(self, env):
+        """Return the number of pixels per unit length in x and y directions."""
+
+        stepSize = env.map.get_step_size()
+
+        return 1.0 * self.pixelsPerBlock / stepSize[GridMap.GridMap2D.I_X], \
+               1.0 * self.pixelsPerBlock / stepSize[GridMap.GridMap2D.I_Y]
+
+    def convert_to_pixels(self, env, xs, ys):
+        """Convert the map coordinates into float pixel coordinates (column, row) of the image."""
+
+        sx, sy = self.get_pixel_scale(env)
+
+        x0 = env.map.corners[0][GridMap.GridMap2D.I_X]
+        y1 = env.map.corners[3][GridMap.GridMap2D.I_Y]
+
+        return ( np.asarray( xs, dtype = np.float64 ) - x0 ) * sx, \
+               ( y1 - np.asarray( ys, dtype = np.float64 ) ) * sy
+
+    def draw_disk(self, img, px, py, rx, ry, rgba, edge = True):
+        """Blend a filled ellipse centered at pixel (px, py) with radii rx and ry into img."""
+
+        h, w = img.shape[:2]
+
+        c0 = max( int( np.floor( px - rx ) ), 0 )
+        c1 = min( int( np.ceil( px + rx ) ) + 1, w )
+        r0 = max( int( np.floor( py - ry ) ), 0 )
+        r1 = min( int( np.ceil( py + ry ) ) + 1, h )
+
+        if ( c0 >= c1 or r0 >= r1 ):
+            return
+
+        # Pixel centers.
+        cs = np.arange( c0, c1 ) + 0.5
+        rs = np.arange( r0, r1 ) + 0.5
+
+        d = ( ( cs[np.newaxis, :] - px ) / max( rx, 0.5 ) )**2 + ( ( rs[:, np.newaxis] - py ) / max( ry, 0.5 ) )**2
+
+        inside = d <= 1.0
+        alpha  = rgba[3] / 255.0
+
+        patch = img[r0:r1, c0:c1]
+        patch[inside] = ( ( 1 - alpha ) * patch[inside] + alpha * np.array( rgba[:3] ) ).astype(np.uint8)
+
+        if ( True == edge and min( rx, ry ) >= 2 ):
+            ring = inside & ( d >= ( 1 - 1.0 / min( rx, ry ) )**2 )
+            patch[ring] = 0
+
+    def draw_path(self, img, pxs, pys, halfWidth, rgba):
+        """
+        Blend the polyline through the pixels (pxs, pys) into img. The segments
+        are collected into a single mask first such that the joints are not
+        blended twice.
+        """
+
+        h, w = img.shape[:2]
+        mask = np.zeros( ( h, w ), dtype = np.bool_ )
+
+        halfWidth = max( halfWidth, 0.5 )
+
+        for i in range( len(pxs) - 1 ):
+            x0, y0, x1, y1 = pxs[i], pys[i], pxs[i+1], pys[i+1]
+
+            c0 = max( int( np.floor( min( x0, x1 ) - halfWidth ) ), 0 )
+            c1 = min( int( np.ceil( max( x0, x1 ) + halfWidth ) ) + 1, w )
+            r0 = max( int( np.floor( min( y0, y1 ) - halfWidth ) ), 0 )
+            r1 = min( int( np.ceil( max( y0, y1 ) + halfWidth ) ) + 1, h )
+
+            if ( c0 >= c1 or r0 >= r1 ):
+                continue
+
+            cs = np.arange( c0, c1 )[np.newaxis, :] + 0.5 - x0
+            rs = np.arange( r0, r1 )[:, np.newaxis] + 0.5 - y0
+
+            dx = x1 - x0
+            dy = y1 - y0
+            l2 = dx**2 + dy**2
+
+            if ( 0 == l2 ):
+                continue
+
+            # Distance from the pixel centers to the segment.
+            t = np.clip( ( cs * dx + rs * dy ) / l2, 0, 1 )
+            d2 = ( cs - t * dx )**2 + ( rs - t * dy )**2
+
+            mask[r0:r1, c0:c1] |= d2 <= halfWidth**2
+
+        alpha = rgba[3] / 255.0
+
+        img[mask] = ( ( 1 - alpha ) * img[mask] + alpha * np.array( rgba[:3] ) ).astype(np.uint8)
+
+    def render_map(self, env):
+        """Rasterize the blocks. Return a new H x W x 3 image."""
+
+        p = self.pixelsPerBlock
+
+        # Flip so that the top row of the map is the first row of the image.
+        img = self.blockColors[ env.map.blockTypes[::-1, :] ]
+        img = np.repeat( np.repeat( img, p, axis = 0 ), p, axis = 1 )
+
+        if ( GridMap.GridMapEnv.END_POINT_MODE_RADIUS == env.endPointMode ):
+            # The ending block is drawn as a circle.
+            for er, ec in np.argwhere( GridMap.BLOCK_TYPE_ENDING == env.map.blockTypes[::-1, :] ):
+                img[ er*p:(er+1)*p, ec*p:(ec+1)*p ] = self.blockColors[ GridMap.BLOCK_TYPE_NORMAL ]
+
+        # Block edges.
+        if ( p >= 4 ):
+            img[ ::p, :, : ] = 0
+            img[ :, ::p, : ] = 0
+            img[ -1, :, : ] = 0
+            img[ :, -1, : ] = 0
+
+        if ( GridMap.GridMapEnv.END_POINT_MODE_RADIUS == env.endPointMode ):
+            sx, sy = self.get_pixel_scale(env)
+            px, py = self.convert_to_pixels( env, env.map.endingPoint.x, env.map.endingPoint.y )
+            self.draw_disk( img, px, py, env.endPointRadius * sx, env.endPointRadius * sy, \
+                list( self.blockColors[ GridMap.BLOCK_TYPE_ENDING ] ) + [ 255 ] )
+
+        return img
+
+    def get_map_layer(self, env):
+        """
+        Return the rasterized map. The image is cached and only rendered again
+        if the map, its version or the ending point mode changes. The returned
+        array should not be modified.
+        """
+
+        key = ( env.map.version, env.endPointMode, env.endPointRadius )
+
+        if ( self.mapLayer is None or self.mapLayerKey is None or \
+             self.mapLayerKey[0] is not env.map or self.mapLayerKey[1] != key ):
+            self.mapLayer    = self.render_map(env)
+            self.mapLayerKey = ( env.map, key )
+
+        return self.mapLayer
+
+    def render(self, env, pause = 0, flagSave = False, fn = None):
+        img = self.get_map_layer(env).copy()
+
+        # Agent locations.
+        locs = env.history.get_locs()
+
+        if ( locs.shape[0] > 0 ):
+            sx, sy = self.get_pixel_scale(env)
+            pxs, pys = self.convert_to_pixels( env, locs[:, 0], locs[:, 1] )
+            rgba = hex_to_rgba( ArrayRenderBackend.AGENT_COLOR )
+
+            for px, py in zip( pxs, pys ):
+                self.draw_disk( img, px, py, env.visAgentRadius * sx, env.visAgentRadius * sy, rgba )
+
+            # Agent path.
+            self.draw_path( img, pxs, pys, 0.5 * env.visPathArrowWidth * min( sx, sy ), \
+                hex_to_rgba( ArrayRenderBackend.PATH_COLOR ) )
+
+        self.image = img
+
+        if ( True == flagSave ):
+            if ( fn is None ):
+                saveFn = "%s/%s_%d-%ds_%dv.png" % (env.renderDir, env.name, env.nSteps, env.maxSteps, env.totalValue)
+            else:
+                saveFn = "%s/%s" % (env.renderDir, fn)
+
+            write_png( saveFn, img )
+
+        return img
+
+    def close(self):
+        # The map layer is kept for the next episode.
+        self.image = None
+
+    def save(self, fn):
+        if ( self.image is None ):
+            raise GridMap.GridMapException("No image is present. Could not save the image.")
+
+        write_png( fn, self.image )
+
+def make_render_backend(name, **kwargs):
+    """Create a render backend by its name in RENDER_BACKENDS."""
+
+    if ( RENDER_BACKEND_NONE == name ):
+        return NoOpRenderBackend(**kwargs)
+    elif ( RENDER_BACKEND_MATPLOTLIB == name ):
+        return MatplotlibRenderBackend(**kwargs)
+    elif ( RENDER_BACKEND_ARRAY == name ):
+        return ArrayRenderBackend(**kwargs)
+    else:
+        raise ValueError("Unexpected render backend %s. Choose from %s." % ( name, ", ".join(RENDER_BACKENDS) ))
@@ -0,0 +1,243 @@
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import GridMap
+import RenderBackends
+
+class TestRenderBackends(unittest.TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp( prefix = "RenderBackendsTest_" )
+
+        gridMap = GridMap.GridMap2D( 10, 20, outOfBoundValue = -200 )
+
+        gridMap.set_value_normal_block(-1)
+        gridMap.set_value_starting_block(0)
+        gridMap.set_value_ending_block(100)
+        gridMap.set_value_obstacle_block(-100)
+
+        gridMap.initialize()
+        gridMap.set_starting_block( ( 0, 0 ) )
+        gridMap.set_ending_block( ( 9, 19 ) )
+        gridMap.add_obstacle( ( 5, 10 ) )
+
+        self.gme = GridMap.GridMapEnv( gridMap = gridMap, workingDir = self.workingDir )
+        self.gme.reset()
+
+    def tearDown(self):
+        self.gme.finalize()
+        shutil.rmtree( self.workingDir, ignore_errors = True )
+
+    def test_lazy_import(self):
+        print("test_lazy_import")
+
+        cmd = "import sys; import GridMap; print( 'matplotlib.pyplot' in sys.modules )"
+        out = subprocess.check_output( [ sys.executable, "-c", cmd ], \
+            cwd = os.path.dirname( os.path.abspath( __file__ ) ) )
+
+        self.assertEqual( out.decode().strip(), "False" )
+
+    def test_set_render_backend(self):
+        print("test_set_render_backend")
+
+        self.gme.set_render_backend("none")
+        self.assertTrue( isinstance( self.gme.get_render_backend(), RenderBackends.NoOpRenderBackend ) )
+        self.assertTrue( self.gme.render() is None )
+
+        backend = RenderBackends.ArrayRenderBackend( pixelsPerBlock = 4 )
+        self.gme.set_render_backend( backend )
+        self.assertTrue( self.gme.get_render_backend() is backend )
+
+        self.assertRaises( ValueError, self.gme.set_render_backend, "unknown" )
+
+    def test_array_backend(self):
+        print("test_array_backend")
+
+        self.gme.set_render_backend( RenderBackends.ArrayRenderBackend( pixelsPerBlock = 10 ) )
+
+        img = self.gme.render()
+
+        self.assertEqual( img.shape, ( 100, 200, 3 ) )
+        self.assertEqual( img.dtype, np.uint8 )
+
+        # Block colors. Row 0 of the image is the top of the map.
+        self.assertEqual( img[ 45, 105 ].tolist(), [ 255, 0, 0 ] )   # Obstacle at ( 5, 10 ).
+        self.assertEqual( img[ 5, 195 ].tolist(), [ 0, 0, 255 ] )    # Ending block at ( 9, 19 ).
+        self.assertEqual( img[ 55, 55 ].tolist(), [ 255, 255, 255 ] ) # Normal block.
+
+        # The agent is drawn at the starting point, blended with the starting block color.
+        self.assertEqual( img[ 95, 5 ].tolist(), [ 128, 255, 0 ] )
+
+        # Save as PNG.
+        fn = os.path.join( self.workingDir, "Array.png" )
+        self.gme.save_render( fn )
+
+        with open( fn, "rb" ) as fp:
+            self.assertEqual( fp.read(8), b"\x89PNG\r\n\x1a\n" )
+
+    def test_rgb_array_mode(self):
+        print("test_rgb_array_mode")
+
+        self.gme.set_render_resolution(5)
+
+        # Move along the bottom row of blocks, 4 blocks each step.
+        for i in range(2):
+            self.gme.step( GridMap.BlockCoorDelta( 4, 0 ) )
+
+        img = self.gme.render( mode = "rgb_array" )
+
+        self.assertEqual( img.shape, ( 50, 100, 3 ) )
+
+        # The path between the agent locations is darker than a normal block.
+        self.assertTrue( np.all( img[ 47, 15 ] < 255 ) )
+        self.assertTrue( np.all( img[ 47, 35 ] < 255 ) )
+        self.assertEqual( img[ 47, 57 ].tolist(), [ 255, 255, 255 ] )
+
+        # The configured backend is not changed.
+        self.assertTrue( self.gme.renderBackend is None )
+
+        self.gme.set_render_resolution(2)
+        self.assertEqual( self.gme.render( mode = "rgb_array" ).shape, ( 20, 40, 3 ) )
+
+        self.assertRaises( ValueError, self.gme.render, mode = "unknown" )
+
+    def test_map_layer_cache(self):
+        print("test_map_layer_cache")
+
+        backend = RenderBackends.ArrayRenderBackend( pixelsPerBlock = 4 )
+        self.gme.set_render_backend( backend )
+
+        self.gme.render()
+        layer = backend.mapLayer
+
+        # A new episode reuses the map layer.
+        self.gme.reset()
+        self.gme.step( GridMap.BlockCoorDelta( 1, 1 ) )
+        self.gme.render()
+        self.assertTrue( backend.mapLayer is layer )
+
+        # Changing the map renders the layer again.
+        self.gme.map.add_obstacle( ( 2, 2 ) )
+        img = self.gme.render()
+        self.assertTrue( backend.mapLayer is not layer )
+        self.assertEqual( img[ 29, 9 ].tolist(), [ 255, 0, 0 ] )
+
+        # So does the ending point mode.
+        layer = backend.mapLayer
+        self.gme.enable_ending_point_radius( 0.5 )
+        self.gme.render()
+        self.assertTrue( backend.mapLayer is not layer )
+
+    def test_matplotlib_map_layer(self):
+        print("test_matplotlib_map_layer")
+
+        backend = RenderBackends.MatplotlibRenderBackend()
+        self.gme.set_render_backend( backend )
+
+        self.gme.render( 0.001 )
+        layer = backend.mapRasterizer.mapLayer
+        self.assertEqual( len( backend.ax.images ), 1 )
+        self.assertEqual( len( backend.ax.patches ), 0 )
+
+        self.gme.reset()
+        self.assertTrue( backend.fig is None )
+
+        self.gme.render( 0.001 )
+        self.assertTrue( backend.mapRasterizer.mapLayer is layer )
+
+    def test_matplotlib_trajectory(self):
+        print("test_matplotlib_trajectory")
+
+        backend = RenderBackends.MatplotlibRenderBackend()
+        self.gme.set_render_backend( backend )
+
+        self.gme.render( 0.001 )
+
+        nCollections = len( backend.ax.collections )
+
+        for i in range(10):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+            self.gme.render( 0.001 )
+
+        # The same artists are updated in place.
+        self.assertEqual( len( backend.ax.collections ), nCollections )
+        self.assertEqual( backend.agentLocCollection.get_offsets().shape, ( 11, 2 ) )
+        self.assertEqual( len( backend.agentPathCollection.get_paths() ), 10 )
+
+    def test_matplotlib_ring_history(self):
+        print("test_matplotlib_ring_history")
+
+        backend = RenderBackends.MatplotlibRenderBackend()
+        self.gme.set_render_backend( backend )
+        self.gme.set_history_mode( GridMap.HISTORY_MODE_RING, 4 )
+
+        self.gme.render( 0.001 )
+
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+            self.gme.render( 0.001 )
+
+        self.assertEqual( backend.agentLocCollection.get_offsets().shape, ( 4, 2 ) )
+
+        # Several locations are dropped from the ring buffer before being drawn.
+        for i in range(6):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+
+        self.gme.render( 0.001 )
+
+        self.assertTrue( np.array_equal( backend.agentLocCollection.get_offsets(), self.gme.history.get_locs() ) )
+        self.assertEqual( len( backend.agentPathCollection.get_paths() ), 3 )
+
+    def test_matplotlib_rewritten_history(self):
+        print("test_matplotlib_rewritten_history")
+
+        backend = RenderBackends.MatplotlibRenderBackend()
+        self.gme.set_render_backend( backend )
+
+        root = self.gme.get_state()
+
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 0.5, 0.5 ) )
+
+        self.gme.render( 0.001 )
+
+        # Another branch with the same number of locations.
+        self.gme.set_state( root )
+
+        for i in range(3):
+            self.gme.step( GridMap.BlockCoorDelta( 1.0, 0.0 ) )
+
+        self.gme.render( 0.001 )
+
+        self.assertTrue( np.array_equal( backend.agentLocCollection.get_offsets(), self.gme.history.get_locs() ) )
+        self.assertEqual( len( backend.agentPathCollection.get_paths() ), 3 )
+
+    def test_make_arrow_polygons(self):
+        print("test_make_arrow_polygons")
+
+        p0 = np.array( [ [ 0, 0 ], [ 1, 1 ], [ 2, 2 ] ], dtype = np.float64 )
+        p1 = np.array( [ [ 10, 0 ], [ 1, 1 ], [ 2, 12 ] ], dtype = np.float64 )
+
+        polygons = RenderBackends.make_arrow_polygons( p0, p1, 1.0 )
+
+        # The zero length arrow is dropped.
+        self.assertEqual( polygons.shape, ( 2, 7, 2 ) )
+
+        # Tips.
+        self.assertTrue( np.allclose( polygons[0, 3], [ 10, 0 ] ) )
+        self.assertTrue( np.allclose( polygons[1, 3], [ 2, 12 ] ) )
+
+        # Tail and head widths.
+        self.assertTrue( np.allclose( polygons[0, 0], [ 0, 0.5 ] ) )
+        self.assertTrue( np.allclose( polygons[0, 2], [ 5.5, 1.5 ] ) )
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase( TestRenderBackends )
+    unittest.TextTestRunner().run( suite )